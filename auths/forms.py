@@ -2,12 +2,13 @@
 from django import forms
 from django.contrib.auth.forms import AuthenticationForm, SetPasswordForm
 from django.core import validators
-from microsocial.forms import BootstrapFormMixin
+from microsocial.forms import bootstrap_form, with_validators
 from users.models import User
 from django.utils.translation import ugettext_lazy as _, ugettext
 
 
-class RegistrationForm(forms.ModelForm, BootstrapFormMixin):
+@bootstrap_form
+class RegistrationForm(forms.ModelForm):
     password1 = forms.CharField(label=_(u'пароль'), required=True, min_length=6, max_length=40,
                                 widget=forms.PasswordInput, initial='password')
     password2 = forms.CharField(label=_(u'повтор пароля'), min_length=6, max_length=40,
@@ -17,10 +18,6 @@ class RegistrationForm(forms.ModelForm, BootstrapFormMixin):
         model = User
         fields = ('first_name', 'email')
 
-    def __init__(self, *args, **kwargs):
-        super(RegistrationForm, self).__init__(*args, **kwargs)
-        BootstrapFormMixin.__init__(self)
-
     def clean(self):
         data = super(RegistrationForm, self).clean()
         if 'password1' not in self.errors and 'password2' not in self.errors:
@@ -42,11 +39,8 @@ class RegistrationForm(forms.ModelForm, BootstrapFormMixin):
         return user
 
 
-class LoginForm(AuthenticationForm, BootstrapFormMixin):
-    def __init__(self, *args, **kwargs):
-        super(LoginForm, self).__init__(*args, **kwargs)
-        BootstrapFormMixin.__init__(self)
-
+@bootstrap_form
+class LoginForm(AuthenticationForm):
     def clean(self):
         has_error = False
         try:
@@ -55,14 +49,15 @@ class LoginForm(AuthenticationForm, BootstrapFormMixin):
             has_error = True
         if has_error or self.errors or (self.user_cache and not self.user_cache.confirned_registration):
             raise forms.ValidationError(ValueError(ugettext(u'Неправильний email или пароль.')))
+        return self.cleaned_data
 
 
-class PasswordRecoveryForm(forms.Form, BootstrapFormMixin):
+@bootstrap_form
+class PasswordRecoveryForm(forms.Form):
     email = forms.EmailField(label=_(u'email'))
 
     def __init__(self, *args, **kwargs):
         super(PasswordRecoveryForm, self).__init__(*args, **kwargs)
-        BootstrapFormMixin.__init__(self)
         self._user = None
 
     def clean_email(self):
@@ -77,11 +72,9 @@ class PasswordRecoveryForm(forms.Form, BootstrapFormMixin):
         return self._user
 
 
-class NewPasswordForm(SetPasswordForm, BootstrapFormMixin):
-    def __init__(self, *args, **kwargs):
-        super(NewPasswordForm, self).__init__(*args, **kwargs)
-        BootstrapFormMixin.__init__(self)
-        for field_name in ('new_password1', 'new_password2'):
-            self.fields[field_name].validators.extend([validators.MinLengthValidator(6),
-                                                      validators.MaxLengthValidator(40)])
-
+@bootstrap_form
+class NewPasswordForm(SetPasswordForm):
+    new_password1 = with_validators(SetPasswordForm.base_fields['new_password1'],
+                                    validators.MinLengthValidator(6), validators.MaxLengthValidator(40))
+    new_password2 = with_validators(SetPasswordForm.base_fields['new_password2'],
+                                    validators.MinLengthValidator(6), validators.MaxLengthValidator(40))
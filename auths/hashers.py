@@ -0,0 +1,78 @@
+# coding=utf-8
+from collections import OrderedDict
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.utils.encoding import force_bytes
+from django.utils.translation import ugettext_noop as _
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+    PBKDF2 with the number of iterations taken from PASSWORD_PBKDF2_ITERATIONS.
+    Hashes made with another count are re-hashed on the next successful login.
+    """
+    iterations = settings.PASSWORD_PBKDF2_ITERATIONS
+
+    def must_update(self, encoded):
+        algorithm, iterations, salt, hash = encoded.split('$', 3)
+        return int(iterations) != self.iterations
+
+
+class Argon2PasswordHasher(hashers.BasePasswordHasher):
+    """
+    Argon2i through the ``argon2-cffi`` library, stored in the same format as
+    the hasher shipped with later Django versions.
+    """
+    algorithm = 'argon2'
+    library = 'argon2'
+
+    time_cost = settings.PASSWORD_ARGON2_TIME_COST
+    memory_cost = settings.PASSWORD_ARGON2_MEMORY_COST
+    parallelism = settings.PASSWORD_ARGON2_PARALLELISM
+
+    def encode(self, password, salt):
+        argon2 = self._load_library()
+        data = argon2.low_level.hash_secret(
+            force_bytes(password),
+            force_bytes(salt),
+            time_cost=self.time_cost,
+            memory_cost=self.memory_cost,
+            parallelism=self.parallelism,
+            hash_len=16,
+            type=argon2.low_level.Type.I,
+        )
+        return self.algorithm + data.decode('ascii')
+
+    def verify(self, password, encoded):
+        argon2 = self._load_library()
+        algorithm, rest = encoded.split('$', 1)
+        assert algorithm == self.algorithm
+        try:
+            return argon2.low_level.verify_secret(
+                force_bytes('$' + rest),
+                force_bytes(password),
+                type=argon2.low_level.Type.I,
+            )
+        except argon2.exceptions.VerificationError:
+            return False
+
+    def safe_summary(self, encoded):
+        params, salt, data = self._decode(encoded)
+        return OrderedDict([
+            (_('algorithm'), self.algorithm),
+            (_('memory cost'), params['m']),
+            (_('time cost'), params['t']),
+            (_('parallelism'), params['p']),
+            (_('salt'), hashers.mask_hash(salt)),
+            (_('hash'), hashers.mask_hash(data)),
+        ])
+
+    def must_update(self, encoded):
+        params = self._decode(encoded)[0]
+        return (params['t'], params['m'], params['p']) != (self.time_cost, self.memory_cost, self.parallelism)
+
+    def _decode(self, encoded):
+        # argon2$argon2i$v=19$m=512,t=2,p=2$<salt>$<hash>
+        parts = encoded.split('$')
+        params = dict((key, int(value)) for key, value in (item.split('=') for item in parts[-3].split(',')))
+        return params, parts[-2], parts[-1]
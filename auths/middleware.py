@@ -0,0 +1,48 @@
+# coding=utf-8
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY, BACKEND_SESSION_KEY, HASH_SESSION_KEY, load_backend
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+from users.models import get_user_cache_key, USER_CACHE_INVALIDATED
+
+
+def get_cached_user(request):
+    """
+    Same as ``django.contrib.auth.get_user`` plus the session hash check of
+    ``SessionAuthenticationMiddleware``, which this middleware replaces, but
+    the user row is taken from the cache. Saves of the user (password and
+    email changes included) invalidate the cached row, so the check stays
+    exact.
+    """
+    try:
+        user_id = request.session[SESSION_KEY]
+        backend_path = request.session[BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return AnonymousUser()
+    cache_key = get_user_cache_key(user_id)
+    cached = cache.get(cache_key)
+    if cached is None or cached == USER_CACHE_INVALIDATED:
+        user = load_backend(backend_path).get_user(user_id)
+        if user is None:
+            return AnonymousUser()
+        # add() does not replace a marker set since the get().
+        if cached is None:
+            cache.add(cache_key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+    else:
+        user = cached
+    user.backend = backend_path
+    session_hash = request.session.get(HASH_SESSION_KEY)
+    if not session_hash or not constant_time_compare(session_hash, user.get_session_auth_hash()):
+        request.session.flush()
+        return AnonymousUser()
+    return user
+
+
+class CachedAuthenticationMiddleware(object):
+    def process_request(self, request):
+        assert hasattr(request, 'session'), 'CachedAuthenticationMiddleware requires SessionMiddleware.'
+        request.user = SimpleLazyObject(lambda: get_cached_user(request))
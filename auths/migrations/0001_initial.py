@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateLimitCounter',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('scope', models.CharField(max_length=50, verbose_name='\u043e\u0433\u0440\u0430\u043d\u0438\u0447\u0435\u043d\u0438\u0435')),
+                ('name', models.CharField(max_length=20, verbose_name='\u0441\u0447\u0435\u0442\u0447\u0438\u043a')),
+                ('count', models.BigIntegerField(default=0, verbose_name='\u043a\u043e\u043b\u0438\u0447\u0435\u0441\u0442\u0432\u043e')),
+            ],
+            options={
+            },
+            bases=(models.Model,),
+        ),
+        migrations.AlterUniqueTogether(
+            name='ratelimitcounter',
+            unique_together=set([('scope', 'name')]),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# coding=utf-8
+from django.db import models, transaction, IntegrityError
+from django.db.models import F
+from django.utils.translation import ugettext_lazy as _
+
+
+class RateLimitCounterManager(models.Manager):
+    def add(self, counts):
+        """
+        Adds ``{(scope, name): count}`` to the stored counters, one UPDATE per
+        counter.
+        """
+        for (scope, name), count in counts.iteritems():
+            if self.filter(scope=scope, name=name).update(count=F('count') + count):
+                continue
+            try:
+                with transaction.atomic():
+                    self.create(scope=scope, name=name, count=count)
+            except IntegrityError:
+                # Created by another process in between.
+                self.filter(scope=scope, name=name).update(count=F('count') + count)
+
+
+class RateLimitCounter(models.Model):
+    scope = models.CharField(_(u'ограничение'), max_length=50)
+    name = models.CharField(_(u'счетчик'), max_length=20)
+    count = models.BigIntegerField(_(u'количество'), default=0)
+
+    objects = RateLimitCounterManager()
+
+    class Meta:
+        unique_together = (('scope', 'name'),)
+
+    def __unicode__(self):
+        return u'{} {}: {}'.format(self.scope, self.name, self.count)
@@ -0,0 +1,128 @@
+# coding=utf-8
+import hashlib
+import threading
+import time
+from functools import wraps
+from django.conf import settings
+from django.core.cache import caches
+from django.shortcuts import render
+from django.utils.encoding import force_bytes
+from auths.models import RateLimitCounter
+from microsocial.utils import BackgroundFlusher
+
+_lock = threading.Lock()
+_pending = {}
+
+
+class TokenBucket(object):
+    """
+    Token bucket kept in the Django cache: ``capacity`` tokens, refilled at
+    ``capacity / period`` tokens per second. The read-modify-write is not atomic,
+    so a burst racing on the same key may get a few extra requests through.
+    """
+
+    def __init__(self, scope, capacity, period):
+        self.scope = scope
+        self.capacity = capacity
+        self.rate = float(capacity) / period
+        self.period = period
+
+    def consume(self, key):
+        cache = get_cache()
+        cache_key = u'ratelimit:{}:{}'.format(self.scope, key)
+        now = time.time()
+        tokens, updated = cache.get(cache_key) or (self.capacity, now)
+        tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        cache.set(cache_key, (tokens, now), self.period)
+        return allowed
+
+
+def get_cache():
+    return caches[settings.RATELIMIT_CACHE]
+
+
+def get_client_ip(request):
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def get_email_hash(email):
+    # Emails may be non-ASCII and longer than a cache key may be.
+    return hashlib.md5(force_bytes(email.strip().lower())).hexdigest()
+
+
+def get_bucket_key(request, key, field):
+    """
+    Returns the bucket key of the request, None when the request has no value
+    for the key (e.g. an empty email field).
+    """
+    ip = get_client_ip(request)
+    if key == 'ip':
+        return u'ip:{}'.format(ip)
+    email = request.POST.get(field, '').strip()
+    if not email:
+        return None
+    if key == 'email':
+        return u'email:{}'.format(get_email_hash(email))
+    return u'ip-email:{}:{}'.format(ip, get_email_hash(email))
+
+
+def incr_counter(scope, name):
+    """
+    Counts in a process-local buffer that a background thread adds to
+    ``RateLimitCounter`` every ``RATELIMIT_STATS_FLUSH_SECONDS``, so the
+    counters of all workers and servers end up in one place without a write
+    on the login and registration requests. The counts of the last interval
+    of a process are lost when it exits.
+    """
+    with _lock:
+        _pending[(scope, name)] = _pending.get((scope, name), 0) + 1
+    _flusher.start()
+
+
+def flush_counters():
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+    if pending:
+        RateLimitCounter.objects.add(pending)
+
+
+_flusher = BackgroundFlusher(flush_counters, lambda: settings.RATELIMIT_STATS_FLUSH_SECONDS)
+
+
+def get_counters():
+    counters = dict((scope, {'allowed': 0, 'rejected': 0}) for scope in settings.RATELIMITS)
+    for scope, name, count in RateLimitCounter.objects.values_list('scope', 'name', 'count'):
+        counters.setdefault(scope, {'allowed': 0, 'rejected': 0})[name] = count
+    return counters
+
+
+def is_allowed(request, scope, key='ip', field=None):
+    bucket_key = get_bucket_key(request, key, field)
+    if bucket_key is None:
+        return True
+    capacity, period = settings.RATELIMITS[scope]
+    allowed = TokenBucket(scope, capacity, period).consume(bucket_key)
+    incr_counter(scope, 'allowed' if allowed else 'rejected')
+    return allowed
+
+
+def ratelimit(scope, key='ip', field=None):
+    """
+    Rejects POST requests over the limit of ``settings.RATELIMITS[scope]``
+    before the view runs. ``key`` picks the bucket of a request: 'ip' (the
+    client IP), 'email' (the value of the POST field ``field``) or 'ip_email'
+    (both, so requests from other addresses cannot use up the attempts of an
+    email and lock its owner out).
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if request.method == 'POST' and not is_allowed(request, scope, key, field):
+                return render(request, 'auths/rate_limited.html', status=429)
+            return view_func(request, *args, **kwargs)
+        return _wrapped_view
+    return decorator
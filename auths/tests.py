@@ -0,0 +1,146 @@
+# coding=utf-8
+import datetime
+import urlparse
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+from auths.models import RateLimitCounter
+from auths.ratelimit import get_cache, get_counters, flush_counters
+from auths.tokens import TokenService, tokens
+from users.models import User, get_user_cache_key, USER_CACHE_INVALIDATED
+
+
+class LoginRehashTest(TestCase):
+    def test_login_rehashes_password_of_other_hasher(self):
+        user = User.objects.create_user(u'user@example.com', first_name=u'Иван', confirned_registration=True)
+        user.password = make_password(u'secret', hasher='md5')
+        user.save()
+        response = self.client.post(reverse('login'), {'username': u'user@example.com', 'password': u'secret'})
+        self.assertEqual(response.status_code, 302)
+        user = User.objects.get(pk=user.pk)
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$'))
+        self.assertTrue(user.check_password(u'secret'))
+
+
+class CachedAuthenticationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(u'user@example.com', u'secret', first_name=u'Иван')
+        self.client.login(username=u'user@example.com', password=u'secret')
+        self.cache_key = get_user_cache_key(self.user.pk)
+
+    def test_user_is_cached(self):
+        cache.delete(self.cache_key)
+        self.assertEqual(self.client.get(reverse('user_settings')).status_code, 200)
+        self.assertEqual(cache.get(self.cache_key), self.user)
+
+    def test_changed_user_is_not_cached_again(self):
+        self.user.first_name = u'Пётр'
+        self.user.save()
+        self.assertEqual(cache.get(self.cache_key), USER_CACHE_INVALIDATED)
+        response = self.client.get(reverse('user_settings'))
+        self.assertEqual(response.context['user'].first_name, u'Пётр')
+        self.assertEqual(cache.get(self.cache_key), USER_CACHE_INVALIDATED)
+
+    def test_password_change_ends_other_sessions(self):
+        self.client.get(reverse('user_settings'))
+        self.user.set_password(u'changed')
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('user_settings')).status_code, 302)
+
+
+@override_settings(RATELIMITS={
+    'login': (3, 60),
+    'login_account': (2, 60),
+    'registration': (3, 600),
+    'registration_email': (2, 600),
+    'password_recovery': (3, 600),
+    'password_recovery_email': (2, 600),
+})
+class RateLimitTest(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        # Drops the counts of other tests.
+        flush_counters()
+        RateLimitCounter.objects.all().delete()
+
+    def login(self, email, ip='10.0.0.1'):
+        return self.client.post(reverse('login'), {'username': email, 'password': u'wrong'}, REMOTE_ADDR=ip)
+
+    def test_non_ascii_email(self):
+        email = u'тест@x.ru'
+        self.assertEqual(self.login(email).status_code, 200)
+        for url_name in ('registration', 'password_recovery'):
+            response = self.client.post(reverse(url_name), {'email': email}, REMOTE_ADDR='10.0.0.1')
+            self.assertEqual(response.status_code, 200)
+
+    def test_account_limit_is_per_ip(self):
+        for i in xrange(2):
+            self.assertEqual(self.login(u'victim@example.com').status_code, 200)
+        self.assertEqual(self.login(u'victim@example.com').status_code, 429)
+        # The owner logs in from another address.
+        self.assertEqual(self.login(u'victim@example.com', ip='10.0.0.2').status_code, 200)
+
+    def test_ip_limit(self):
+        for i in xrange(3):
+            self.assertEqual(self.login(u'user{}@example.com'.format(i)).status_code, 200)
+        self.assertEqual(self.login(u'other@example.com').status_code, 429)
+        self.assertEqual(self.login(u'other@example.com', ip='10.0.0.2').status_code, 200)
+
+    def test_email_limit(self):
+        for i in xrange(2):
+            response = self.client.post(reverse('password_recovery'), {'email': u'user@example.com'},
+                                        REMOTE_ADDR='10.0.0.{}'.format(i))
+            self.assertEqual(response.status_code, 200)
+        response = self.client.post(reverse('password_recovery'), {'email': u' USER@example.com'},
+                                    REMOTE_ADDR='10.0.0.9')
+        self.assertEqual(response.status_code, 429)
+
+    def test_counters_are_stored(self):
+        for i in xrange(4):
+            self.login(u'user{}@example.com'.format(i))
+        # Counted in the background, not by the requests.
+        self.assertFalse(RateLimitCounter.objects.exists())
+        flush_counters()
+        self.assertEqual(get_counters()['login'], {'allowed': 3, 'rejected': 1})
+        self.assertEqual(get_counters()['login_account'], {'allowed': 3, 'rejected': 0})
+
+
+class TokenServiceTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(u'user@example.com', u'secret', first_name=u'Иван',
+                                             confirned_registration=False)
+
+    def get_path(self, url):
+        return urlparse.urlparse(url).path
+
+    def test_registration_token(self):
+        token = tokens.make_registration_token(self.user.pk)
+        self.assertEqual(tokens.check_registration_token(token), self.user.pk)
+        self.assertIsNone(tokens.check_registration_token(token[:-1] + ('a' if token[-1] != 'a' else 'b')))
+        self.assertIsNone(tokens.check_registration_token(TokenService().recovery_signer.sign(self.user.pk)))
+        self.assertEqual(tokens.get_registration_urls([self.user.pk]),
+                         {self.user.pk: tokens.get_registration_url(self.user.pk)})
+
+    def test_registration_link_confirms_once(self):
+        path = self.get_path(tokens.get_registration_url(self.user.pk))
+        self.assertEqual(self.client.get(path).status_code, 302)
+        self.assertTrue(User.objects.get(pk=self.user.pk).confirned_registration)
+        self.assertEqual(self.client.get(path).status_code, 404)
+
+    def test_recovery_token_expires(self):
+        token = tokens.make_recovery_token(self.user)
+        self.assertEqual(tokens.check_recovery_token(token), (self.user.pk, self.user.get_last_login_hash()))
+        service = TokenService()
+        service.RECOVERY_MAX_AGE = -1
+        self.assertIsNone(service.check_recovery_token(token))
+
+    def test_recovery_link_is_invalid_after_login(self):
+        path = self.get_path(tokens.get_recovery_url(self.user))
+        self.assertEqual(self.client.get(path).status_code, 200)
+        self.user.last_login = timezone.now() + datetime.timedelta(seconds=1)
+        self.user.save(update_fields=('last_login',))
+        self.assertEqual(self.client.get(path).status_code, 404)
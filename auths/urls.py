@@ -2,7 +2,7 @@
 from django.conf.urls import url, include
 from django.contrib.auth.views import logout
 from auths import views
-from microsocial import settings
+from django.conf import settings
 
 urlpatterns = [
     url(
@@ -2,13 +2,15 @@
 from django.contrib import messages
 from django.contrib.auth import login as auth_login
 from django.contrib.auth.views import login
-from django.core.signing import Signer, BadSignature, TimestampSigner, SignatureExpired
 from django.core.urlresolvers import reverse_lazy
 from django.http import Http404
 from django.shortcuts import redirect
+from django.utils.decorators import method_decorator
 from django.views.generic import TemplateView, RedirectView
 from auths.forms import RegistrationForm, LoginForm, PasswordRecoveryForm, NewPasswordForm
-from microsocial import settings
+from auths.ratelimit import ratelimit
+from auths.tokens import tokens
+from django.conf import settings
 from users.models import User
 from django.utils.translation import ugettext as _
 
@@ -29,6 +31,8 @@ class RegistrationView(TemplateView):
             context['registered_user'] = User.objects.get(pk=self.request.session.pop('registered_user_id'))
         return context
 
+    @method_decorator(ratelimit('registration'))
+    @method_decorator(ratelimit('registration_email', key='email', field='email'))
     def post(self, request, *args, **kwargs):
         if self.form.is_valid():
             user = self.form.save()
@@ -45,12 +49,11 @@ class RegistrationConfirmView(RedirectView):
     def dispatch(self, request, *args, **kwargs):
         if request.user.is_authenticated():
             raise Http404
-        try:
-            user_id = Signer(salt='registration-confirm').unsign(kwargs['token'])
-        except BadSignature:
+        user_id = tokens.check_registration_token(kwargs['token'])
+        if user_id is None:
             raise Http404
-        user = User.objects.get(pk=user_id)
-        if user.confirned_registration:
+        user = User.objects.filter(pk=user_id, confirned_registration=False).first()
+        if user is None:
             raise Http404
         user.confirned_registration = True
         user.save(update_fields=('confirned_registration',))
@@ -58,6 +61,8 @@ class RegistrationConfirmView(RedirectView):
         return super(RegistrationConfirmView, self).dispatch(request, *args, **kwargs)
 
 
+@ratelimit('login')
+@ratelimit('login_account', key='ip_email', field='username')
 def login_view(request):
     if request.user.is_authenticated():
         return redirect('main')
@@ -80,6 +85,8 @@ class PasswordRecoveryView(TemplateView):
             context['pwd_recovery_user'] = User.objects.get(pk=self.request.session.pop('pwd_recovery_user'))
         return context
 
+    @method_decorator(ratelimit('password_recovery'))
+    @method_decorator(ratelimit('password_recovery_email', key='email', field='email'))
     def post(self, request, *args, **kwargs):
         if self.form.is_valid():
             user = self.form.get_user()
@@ -95,13 +102,12 @@ class PasswordRecoveryConfirmView(TemplateView):
     def dispatch(self, request, *args, **kwargs):
         if request.user.is_authenticated():
             return redirect('main')
-        try:
-            data = TimestampSigner(salt='password-recovery-confirm').unsign(kwargs['token'], max_age=48*3600)
-            user_id, last_login_hash = data.split(':')
-        except (BadSignature, SignatureExpired, ValueError):
+        token_data = tokens.check_recovery_token(kwargs['token'])
+        if token_data is None:
             raise Http404
-        user = User.objects.get(pk=user_id)
-        if user.get_last_login_hash() != last_login_hash:
+        user_id, last_login_hash = token_data
+        user = User.objects.filter(pk=user_id).first()
+        if user is None or user.get_last_login_hash() != last_login_hash:
             raise Http404
         if not user.confirned_registration:
             user.confirned_registration = True
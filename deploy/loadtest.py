@@ -0,0 +1,232 @@
+# coding=utf-8
+"""
+Load test of the uWSGI profile in deploy/uwsgi.ini. For every
+``processes x threads`` combination of the matrix it starts uWSGI with an HTTP
+socket, requests the given paths from ``--concurrency`` client threads for
+``--duration`` seconds and reports throughput, latency percentiles and the
+memory of the workers (PSS, so pages shared copy-on-write with the master are
+split between the processes that share them).
+
+    python deploy/loadtest.py / /news/ /profile/1/
+    python deploy/loadtest.py --matrix 2x1,2x4,4x2 --cookie 'sessionid=...' /news/
+
+The recommended combination is the one with the least memory among those
+within 5% of the best throughput whose p99 latency stays under ``--max-p99``.
+The client shares the machine with the server; with many cores run it with
+``--url`` from another machine against a server started by hand.
+"""
+from __future__ import print_function, division
+
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+try:
+    import httplib
+    from urlparse import urlsplit
+except ImportError:
+    import http.client as httplib
+    from urllib.parse import urlsplit
+
+DEPLOY_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def default_matrix(cores):
+    return ['{}x{}'.format(processes, threads)
+            for processes in sorted(set((max(1, cores // 2), cores, cores * 2)))
+            for threads in (1, 2, 4)]
+
+
+def request_loop(host, port, paths, headers, deadline, results):
+    latencies, errors = [], 0
+    i = 0
+    while time.time() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        started = time.time()
+        try:
+            connection = httplib.HTTPConnection(host, port, timeout=30)
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            connection.close()
+        except (socket.error, httplib.HTTPException):
+            errors += 1
+            continue
+        if response.status >= 400:
+            errors += 1
+        else:
+            latencies.append(time.time() - started)
+    results.append((latencies, errors))
+
+
+def run_load(host, port, paths, headers, concurrency, duration):
+    results = []
+    deadline = time.time() + duration
+    threads = [threading.Thread(target=request_loop, args=(host, port, paths, headers, deadline, results))
+               for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencies = sorted(latency for thread_latencies, errors in results for latency in thread_latencies)
+    errors = sum(errors for thread_latencies, errors in results)
+    return latencies, errors
+
+
+def percentile(values, percent):
+    if not values:
+        return float('nan')
+    return values[min(len(values) - 1, len(values) * percent // 100)]
+
+
+def get_children(pid):
+    children = []
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open('/proc/{}/stat'.format(name)) as stat:
+                # The command name in parentheses may contain spaces.
+                ppid = int(stat.read().rsplit(')', 1)[1].split()[1])
+        except (IOError, OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            children.append(int(name))
+    return children
+
+
+def get_pss(pid):
+    """
+    Returns the proportional set size of a process in bytes, None where
+    /proc/<pid>/smaps is not available.
+    """
+    total = 0
+    try:
+        with open('/proc/{}/smaps'.format(pid)) as smaps:
+            for line in smaps:
+                if line.startswith('Pss:'):
+                    total += int(line.split()[1]) * 1024
+    except (IOError, OSError):
+        return None
+    return total
+
+
+def wait_for_port(host, port, process, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return True
+        except socket.error:
+            time.sleep(0.2)
+    return False
+
+
+def start_uwsgi(args, processes, threads, port, log):
+    env = dict(os.environ)
+    # Keeps the production socket of the config free.
+    env['MICROSOCIAL_UWSGI_SOCKET'] = os.path.join(tempfile.gettempdir(), 'microsocial-loadtest.sock')
+    command = [args.uwsgi, '--ini', os.path.join(DEPLOY_DIR, 'uwsgi.ini'),
+               '--processes', str(processes), '--threads', str(threads),
+               '--http-socket', '127.0.0.1:{}'.format(port)]
+    return subprocess.Popen(command, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def measure(args, host, port, headers, label, master_pid=None):
+    if args.warmup:
+        run_load(host, port, args.paths, headers, args.concurrency, args.warmup)
+    started = time.time()
+    latencies, errors = run_load(host, port, args.paths, headers, args.concurrency, args.duration)
+    elapsed = time.time() - started
+    memory = None
+    if master_pid is not None:
+        sizes = [get_pss(pid) for pid in [master_pid] + get_children(master_pid)]
+        if None not in sizes:
+            memory = sum(sizes)
+    return {
+        'label': label,
+        'rps': len(latencies) / elapsed,
+        'p50': percentile(latencies, 50) * 1000,
+        'p90': percentile(latencies, 90) * 1000,
+        'p99': percentile(latencies, 99) * 1000,
+        'errors': errors,
+        'memory': memory,
+    }
+
+
+def print_row(row):
+    print('{:<10} {:>9.1f} {:>9.1f} {:>9.1f} {:>9.1f} {:>7} {:>9}'.format(
+        row['label'], row['rps'], row['p50'], row['p90'], row['p99'], row['errors'],
+        '-' if row['memory'] is None else '{:.1f}'.format(row['memory'] / 1024.0 / 1024)))
+
+
+def recommend(rows, max_p99):
+    candidates = [row for row in rows if row['p99'] <= max_p99 and not row['errors']]
+    if not candidates:
+        return None
+    best = max(row['rps'] for row in candidates)
+    close = [row for row in candidates if row['rps'] >= best * 0.95]
+    return min(close, key=lambda row: (row['memory'] is None, row['memory'], -row['rps']))
+
+
+def main():
+    cores = multiprocessing.cpu_count()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='+', help='Paths requested in turn.')
+    parser.add_argument('--matrix', default=','.join(default_matrix(cores)),
+                        help='Comma separated PROCESSESxTHREADS combinations (default for {} cores: '
+                             '%(default)s).'.format(cores))
+    parser.add_argument('--concurrency', type=int, default=cores * 8, help='Client threads (default: %(default)s).')
+    parser.add_argument('--duration', type=int, default=15, help='Seconds measured per combination.')
+    parser.add_argument('--warmup', type=int, default=3, help='Seconds of unmeasured load before measuring.')
+    parser.add_argument('--max-p99', type=float, default=500, help='Latency limit for the recommendation, ms.')
+    parser.add_argument('--cookie', help='Cookie header sent with every request, e.g. a session of a test user.')
+    parser.add_argument('--port', type=int, default=8091, help='Port of the HTTP socket of the started uWSGI.')
+    parser.add_argument('--uwsgi', default='uwsgi', help='uWSGI executable.')
+    parser.add_argument('--url', help='Measure a running server at this URL instead of starting uWSGI.')
+    args = parser.parse_args()
+    headers = {'Cookie': args.cookie} if args.cookie else {}
+
+    print('{:<10} {:>9} {:>9} {:>9} {:>9} {:>7} {:>9}'.format(
+        'config', 'req/s', 'p50, ms', 'p90, ms', 'p99, ms', 'errors', 'PSS, MB'))
+    if args.url:
+        url = urlsplit(args.url)
+        print_row(measure(args, url.hostname, url.port or 80, headers, 'server'))
+        return
+
+    rows = []
+    with open(os.path.join(tempfile.gettempdir(), 'microsocial-loadtest.log'), 'w') as log:
+        for combination in args.matrix.split(','):
+            processes, threads = [int(value) for value in combination.lower().split('x')]
+            process = start_uwsgi(args, processes, threads, args.port, log)
+            try:
+                if not wait_for_port('127.0.0.1', args.port, process, 60):
+                    sys.exit('uWSGI did not start, see {}'.format(log.name))
+                row = measure(args, '127.0.0.1', args.port, headers, combination, process.pid)
+            finally:
+                process.send_signal(signal.SIGTERM)
+                process.wait()
+            rows.append(row)
+            print_row(row)
+
+    best = recommend(rows, args.max_p99)
+    print()
+    if best is None:
+        print('No combination kept p99 under {:.0f} ms without errors.'.format(args.max_p99))
+    else:
+        print('Recommended for {} cores: processes = {}, threads = {}'.format(
+            cores, *best['label'].lower().split('x')))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,24 @@
 # coding=utf-8
 from django.contrib import admin
 from dialogs.models import Dialog, Message
+from microsocial.admin import EstimatedCountPaginator
 
 
-admin.site.register((Dialog, Message))
+class DialogAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'user1', 'user2', 'last_message')
+    list_select_related = ('user1', 'user2', 'last_message')
+    raw_id_fields = ('user1', 'user2', 'last_message')
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+
+
+class MessageAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'sender', 'dialog', 'created')
+    list_select_related = ('sender', 'dialog')
+    raw_id_fields = ('sender', 'dialog')
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+
+
+admin.site.register(Dialog, DialogAdmin)
+admin.site.register(Message, MessageAdmin)
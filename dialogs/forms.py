@@ -1,11 +1,12 @@
 # coding=utf-8
 from django import forms
 from dialogs.models import Message
-from microsocial.forms import BootstrapFormMixin
+from microsocial.forms import bootstrap_form
 from django.utils.translation import ugettext_lazy as _
 
 
-class MessageForm(forms.ModelForm, BootstrapFormMixin):
+@bootstrap_form
+class MessageForm(forms.ModelForm):
     class Meta:
         model = Message
         fields = ('text',)
@@ -13,9 +14,11 @@ class MessageForm(forms.ModelForm, BootstrapFormMixin):
             'text': forms.Textarea(attrs={'rows': 4, 'placeholder': _(u'введите сообщение')})
         }
 
-    def __init__(self, *args, **kwargs):
-        super(MessageForm, self).__init__(*args, **kwargs)
-        BootstrapFormMixin.__init__(self)
-
     def clean_text(self):
         return self.cleaned_data['text'].strip()
+
+
+@bootstrap_form
+class MessageSearchForm(forms.Form):
+    q = forms.CharField(label=_(u'поиск'), max_length=200, required=False,
+                        widget=forms.TextInput(attrs={'placeholder': _(u'поиск по сообщениям')}))
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+from django.conf import settings
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Dialog',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+            ],
+            options={
+            },
+            bases=(models.Model,),
+        ),
+        migrations.CreateModel(
+            name='Message',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('text', models.TextField(max_length=2000)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('dialog', models.ForeignKey(related_name='messages', to='dialogs.Dialog')),
+                ('sender', models.ForeignKey(related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ('-created',),
+            },
+            bases=(models.Model,),
+        ),
+        migrations.AddField(
+            model_name='dialog',
+            name='last_message',
+            field=models.ForeignKey(related_name='+', blank=True, to='dialogs.Message', null=True),
+            preserve_default=True,
+        ),
+        migrations.AddField(
+            model_name='dialog',
+            name='user1',
+            field=models.ForeignKey(related_name='+', to=settings.AUTH_USER_MODEL),
+            preserve_default=True,
+        ),
+        migrations.AddField(
+            model_name='dialog',
+            name='user2',
+            field=models.ForeignKey(related_name='+', to=settings.AUTH_USER_MODEL),
+            preserve_default=True,
+        ),
+        migrations.AlterUniqueTogether(
+            name='dialog',
+            unique_together=set([('user1', 'user2')]),
+        ),
+    ]
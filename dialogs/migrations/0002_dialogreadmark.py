@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+from django.conf import settings
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('dialogs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DialogReadMark',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('message_id', models.PositiveIntegerField(default=0)),
+                ('dialog', models.ForeignKey(related_name='read_marks', to='dialogs.Dialog')),
+                ('user', models.ForeignKey(related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+            },
+            bases=(models.Model,),
+        ),
+        migrations.AlterUniqueTogether(
+            name='dialogreadmark',
+            unique_together=set([('user', 'dialog')]),
+        ),
+    ]
@@ -1,8 +1,8 @@
 # coding=utf-8
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction, IntegrityError
 from django.db.models import Q
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_migrate
 from django.dispatch import receiver
 
 
@@ -49,7 +49,55 @@ class Message(models.Model):
         return 'Message #{}'.format(self.pk)
 
 
+class DialogReadMarkManager(models.Manager):
+    def get_marks(self, user, dialog_ids):
+        return dict(self.filter(user=user, dialog_id__in=dialog_ids).values_list('dialog_id', 'message_id'))
+
+    def mark_read(self, user, dialog, message_id):
+        """
+        Moves the mark of ``user`` in ``dialog`` forward to ``message_id``; a
+        single read when it is there already.
+        """
+        if not message_id:
+            return
+        mark = self.filter(user=user, dialog=dialog).values_list('message_id', flat=True).first()
+        if mark is None:
+            try:
+                with transaction.atomic():
+                    self.create(user=user, dialog=dialog, message_id=message_id)
+                return
+            except IntegrityError:
+                pass
+        elif mark >= message_id:
+            return
+        self.filter(user=user, dialog=dialog, message_id__lt=message_id).update(message_id=message_id)
+
+
+class DialogReadMark(models.Model):
+    """
+    Id of the last message ``user`` has seen in ``dialog``: messages with a
+    bigger id are unread. One row per user and dialog instead of a flag per
+    message.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='+')
+    dialog = models.ForeignKey(Dialog, related_name='read_marks')
+    message_id = models.PositiveIntegerField(default=0)
+
+    objects = DialogReadMarkManager()
+
+    class Meta:
+        unique_together = ('user', 'dialog')
+
+
 @receiver(post_save, sender=Message)
 def update_last_message(sender, instance, **kwargs):
     instance.dialog.last_message = instance
     instance.dialog.save(update_fields=('last_message',))
+
+
+@receiver(post_migrate)
+def install_message_search(sender, using, **kwargs):
+    if sender.label == 'dialogs':
+        from dialogs.search import install
+
+        install(using)
@@ -0,0 +1,146 @@
+# coding=utf-8
+"""
+Full-text search over the messages of a user's dialogs.
+
+On SQLite the index is an FTS5 table with ``dialogs_message`` as external
+content, kept up to date by triggers. On PostgreSQL it is a GIN index over
+``to_tsvector(MESSAGE_SEARCH_CONFIG, text)``. Both are created after migrate.
+Without an index, e.g. on SQLite builds without FTS5, search falls back to
+``icontains``.
+
+Results are ordered by relevance divided by ``1 + age / MESSAGE_SEARCH_RECENCY_DAYS``,
+so among equally relevant messages the newer come first.
+"""
+from django.conf import settings
+from django.db import connections, DatabaseError, DEFAULT_DB_ALIAS
+from django.db.models import Q
+from dialogs.models import Message
+
+FTS_TABLE = 'dialogs_message_fts'
+GIN_INDEX = 'dialogs_message_text_fts'
+
+SQLITE_INSTALL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(text, content='{table}', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+    "INSERT INTO {fts}(rowid, text) VALUES (new.id, new.text); END",
+    "CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+    "INSERT INTO {fts}({fts}, rowid, text) VALUES ('delete', old.id, old.text); END",
+    "CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF text ON {table} BEGIN "
+    "INSERT INTO {fts}({fts}, rowid, text) VALUES ('delete', old.id, old.text); "
+    "INSERT INTO {fts}(rowid, text) VALUES (new.id, new.text); END",
+)
+
+SQLITE_SEARCH = """
+    SELECT m.id FROM {fts} f
+    JOIN {table} m ON m.id = f.rowid
+    JOIN {dialog_table} d ON d.id = m.dialog_id
+    WHERE {fts} MATCH %s AND (d.user1_id = %s OR d.user2_id = %s)
+    ORDER BY -bm25({fts}) / (1 + (julianday('now') - julianday(m.created)) / %s) DESC
+    LIMIT %s
+"""
+
+POSTGRESQL_INSTALL = (
+    "CREATE INDEX {index} ON {table} USING GIN (to_tsvector('{config}', text))",
+)
+
+POSTGRESQL_SEARCH = """
+    SELECT m.id FROM {table} m
+    JOIN {dialog_table} d ON d.id = m.dialog_id
+    WHERE to_tsvector('{config}', m.text) @@ plainto_tsquery('{config}', %s) AND (d.user1_id = %s OR d.user2_id = %s)
+    ORDER BY ts_rank(to_tsvector('{config}', m.text), plainto_tsquery('{config}', %s)) /
+             (1 + EXTRACT(EPOCH FROM now() - m.created) / 86400 / %s) DESC
+    LIMIT %s
+"""
+
+
+def format_sql(sql):
+    return sql.format(
+        fts=FTS_TABLE,
+        index=GIN_INDEX,
+        table=Message._meta.db_table,
+        dialog_table=Message._meta.get_field('dialog').rel.to._meta.db_table,
+        config=settings.MESSAGE_SEARCH_CONFIG,
+    )
+
+
+# {(alias, database name): installed}, read once per process: the index is
+# created by migrate, which runs before the workers start.
+_installed = {}
+
+
+def get_installed_key(connection):
+    return connection.alias, connection.settings_dict['NAME']
+
+
+def is_installed(connection):
+    key = get_installed_key(connection)
+    if key not in _installed:
+        _installed[key] = _is_installed(connection)
+    return _installed[key]
+
+
+def _is_installed(connection):
+    cursor = connection.cursor()
+    if connection.vendor == 'sqlite':
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+    elif connection.vendor == 'postgresql':
+        cursor.execute('SELECT 1 FROM pg_indexes WHERE indexname = %s', [GIN_INDEX])
+    else:
+        return False
+    return cursor.fetchone() is not None
+
+
+def install(using=DEFAULT_DB_ALIAS):
+    """
+    Creates the search index and indexes the existing messages. Returns False
+    when the database cannot have one.
+    """
+    connection = connections[using]
+    if is_installed(connection):
+        return True
+    if connection.vendor == 'sqlite':
+        statements = SQLITE_INSTALL + ("INSERT INTO {fts}({fts}) VALUES ('rebuild')",)
+    elif connection.vendor == 'postgresql':
+        statements = POSTGRESQL_INSTALL
+    else:
+        return False
+    cursor = connection.cursor()
+    try:
+        for sql in statements:
+            cursor.execute(format_sql(sql))
+    except DatabaseError:
+        # SQLite compiled without FTS5.
+        return False
+    _installed[get_installed_key(connection)] = True
+    return True
+
+
+def fts5_query(query):
+    # Every word becomes a quoted string, so FTS5 operators in the input are
+    # matched literally; the words are combined with AND.
+    return u' '.join(u'"{}"'.format(word.replace(u'"', u'""')) for word in query.split())
+
+
+def search_messages(user, query, limit=50):
+    """
+    Returns up to ``limit`` messages of the dialogs of ``user`` that match
+    ``query``, best first.
+    """
+    query = query.strip()
+    if not query:
+        return []
+    connection = connections[Message.objects.db]
+    if not is_installed(connection):
+        return list(Message.objects.filter(
+            Q(dialog__user1=user) | Q(dialog__user2=user), text__icontains=query
+        ).select_related('sender', 'dialog__user1', 'dialog__user2').order_by('-pk')[:limit])
+    recency = settings.MESSAGE_SEARCH_RECENCY_DAYS
+    if connection.vendor == 'sqlite':
+        sql, params = SQLITE_SEARCH, [fts5_query(query), user.pk, user.pk, recency, limit]
+    else:
+        sql, params = POSTGRESQL_SEARCH, [query, user.pk, user.pk, query, recency, limit]
+    cursor = connection.cursor()
+    cursor.execute(format_sql(sql), params)
+    ids = [row[0] for row in cursor.fetchall()]
+    messages = Message.objects.select_related('sender', 'dialog__user1', 'dialog__user2').in_bulk(ids)
+    return [messages[pk] for pk in ids if pk in messages]
@@ -0,0 +1,66 @@
+# coding=utf-8
+import json
+from django.core.urlresolvers import reverse
+from django.db import connections
+from django.test import TestCase
+from dialogs.models import Dialog, DialogReadMark, Message
+from dialogs.search import is_installed, search_messages
+from users.export import export_user_data
+from users.models import User
+
+
+class MessageSearchTest(TestCase):
+    def setUp(self):
+        self.a, self.b, self.c = [User.objects.create_user(u'user{}@example.com'.format(i), first_name=u'user')
+                                  for i in xrange(3)]
+        dialog = Dialog.objects.create(user1=self.a, user2=self.b)
+        self.message = Message.objects.create(sender=self.a, dialog=dialog, text=u'встреча в пятницу')
+        other = Dialog.objects.create(user1=self.b, user2=self.c)
+        Message.objects.create(sender=self.c, dialog=other, text=u'встреча в субботу')
+
+    def test_searches_dialogs_of_the_user(self):
+        self.assertEqual(search_messages(self.a, u'встреча'), [self.message])
+        self.assertEqual(len(search_messages(self.b, u'встреча')), 2)
+        self.assertEqual(search_messages(self.a, u'  '), [])
+
+    def test_is_installed_is_read_once(self):
+        connection = connections[Message.objects.db]
+        is_installed(connection)
+        with self.assertNumQueries(0):
+            is_installed(connection)
+
+
+class DialogReadTest(TestCase):
+    def setUp(self):
+        self.a = User.objects.create_user(u'a@example.com', u'secret', first_name=u'a')
+        self.b = User.objects.create_user(u'b@example.com', u'secret', first_name=u'b')
+        self.dialog = Dialog.objects.create(user1=self.a, user2=self.b)
+        self.message = Message.objects.create(sender=self.b, dialog=self.dialog, text=u'привет')
+        self.client.login(username=u'a@example.com', password=u'secret')
+
+    def get_mark(self, user):
+        return DialogReadMark.objects.get_marks(user, [self.dialog.pk]).get(self.dialog.pk)
+
+    def test_get_does_not_mark_read(self):
+        response = self.client.get(reverse('messages', kwargs={'user_id': self.b.pk}))
+        self.assertEqual(response.context['unread_id'], self.message.pk)
+        self.assertIsNone(self.get_mark(self.a))
+
+    def test_post_marks_read_up_to_the_last_message(self):
+        url = reverse('messages_read', kwargs={'user_id': self.b.pk})
+        response = self.client.post(url, {'message_id': self.message.pk + 10}, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.get_mark(self.a), self.message.pk)
+        response = self.client.get(reverse('messages', kwargs={'user_id': self.b.pk}))
+        self.assertNotIn('unread_id', response.context)
+        self.assertEqual(self.client.post(url, {'message_id': 'x'}).status_code, 400)
+
+    def test_sending_marks_read(self):
+        self.client.post(reverse('messages', kwargs={'user_id': self.b.pk}), {'text': u'ответ'})
+        self.assertEqual(self.get_mark(self.a), Dialog.objects.get(pk=self.dialog.pk).last_message_id)
+
+    def test_read_marks_are_exported(self):
+        DialogReadMark.objects.mark_read(self.a, self.dialog, self.message.pk)
+        lines = [json.loads(line) for line in ''.join(export_user_data(self.a)).splitlines()]
+        self.assertIn({'type': 'read_mark', 'pk': DialogReadMark.objects.get().pk, 'dialog_id': self.dialog.pk,
+                       'message_id': self.message.pk}, lines)
@@ -14,4 +14,9 @@ urlpatterns = [
         views.DialogView.as_view(),
         name='messages'
     ),
+    url(
+        r'^messages/(?P<user_id>\d+)/read/$',
+        views.DialogReadView.as_view(),
+        name='messages_read'
+    ),
 ]
\ No newline at end of file
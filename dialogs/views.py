@@ -1,17 +1,23 @@
 # coding=utf-8
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
-from django.http import Http404
+from django.db.models import Max, Q, Sum
+from django.http import Http404, HttpResponse, HttpResponseBadRequest
 from django.shortcuts import get_object_or_404, redirect
 from django.utils.decorators import method_decorator
-from django.views.generic.base import TemplateView
+from django.views.decorators.http import require_POST
+from django.views.generic.base import TemplateView, View
 
-from dialogs.forms import MessageForm
-from dialogs.models import Dialog
+from dialogs.forms import MessageForm, MessageSearchForm
+from dialogs.models import Dialog, DialogReadMark
+from dialogs.search import search_messages
+from microsocial.views import ConditionalGetMixin, get_row_stamp
+from users import presence
 
 
-class DialogView(TemplateView):
+class DialogView(ConditionalGetMixin, TemplateView):
     template_name = 'dialogs/dialog.html'
 
     @method_decorator(login_required)
@@ -27,6 +33,14 @@ class DialogView(TemplateView):
             self.form = MessageForm(request.POST or None)
         return super(DialogView, self).dispatch(request, *args, **kwargs)
 
+    def get_etag_stamps(self):
+        last_message_id = Dialog.objects.for_user(self.request.user).aggregate(Max('last_message'))['last_message__max']
+        # Marks only grow, so their sum changes whenever one of them moves.
+        marks = DialogReadMark.objects.filter(
+            Q(user=self.request.user) | Q(dialog=self.dialog)
+        ).aggregate(Sum('message_id'))['message_id__sum']
+        return last_message_id, marks, self.opponent and get_row_stamp(self.opponent)
+
     def get_dialogs(self):
         qs = Dialog.objects.for_user(self.request.user).select_related('user1', 'user2').filter(
             last_message__isnull=False
@@ -39,6 +53,10 @@ class DialogView(TemplateView):
             items = paginator.page(1)
         except EmptyPage:
             items = paginator.page(paginator.num_pages)
+        presence.attach([dialog.get_opponent(self.request.user) for dialog in items] + [self.opponent])
+        marks = DialogReadMark.objects.get_marks(self.request.user, [dialog.pk for dialog in items])
+        for dialog in items:
+            dialog.is_unread = dialog.last_message_id > marks.get(dialog.pk, 0)
         return items
 
     def get_messages(self):
@@ -60,6 +78,22 @@ class DialogView(TemplateView):
         context['opponent'] = self.opponent
         context['dialog_messages'] = self.get_messages()
         context['form'] = self.form
+        if self.dialog:
+            # Own messages up to this id have been seen by the opponent.
+            context['opponent_read_id'] = DialogReadMark.objects.get_marks(
+                self.opponent, [self.dialog.pk]
+            ).get(self.dialog.pk, 0)
+            # The page posts this id to DialogReadView once it is shown.
+            if self.dialog.last_message_id > DialogReadMark.objects.get_marks(
+                self.request.user, [self.dialog.pk]
+            ).get(self.dialog.pk, 0):
+                context['unread_id'] = self.dialog.last_message_id
+        search_form = MessageSearchForm(self.request.GET or None)
+        context['search_form'] = search_form
+        if search_form.is_valid() and search_form.cleaned_data['q']:
+            context['search_query'] = search_form.cleaned_data['q']
+            context['search_results'] = search_messages(self.request.user, context['search_query'],
+                                                        settings.MESSAGE_SEARCH_LIMIT)
         return context
 
     def post(self, request, *args, **kwargs):
@@ -68,5 +102,30 @@ class DialogView(TemplateView):
             message.dialog = self.dialog
             message.sender = request.user
             message.save()
+            DialogReadMark.objects.mark_read(request.user, self.dialog, message.pk)
             return redirect(request.path)
         return self.get(request, *args, **kwargs)
+
+
+class DialogReadView(View):
+    """
+    Marks the messages of the dialog with ``user_id`` up to the posted
+    ``message_id`` as read. The dialog page posts here after it is shown, so
+    its GET requests change nothing.
+    """
+    @method_decorator(login_required)
+    @method_decorator(require_POST)
+    def dispatch(self, request, *args, **kwargs):
+        opponent = get_object_or_404(get_user_model(), pk=kwargs['user_id'])
+        if opponent == request.user:
+            raise Http404
+        dialog = get_object_or_404(Dialog.objects.for_user(request.user).filter(Q(user1=opponent) | Q(user2=opponent)))
+        try:
+            message_id = int(request.POST.get('message_id', ''))
+        except ValueError:
+            return HttpResponseBadRequest()
+        # Messages the page cannot have shown stay unread.
+        DialogReadMark.objects.mark_read(request.user, dialog, min(message_id, dialog.last_message_id or 0))
+        if request.is_ajax():
+            return HttpResponse(status=204)
+        return redirect('messages', user_id=opponent.pk)
@@ -0,0 +1,39 @@
+# coding=utf-8
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from microsocial.models import OutgoingEmail
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Takes the size of unfiltered changelists of big PostgreSQL tables from the
+    planner statistics, as COUNT(*) reads the whole table. Filtered lists, small
+    tables and other backends get the exact count.
+    """
+    estimate_above = 100000
+
+    def _get_count(self):
+        if self._count is None:
+            qs = self.object_list
+            connection = connections[qs.db]
+            if connection.vendor == 'postgresql' and not qs.query.where:
+                cursor = connection.cursor()
+                cursor.execute('SELECT reltuples FROM pg_class WHERE relname = %s', [qs.model._meta.db_table])
+                row = cursor.fetchone()
+                if row and row[0] > self.estimate_above:
+                    self._count = int(row[0])
+            if self._count is None:
+                self._count = super(EstimatedCountPaginator, self)._get_count()
+        return self._count
+    count = property(_get_count)
+
+
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'recipients', 'status', 'attempts', 'created', 'next_attempt')
+    list_filter = ('status',)
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+
+
+admin.site.register(OutgoingEmail, OutgoingEmailAdmin)
@@ -0,0 +1,73 @@
+# coding=utf-8
+"""
+Cache backend over the cache2 subsystem of uWSGI. ``LOCATION`` names a cache
+declared with ``cache2`` in the uWSGI config (see deploy/uwsgi.ini); it lives
+in shared memory, so all workers of an instance see the same entries and
+invalidations without a separate cache server.
+
+The backend only works in processes started by uWSGI. Values that do not fit
+the cache are silently not stored, and ``incr``/``decr`` are not atomic.
+"""
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT, InvalidCacheBackendError
+from django.utils.encoding import force_bytes
+from django.utils.six.moves import cPickle as pickle
+
+
+class UWSGICache(BaseCache):
+    def __init__(self, name, params):
+        super(UWSGICache, self).__init__(params)
+        try:
+            import uwsgi
+        except ImportError:
+            raise InvalidCacheBackendError('UWSGICache is only available in processes started by uWSGI.')
+        self.uwsgi = uwsgi
+        self.cache_name = name
+
+    def get_uwsgi_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return force_bytes(key)
+
+    def get_expires(self, timeout=DEFAULT_TIMEOUT):
+        """
+        Returns the lifetime in whole seconds, 0 for entries that never expire
+        and None for entries that expire at once.
+        """
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return 0
+        if timeout <= 0:
+            return None
+        return max(1, int(round(timeout)))
+
+    def get(self, key, default=None, version=None):
+        value = self.uwsgi.cache_get(self.get_uwsgi_key(key, version), self.cache_name)
+        if value is None:
+            return default
+        return pickle.loads(value)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.get_uwsgi_key(key, version)
+        expires = self.get_expires(timeout)
+        if expires is None:
+            self.uwsgi.cache_del(key, self.cache_name)
+            return
+        self.uwsgi.cache_update(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires, self.cache_name)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.get_uwsgi_key(key, version)
+        expires = self.get_expires(timeout)
+        if expires is None:
+            return not self.uwsgi.cache_exists(key, self.cache_name)
+        # cache_set does not overwrite an existing entry.
+        return bool(self.uwsgi.cache_set(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires, self.cache_name))
+
+    def delete(self, key, version=None):
+        self.uwsgi.cache_del(self.get_uwsgi_key(key, version), self.cache_name)
+
+    def has_key(self, key, version=None):
+        return bool(self.uwsgi.cache_exists(self.get_uwsgi_key(key, version), self.cache_name))
+
+    def clear(self):
+        self.uwsgi.cache_clear(self.cache_name)
@@ -0,0 +1,50 @@
+# coding=utf-8
+import random
+import threading
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_state = threading.local()
+# Reads os.urandom, so it has no state to be copied into the workers of a
+# preforking server; with the module-level generator they all would pick the
+# same sequence of replicas.
+_random = random.SystemRandom()
+
+
+def use_replica():
+    """
+    Sends the reads of the current thread to a replica picked at random, the
+    same one until ``use_primary()``. Returns the alias, None without replicas.
+    """
+    replicas = getattr(settings, 'DATABASE_REPLICAS', ())
+    _state.replica = _random.choice(replicas) if replicas else None
+    return _state.replica
+
+
+def use_primary():
+    _state.replica = None
+
+
+def get_replica():
+    return getattr(_state, 'replica', None)
+
+
+class ReplicaRouter(object):
+    """
+    Sends writes to the primary (``default``). Reads go to the primary too,
+    except in threads switched to a replica with ``use_replica()``, which
+    ``ReplicaPinningMiddleware`` does for the views of ``REPLICA_READ_VIEWS``.
+    Inside a transaction reads stay on the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        replica = get_replica()
+        if replica is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
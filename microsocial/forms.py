@@ -1,17 +1,43 @@
 # coding=utf-8
 from __future__ import absolute_import
+import copy
+from collections import OrderedDict
 from django import forms
 
 
-class BootstrapFormMixin:
-    def __init__(self):
-        for field_name, field in self.fields.iteritems():
-            if not isinstance(field.widget, (forms.TextInput, forms.Textarea, forms.Select, forms.FileInput)):
-                continue
-            attrs = field.widget.attrs
-            if 'class' in attrs:
-                if attrs['class']:
-                    attrs['class'] += ' '
-            else:
-                attrs['class'] = ''
-            attrs['class'] += 'form-control'
+def bootstrap_form(form_class=None, field_order=None):
+    """
+    Class decorator adding the ``form-control`` class to the widgets of the
+    form once, at class creation. Forms copy ``base_fields`` on instantiation,
+    so instances need no further work. The fields are copied here too, to leave
+    the fields of parent forms untouched.
+
+    ``@bootstrap_form(field_order=(...))`` also moves the named fields to the
+    front in that order; redeclared fields keep the position of the field they
+    replace.
+    """
+    if form_class is None:
+        return lambda form_class: bootstrap_form(form_class, field_order)
+    base_fields = copy.deepcopy(form_class.base_fields)
+    if field_order:
+        form_class.base_fields = OrderedDict((name, base_fields.pop(name)) for name in field_order)
+        form_class.base_fields.update(base_fields)
+    else:
+        form_class.base_fields = base_fields
+    for field in form_class.base_fields.itervalues():
+        if not isinstance(field.widget, (forms.TextInput, forms.Textarea, forms.Select, forms.FileInput)):
+            continue
+        classes = field.widget.attrs.get('class', '').split()
+        if 'form-control' not in classes:
+            field.widget.attrs['class'] = ' '.join(classes + ['form-control'])
+    return form_class
+
+
+def with_validators(field, *validators):
+    """
+    Returns a copy of the inherited ``field`` with ``validators`` added, to
+    redeclare it in a subclass.
+    """
+    field = copy.deepcopy(field)
+    field.validators.extend(validators)
+    return field
@@ -0,0 +1,47 @@
+# coding=utf-8
+"""
+Dump format of ``manage.py export_graph`` and ``import_graph``: JSON lines,
+where an object line ``{"table": ..., "columns": [...]}`` starts a table and
+every following array line is one row of it, in column order. Values are the
+JSON types, dates and times are ISO 8601 strings.
+"""
+import datetime
+import json
+from django.apps import apps
+
+# Tables in dependency order. Dialog and Message refer to each other, so the
+# import relies on deferred constraints.
+GRAPH_MODELS = (
+    'users.User',
+    'users.User_friends',
+    'users.FriendInvite',
+    'users.UserWallPost',
+    'users.FriendInfo',
+    'users.UserWallNewsM2M',
+    'dialogs.Dialog',
+    'dialogs.Message',
+    'dialogs.DialogReadMark',
+)
+
+
+def get_graph_models():
+    return [apps.get_model(label) for label in GRAPH_MODELS]
+
+
+def get_dump_fields(model):
+    """
+    Concrete fields of ``model`` with the primary key first.
+    """
+    fields = list(model._meta.concrete_fields)
+    fields.sort(key=lambda field: not field.primary_key)
+    return fields
+
+
+def encode_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    return value
+
+
+def dumps_line(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')) + u'\n'
@@ -0,0 +1,52 @@
+# coding=utf-8
+"""
+Management utility to measure form instantiation cost.
+"""
+from __future__ import unicode_literals
+
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from auths.forms import RegistrationForm, LoginForm, PasswordRecoveryForm, NewPasswordForm
+from dialogs.forms import MessageForm
+from users.forms import (UserPasswordChangeForm, UserChangeProfileForm, UserEmailChangeForm, UserWallPostForm,
+                         SearchForm)
+from users.models import User
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option('--repeat', type='int', dest='repeat', default=10000,
+                    help='Instances built per form.'),
+    )
+    help = 'Reports the time to build an unbound and a bound instance of every form of the project.'
+
+    def handle(self, *args, **options):
+        # An unsaved user is enough, building the forms runs no queries.
+        user = User(email='benchmark@microsocial.invalid', first_name='Benchmark')
+        data = {'action': 'benchmark'}
+        factories = (
+            ('RegistrationForm', lambda data: RegistrationForm(data)),
+            ('LoginForm', lambda data: LoginForm(data=data)),
+            ('PasswordRecoveryForm', lambda data: PasswordRecoveryForm(data)),
+            ('NewPasswordForm', lambda data: NewPasswordForm(user, data)),
+            ('UserPasswordChangeForm', lambda data: UserPasswordChangeForm(user, data, prefix='password')),
+            ('UserChangeProfileForm', lambda data: UserChangeProfileForm(data, instance=user, prefix='profile')),
+            ('UserEmailChangeForm', lambda data: UserEmailChangeForm(user, data, prefix='email')),
+            ('UserWallPostForm', lambda data: UserWallPostForm(data)),
+            ('SearchForm', lambda data: SearchForm(data)),
+            ('MessageForm', lambda data: MessageForm(data)),
+        )
+        self.stdout.write('{:<24} {:>14} {:>14}'.format('form', 'unbound, us', 'bound, us'))
+        for name, factory in factories:
+            self.stdout.write('{:<24} {:>14.1f} {:>14.1f}'.format(
+                name, self.measure(factory, None, options['repeat']), self.measure(factory, data, options['repeat'])
+            ))
+
+    def measure(self, factory, data, repeat):
+        started = time.time()
+        for i in xrange(repeat):
+            factory(data)
+        return (time.time() - started) / repeat * 1e6
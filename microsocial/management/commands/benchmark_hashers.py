@@ -0,0 +1,45 @@
+# coding=utf-8
+"""
+Management utility to measure password verification speed of every hasher.
+"""
+from __future__ import unicode_literals
+
+import multiprocessing
+import time
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option('--duration', type='float', dest='duration', default=2,
+                    help='Seconds spent on every hasher.'),
+    )
+    help = 'Reports logins per second per core for every hasher in PASSWORD_HASHERS.'
+
+    def handle(self, *args, **options):
+        cores = multiprocessing.cpu_count()
+        self.stdout.write('{:<32} {:>16} {:>16}'.format('hasher', 'logins/s/core', 'logins/s ({} cores)'.format(cores)))
+        for i, hasher_path in enumerate(settings.PASSWORD_HASHERS):
+            hasher = import_string(hasher_path)()
+            name = '{}{}'.format(hasher.algorithm, ' (default)' if i == 0 else '')
+            try:
+                encoded = hasher.encode('benchmark-password', hasher.salt())
+            except ValueError as e:
+                self.stdout.write('{:<32} {}'.format(name, e))
+                continue
+            rate = self.measure(hasher, encoded, options['duration'])
+            self.stdout.write('{:<32} {:>16.1f} {:>16.1f}'.format(name, rate, rate * cores))
+
+    def measure(self, hasher, encoded, duration):
+        count = 0
+        started = time.time()
+        elapsed = 0
+        while elapsed < duration:
+            hasher.verify('benchmark-password', encoded)
+            count += 1
+            elapsed = time.time() - started
+        return count / elapsed
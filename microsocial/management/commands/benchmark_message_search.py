@@ -0,0 +1,73 @@
+# coding=utf-8
+"""
+Management utility to measure message search latency.
+"""
+from __future__ import unicode_literals
+
+import random
+import time
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from dialogs.models import Dialog, Message
+from dialogs.search import search_messages, is_installed
+from users.models import User
+
+WORDS = ('привет', 'как', 'дела', 'встреча', 'завтра', 'проект', 'hello', 'meeting', 'tomorrow', 'photo',
+         'weekend', 'report', 'deadline', 'coffee', 'ticket', 'concert', 'birthday', 'train', 'office', 'call')
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option('--populate', type='int', dest='populate', default=0,
+                    help='First add this many random messages to random dialogs of existing users.'),
+        make_option('--queries', type='int', dest='queries', default=200,
+                    help='Number of searches to run.'),
+        make_option('--batch-size', type='int', dest='batch_size', default=10000,
+                    help='Messages inserted per query with --populate.'),
+    )
+    help = ('Runs random one and two word searches for random users with dialogs and reports latency '
+            'percentiles. --populate grows the table to the size to be measured.')
+
+    def handle(self, *args, **options):
+        if options['populate']:
+            self.populate(options['populate'], options['batch_size'])
+        dialogs = list(Dialog.objects.values_list('user1_id', 'user2_id')[:1000])
+        if not dialogs:
+            raise CommandError('No dialogs to search in.')
+        user_ids = list(set(user_id for pair in dialogs for user_id in pair))
+        users = User.objects.in_bulk(user_ids)
+        self.stdout.write('Index: {}, messages: ~{}'.format(
+            'yes' if is_installed(connections[Message.objects.db]) else 'no (icontains)',
+            Message.objects.order_by('-pk').values_list('pk', flat=True).first() or 0))
+        timings = []
+        found = 0
+        for i in xrange(options['queries']):
+            user = users[random.choice(user_ids)]
+            query = ' '.join(random.sample(WORDS, random.choice((1, 2))))
+            started = time.time()
+            found += len(search_messages(user, query, settings.MESSAGE_SEARCH_LIMIT))
+            timings.append(time.time() - started)
+        timings.sort()
+        self.stdout.write('queries: {}, results per query: {:.1f}'.format(len(timings), found / float(len(timings))))
+        for percentile in (50, 90, 99):
+            self.stdout.write('p{}: {:.1f} ms'.format(
+                percentile, timings[min(len(timings) - 1, len(timings) * percentile // 100)] * 1000))
+
+    def populate(self, count, batch_size):
+        dialogs = list(Dialog.objects.values_list('pk', 'user1_id', 'user2_id'))
+        if not dialogs:
+            raise CommandError('No dialogs to add messages to.')
+        started = time.time()
+        for offset in xrange(0, count, batch_size):
+            messages = []
+            for i in xrange(min(batch_size, count - offset)):
+                dialog_id, user1_id, user2_id = random.choice(dialogs)
+                messages.append(Message(dialog_id=dialog_id, sender_id=random.choice((user1_id, user2_id)),
+                                        text=' '.join(random.choice(WORDS) for j in xrange(random.randint(3, 15)))))
+            # bulk_create sends no post_save, last_message of the dialogs is left as is.
+            Message.objects.bulk_create(messages)
+        self.stdout.write('Added {} messages in {:.1f}s'.format(count, time.time() - started))
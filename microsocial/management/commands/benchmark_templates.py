@@ -0,0 +1,75 @@
+# coding=utf-8
+"""
+Management utility to measure template rendering cost of the main pages.
+"""
+from __future__ import unicode_literals
+
+import time
+from optparse import make_option
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.management.base import BaseCommand, CommandError
+from django.core.urlresolvers import reverse
+from django.template.loader import get_template
+from django.test import RequestFactory
+
+from dialogs.views import DialogView
+from users.models import User
+from users.views import NewsView, UserProfileView
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option('--user', type='int', dest='user_id',
+                    help='Id of the user the pages are rendered for; the first user by default.'),
+        make_option('--profile', type='int', dest='profile_id',
+                    help='Id of the rendered profile and dialog opponent; the viewer by default.'),
+        make_option('--repeat', type='int', dest='repeat', default=200,
+                    help='Renders per page.'),
+    )
+    help = ('Renders news.html, profile.html and dialog.html with real data and reports the time per render. '
+            'Data is loaded once, so only template work is measured.')
+
+    def handle(self, *args, **options):
+        viewer = User.objects.filter(pk=options['user_id']) if options['user_id'] else User.objects.order_by('pk')
+        viewer = viewer.first()
+        if viewer is None:
+            raise CommandError('No user to render the pages for.')
+        profile_id = options['profile_id'] or viewer.pk
+        pages = (
+            ('users/news.html', NewsView, reverse('news'), {}),
+            ('users/profile.html', UserProfileView, reverse('user_profile', args=(profile_id,)),
+             {'user_id': str(profile_id)}),
+            ('dialogs/dialog.html', DialogView, reverse('messages', args=(profile_id,)),
+             {'user_id': str(profile_id)}),
+        )
+        self.stdout.write('Cached loader: {}'.format('on' if settings.TEMPLATE_CACHED else 'off'))
+        self.stdout.write('{:<24} {:>12} {:>12} {:>12}'.format('template', 'load, ms', 'first, ms', 'render, ms'))
+        for name, view_class, path, kwargs in pages:
+            template, context = self.get_template_and_context(viewer, view_class, path, kwargs)
+            # Without the cached loader every request reads and parses the
+            # template and its parents again.
+            started = time.time()
+            for i in xrange(options['repeat']):
+                get_template(name)
+            load = (time.time() - started) / options['repeat']
+            started = time.time()
+            template.render(context)
+            first = time.time() - started
+            started = time.time()
+            for i in xrange(options['repeat']):
+                template.render(context)
+            per_render = (time.time() - started) / options['repeat']
+            self.stdout.write('{:<24} {:>12.2f} {:>12.2f} {:>12.2f}'.format(
+                name, load * 1000, first * 1000, per_render * 1000))
+
+    def get_template_and_context(self, viewer, view_class, path, kwargs):
+        request = RequestFactory().get(path)
+        request.user = viewer
+        request._messages = CookieStorage(request)
+        response = view_class.as_view()(request, **kwargs)
+        # The first render evaluates the querysets of the context, later
+        # renders reuse their results.
+        return (response.resolve_template(response.template_name),
+                response.resolve_context(response.context_data))
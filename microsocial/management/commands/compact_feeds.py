@@ -0,0 +1,155 @@
+# coding=utf-8
+"""
+Management utility to apply the news retention policy.
+"""
+from __future__ import unicode_literals
+
+import datetime
+import time
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from microsocial.utils import keyset_chunks
+from users.models import User, FriendInfo, UserWallNewsM2M, UserWallPost, UserFeed, FriendSuggestionRun
+
+
+def get_used_database_size():
+    """
+    Bytes used by the database, or None when the backend cannot tell. On
+    PostgreSQL freed space shows up only after VACUUM.
+    """
+    cursor = connection.cursor()
+    if connection.vendor == 'sqlite':
+        sizes = []
+        for pragma in ('page_count', 'freelist_count', 'page_size'):
+            cursor.execute('PRAGMA {}'.format(pragma))
+            sizes.append(cursor.fetchone()[0])
+        page_count, freelist_count, page_size = sizes
+        return (page_count - freelist_count) * page_size
+    if connection.vendor == 'postgresql':
+        cursor.execute('SELECT pg_database_size(current_database())')
+        return cursor.fetchone()[0]
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size', type='int', dest='batch_size', default=1000,
+                    help='Rows deleted per statement.'),
+        make_option('--sleep', type='float', dest='sleep', default=0,
+                    help='Seconds to pause between batches to let other writers in.'),
+    )
+    help = ('Removes deleted wall posts with their news, trims news to FEED_RETENTION_MAX_ITEMS per user '
+            'and FEED_RETENTION_MAX_AGE_DAYS, then deletes FriendInfo events no feed refers to.')
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.sleep = options['sleep']
+        self.verbosity = int(options.get('verbosity', 1))
+        size_before = get_used_database_size()
+
+        cutoff = timezone.now() - datetime.timedelta(days=settings.FEED_RETENTION_MAX_AGE_DAYS)
+        # Event ids grow with their creation time, so the age limit becomes an
+        # id limit that every table can use through its indexes.
+        cutoff_id = FriendInfo.friendinfom.filter(created__lt=cutoff).order_by('-created').values_list(
+            'pk', flat=True).first() or 0
+
+        self.run_phase('deleted posts', self.delete_deleted_posts)
+        self.run_phase('expired news rows', self.delete_expired_rows, cutoff_id)
+        self.run_phase('news rows over the limit', self.delete_rows_over_limit)
+        self.run_phase('packed feed items', self.trim_packed_feeds, cutoff_id)
+        self.run_phase('unreferenced events', self.delete_unreferenced_events, cutoff_id)
+
+        size_after = get_used_database_size()
+        if self.verbosity >= 1 and size_before is not None:
+            self.stdout.write('Space reclaimed: {:.1f} KiB'.format((size_before - size_after) / 1024.0))
+
+    def run_phase(self, name, func, *args):
+        started = time.time()
+        count = func(*args)
+        elapsed = time.time() - started
+        if self.verbosity >= 1:
+            self.stdout.write('{}: {} removed in {:.1f}s ({:.0f} rows/s)'.format(
+                name, count, elapsed, count / elapsed if elapsed else 0))
+
+    def delete_in_batches(self, qs):
+        """
+        Deletes the rows of ``qs`` ``batch_size`` at a time, each batch in its own
+        short transaction.
+        """
+        count = 0
+        while True:
+            pks = list(qs.values_list('pk', flat=True)[:self.batch_size])
+            if not pks:
+                return count
+            qs.model.objects.filter(pk__in=pks).delete()
+            count += len(pks)
+            if self.sleep:
+                time.sleep(self.sleep)
+
+    def delete_deleted_posts(self):
+        # Packed feeds may keep the ids of removed events; readers skip them and
+        # the packed feed trimming drops them eventually.
+        count = self.delete_in_batches(UserWallNewsM2M.objects.filter(friendinfo__is_deleted=True))
+        count += self.delete_in_batches(FriendInfo.friendinfom.filter(is_deleted=True))
+        count += self.delete_in_batches(UserWallPost.objects.filter(is_deleted=True))
+        return count
+
+    def delete_expired_rows(self, cutoff_id):
+        return self.delete_in_batches(UserWallNewsM2M.objects.filter(friendinfo_id__lte=cutoff_id))
+
+    def delete_rows_over_limit(self):
+        max_items = settings.FEED_RETENTION_MAX_ITEMS
+        count = 0
+        for chunk in keyset_chunks(User.objects.values_list('pk'), self.batch_size):
+            long_feeds = UserWallNewsM2M.objects.filter(
+                user_id__in=[row[0] for row in chunk]
+            ).values('user_id').annotate(items=Count('pk')).filter(items__gt=max_items)
+            for feed in long_feeds:
+                last_kept_id = UserWallNewsM2M.objects.filter(user_id=feed['user_id']).order_by(
+                    '-friendinfo_id').values_list('friendinfo_id', flat=True)[max_items - 1]
+                count += self.delete_in_batches(UserWallNewsM2M.objects.filter(
+                    user_id=feed['user_id'], friendinfo_id__lt=last_kept_id
+                ))
+        return count
+
+    def trim_packed_feeds(self, cutoff_id):
+        max_items = settings.FEED_RETENTION_MAX_ITEMS
+        count = 0
+        for chunk in keyset_chunks(UserFeed.objects.values_list('pk'), self.batch_size):
+            with transaction.atomic():
+                for feed in UserFeed.objects.select_for_update().filter(pk__in=[row[0] for row in chunk]):
+                    ids = feed.get_ids()
+                    kept = [pk for pk in ids if pk > cutoff_id][-max_items:]
+                    if len(kept) != len(ids):
+                        feed.set_ids(kept)
+                        feed.save(update_fields=('data', 'size', 'updated'))
+                        count += len(ids) - len(kept)
+        return count
+
+    def delete_unreferenced_events(self, cutoff_id):
+        # Events a suggestions run has not processed yet must stay.
+        last_run = FriendSuggestionRun.objects.order_by('-pk').first()
+        max_id = min(cutoff_id, last_run.last_event_id) if last_run else cutoff_id
+        # Every id below the oldest item of any packed feed is unreferenced there.
+        for chunk in keyset_chunks(UserFeed.objects.only('data'), self.batch_size):
+            for feed in chunk:
+                ids = feed.get_ids()
+                if ids:
+                    max_id = min(max_id, ids[0] - 1)
+        count = 0
+        for chunk in keyset_chunks(FriendInfo.friendinfom.filter(pk__lte=max_id).values_list('pk'), self.batch_size):
+            pks = set(row[0] for row in chunk)
+            pks.difference_update(UserWallNewsM2M.objects.filter(
+                friendinfo_id__in=pks
+            ).values_list('friendinfo_id', flat=True))
+            if pks:
+                FriendInfo.friendinfom.filter(pk__in=pks).delete()
+                count += len(pks)
+                if self.sleep:
+                    time.sleep(self.sleep)
+        return count
@@ -0,0 +1,172 @@
+# coding=utf-8
+"""
+Management utility to precompute "people you may know" suggestions.
+"""
+from __future__ import unicode_literals
+
+import multiprocessing
+import time
+from optparse import make_option
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from microsocial.utils import keyset_chunks
+from users.graph import FriendGraph, FRIENDSHIP_STATUSES, ID_DTYPE, EMPTY, load_edges, get_settled_event_id
+from users.models import User, FriendInfo, FriendSuggestion, FriendSuggestionRun
+
+# Friends whose friend lists are read per query
+FRIENDS_PER_QUERY = 1000
+
+
+def load_friend_lists(user_ids, chunk_size):
+    """
+    The friend lists of ``user_ids`` as edges from them, read with one query
+    per ``FRIENDS_PER_QUERY`` users.
+    """
+    through = User.friends.through
+    src_parts, dst_parts = [EMPTY], [EMPTY]
+    for i in xrange(0, len(user_ids), FRIENDS_PER_QUERY):
+        src, dst = load_edges(chunk_size, through.objects.filter(
+            from_user_id__in=user_ids[i:i + FRIENDS_PER_QUERY].tolist()))
+        src_parts.append(src)
+        dst_parts.append(dst)
+    return np.concatenate(src_parts), np.concatenate(dst_parts)
+
+
+def _compute_partition(task):
+    """
+    Loads the part of the graph the users of one partition need, their
+    friends and the friends of those, and returns their suggestions. Memory
+    depends on the partition, not on the size of the graph.
+    """
+    bounds, user_ids, limit, chunk_size = task
+    if bounds is None:
+        user_ids = np.array(user_ids, dtype=ID_DTYPE)
+        src, dst = load_friend_lists(user_ids, chunk_size)
+    else:
+        lower, upper = bounds
+        qs = User.friends.through.objects.all()
+        if lower is not None:
+            qs = qs.filter(from_user_id__gte=lower)
+        if upper is not None:
+            qs = qs.filter(from_user_id__lt=upper)
+        src, dst = load_edges(chunk_size, qs)
+        # Friendship is symmetric, users of the range without friends are
+        # nobody's friends either.
+        user_ids = np.unique(src)
+    # The friend lists of the partition's own users are loaded already.
+    friend_src, friend_dst = load_friend_lists(np.setdiff1d(dst, user_ids), chunk_size)
+    graph = FriendGraph()
+    graph.set_edges(np.concatenate((src, friend_src)), np.concatenate((dst, friend_dst)))
+    return bounds, [(user_id, graph.suggestions(user_id, limit)) for user_id in user_ids.tolist()]
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option('--full', action='store_true', dest='full', default=False,
+                    help='Recompute suggestions of all users, not only of changed ones.'),
+        make_option('--processes', type='int', dest='processes', default=multiprocessing.cpu_count(),
+                    help='Number of worker processes.'),
+        make_option('--partition-size', type='int', dest='partition_size', default=1000,
+                    help='Users per worker task. A worker holds the friend lists of the friends of its '
+                         'partition, so memory grows with this size, not with the graph.'),
+        make_option('--chunk-size', type='int', dest='chunk_size', default=100000,
+                    help='Rows of the friends table read per query.'),
+        make_option('--limit', type='int', dest='limit', default=settings.FRIEND_SUGGESTIONS_STORED,
+                    help='Suggestions stored per user.'),
+    )
+    help = 'Computes friend-of-friend suggestions into the FriendSuggestion table.'
+
+    def handle(self, *args, **options):
+        verbosity = int(options.get('verbosity', 1))
+        started = time.time()
+        last_run = FriendSuggestionRun.objects.order_by('-pk').first()
+        full = options['full'] or last_run is None
+        # Events after it may be joined by events with lower ids that commit
+        # later; the next run reads them again.
+        last_event = get_settled_event_id()
+
+        partition_size, limit, chunk_size = options['partition_size'], options['limit'], options['chunk_size']
+        if full:
+            tasks = list(self.get_range_tasks(partition_size, limit, chunk_size))
+        else:
+            user_ids = self.get_changed_users(last_run.last_event_id, chunk_size)
+            tasks = list(self.get_list_tasks(user_ids, partition_size, limit, chunk_size))
+        if verbosity >= 1:
+            self.stdout.write('{} partitions'.format(len(tasks)))
+
+        # Workers must not inherit open database connections, they open their
+        # own to read their partitions.
+        for connection in connections.all():
+            connection.close()
+        users_count = 0
+        pool = multiprocessing.Pool(options['processes'])
+        try:
+            for bounds, results in pool.imap_unordered(_compute_partition, tasks):
+                self.save_partition(bounds, results)
+                users_count += len(results)
+        finally:
+            pool.close()
+            pool.join()
+
+        FriendSuggestionRun.objects.create(last_event_id=last_event, users_count=users_count)
+        if verbosity >= 1:
+            self.stdout.write('Updated suggestions of {} users in {:.1f}s'.format(users_count, time.time() - started))
+
+    def get_changed_users(self, from_event_id, chunk_size):
+        """
+        Users whose friends of friends may have changed: both sides of every
+        friendship event after ``from_event_id`` and the friends of both sides.
+        """
+        events = FriendInfo.friendinfom.filter(
+            pk__gt=from_event_id, status__in=FRIENDSHIP_STATUSES
+        ).values_list('user1_id', 'user2_id')
+        sides = np.unique(np.array(list(events), dtype=ID_DTYPE).ravel())
+        if not len(sides):
+            return sides
+        return np.union1d(sides, load_friend_lists(sides, chunk_size)[1])
+
+    def get_range_tasks(self, partition_size, limit, chunk_size):
+        """
+        Splits the user ids into ranges of ``partition_size`` users. The ranges
+        cover every id, so users who lost all friends get their old
+        suggestions removed too.
+        """
+        lower = None
+        last_chunk = None
+        for chunk in keyset_chunks(User.objects.values_list('pk'), partition_size):
+            if last_chunk is not None:
+                upper = last_chunk[-1][0] + 1
+                yield (lower, upper), None, limit, chunk_size
+                lower = upper
+            last_chunk = chunk
+        yield (lower, None), None, limit, chunk_size
+
+    def get_list_tasks(self, user_ids, partition_size, limit, chunk_size):
+        for i in xrange(0, len(user_ids), partition_size):
+            yield None, user_ids[i:i + partition_size].tolist(), limit, chunk_size
+
+    @transaction.atomic
+    def save_partition(self, bounds, results):
+        """
+        Replaces the suggestions of an id range, or of the listed users when
+        ``bounds`` is None.
+        """
+        qs = FriendSuggestion.objects.all()
+        if bounds is None:
+            qs = qs.filter(user_id__in=[user_id for user_id, suggestions in results])
+        else:
+            lower, upper = bounds
+            if lower is not None:
+                qs = qs.filter(user_id__gte=lower)
+            if upper is not None:
+                qs = qs.filter(user_id__lt=upper)
+        qs.delete()
+        FriendSuggestion.objects.bulk_create([
+            FriendSuggestion(user_id=user_id, suggested_id=suggested_id, score=score)
+            for user_id, suggestions in results
+            for suggested_id, score in suggestions
+        ])
@@ -0,0 +1,57 @@
+# coding=utf-8
+"""
+Management utility to dump users, friendships, posts, news and dialogs.
+"""
+from __future__ import unicode_literals
+
+import codecs
+import gzip
+import sys
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from microsocial.graph_dump import get_graph_models, get_dump_fields, encode_value, dumps_line
+from microsocial.utils import keyset_chunks
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option('-o', '--output', dest='output',
+                    help='File to write; gzip-compressed if the name ends with .gz. Standard output by default.'),
+        make_option('--chunk-size', type='int', dest='chunk_size', default=10000,
+                    help='Rows read per query.'),
+    )
+    help = ('Streams the social graph tables as JSON lines for import_graph. Unlike dumpdata '
+            'it reads the tables in primary key chunks and does not build model instances.')
+
+    def handle(self, *args, **options):
+        verbosity = int(options.get('verbosity', 1))
+        output = options['output']
+        if not output:
+            stream = codecs.getwriter('utf-8')(sys.stdout)
+        elif output.endswith('.gz'):
+            stream = codecs.getwriter('utf-8')(gzip.open(output, 'wb'))
+        else:
+            stream = codecs.open(output, 'w', 'utf-8')
+        try:
+            for model in get_graph_models():
+                started = time.time()
+                count = self.export_model(model, stream, options['chunk_size'])
+                if verbosity >= 1 and output:
+                    self.stdout.write('{}: {} rows in {:.1f}s'.format(
+                        model._meta.db_table, count, time.time() - started))
+        finally:
+            if output:
+                stream.close()
+
+    def export_model(self, model, stream, chunk_size):
+        fields = get_dump_fields(model)
+        stream.write(dumps_line({'table': model._meta.db_table, 'columns': [field.column for field in fields]}))
+        count = 0
+        qs = model._default_manager.values_list(*[field.attname for field in fields])
+        for chunk in keyset_chunks(qs, chunk_size):
+            stream.write(''.join(dumps_line([encode_value(value) for value in row]) for row in chunk))
+            count += len(chunk)
+        return count
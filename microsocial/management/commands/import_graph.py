@@ -0,0 +1,139 @@
+# coding=utf-8
+"""
+Management utility to load a dump written by export_graph.
+"""
+from __future__ import unicode_literals
+
+import gzip
+import io
+import json
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connections, transaction, DEFAULT_DB_ALIAS
+
+from microsocial.graph_dump import get_graph_models, get_dump_fields
+
+
+def csv_value(value):
+    """
+    COPY CSV reads unquoted empty values as NULL, so strings are always quoted
+    and empty strings stay empty strings.
+    """
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (int, long, float)):
+        return str(value)
+    return '"{}"'.format(value.replace('"', '""'))
+
+
+class Command(BaseCommand):
+    args = '<dump file>'
+    option_list = BaseCommand.option_list + (
+        make_option('--database', dest='database', default=DEFAULT_DB_ALIAS,
+                    help='Database to load the dump into.'),
+        make_option('--chunk-size', type='int', dest='chunk_size', default=10000,
+                    help='Rows sent per COPY or executemany call.'),
+    )
+    help = ('Loads an export_graph dump into empty tables in one transaction: with COPY on PostgreSQL '
+            'and chunked executemany elsewhere, with foreign key checks deferred to the commit.')
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError('Give the dump file to import.')
+        self.verbosity = int(options.get('verbosity', 1))
+        self.connection = connections[options['database']]
+        self.chunk_size = options['chunk_size']
+        self.models = dict((model._meta.db_table, model) for model in get_graph_models())
+        path = args[0]
+        stream = gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+        try:
+            with transaction.atomic(using=self.connection.alias):
+                self.defer_constraints()
+                self.import_stream(stream)
+                self.reset_sequences()
+        finally:
+            stream.close()
+
+    def defer_constraints(self):
+        cursor = self.connection.cursor()
+        if self.connection.vendor == 'postgresql':
+            cursor.execute('SET CONSTRAINTS ALL DEFERRED')
+        elif self.connection.vendor == 'sqlite':
+            cursor.execute('PRAGMA defer_foreign_keys = ON')
+
+    def import_stream(self, stream):
+        model, rows = None, []
+        for line in stream:
+            item = json.loads(line)
+            if isinstance(item, dict):
+                if model is not None:
+                    self.finish_table(model, rows)
+                model, rows = self.start_table(item), []
+                continue
+            rows.append(item)
+            if len(rows) >= self.chunk_size:
+                self.insert_rows(model, rows)
+                rows = []
+        if model is not None:
+            self.finish_table(model, rows)
+
+    def start_table(self, header):
+        model = self.models.get(header['table'])
+        if model is None:
+            raise CommandError('Unknown table {}.'.format(header['table']))
+        self.fields = get_dump_fields(model)
+        if [field.column for field in self.fields] != header['columns']:
+            raise CommandError('Columns of {} do not match the current models.'.format(header['table']))
+        if model._default_manager.using(self.connection.alias).exists():
+            raise CommandError('Table {} is not empty.'.format(header['table']))
+        self.count = 0
+        self.started = time.time()
+        return model
+
+    def finish_table(self, model, rows):
+        if rows:
+            self.insert_rows(model, rows)
+        if self.verbosity >= 1:
+            self.stdout.write('{}: {} rows in {:.1f}s'.format(
+                model._meta.db_table, self.count, time.time() - self.started))
+
+    def insert_rows(self, model, rows):
+        if self.connection.vendor == 'postgresql':
+            self.copy_rows(model, rows)
+        else:
+            self.execute_many(model, rows)
+        self.count += len(rows)
+
+    def copy_rows(self, model, rows):
+        buf = io.BytesIO(''.join(
+            ','.join(csv_value(value) for value in row) + '\n' for row in rows
+        ).encode('utf-8'))
+        qn = self.connection.ops.quote_name
+        cursor = self.connection.cursor()
+        cursor.cursor.copy_expert('COPY {} ({}) FROM STDIN WITH CSV'.format(
+            qn(model._meta.db_table), ', '.join(qn(field.column) for field in self.fields)
+        ), buf)
+
+    def execute_many(self, model, rows):
+        qn = self.connection.ops.quote_name
+        # Values go through the fields to get the storage format of the backend.
+        values = [
+            [field.get_db_prep_save(field.to_python(value), self.connection) for field, value in zip(self.fields, row)]
+            for row in rows
+        ]
+        cursor = self.connection.cursor()
+        cursor.executemany('INSERT INTO {} ({}) VALUES ({})'.format(
+            qn(model._meta.db_table),
+            ', '.join(qn(field.column) for field in self.fields),
+            ', '.join(['%s'] * len(self.fields)),
+        ), values)
+
+    def reset_sequences(self):
+        cursor = self.connection.cursor()
+        for sql in self.connection.ops.sequence_reset_sql(no_style(), list(self.models.values())):
+            cursor.execute(sql)
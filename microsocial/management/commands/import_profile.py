@@ -0,0 +1,168 @@
+# coding=utf-8
+"""
+Management utility to profile the startup of a worker.
+"""
+from __future__ import unicode_literals
+
+import json
+import os
+import subprocess
+import sys
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter, so every module is really imported. Prints one
+# JSON line: the phases with their time and RSS, and per imported module the
+# time including and excluding the modules it imported itself.
+PROFILE_SCRIPT = r'''
+import __builtin__, json, resource, sys, time
+
+_import = __builtin__.__import__
+_nested = [0.0]
+modules = {}
+
+
+def get_package(globals):
+    package = globals.get('__package__')
+    if not package:
+        package = globals.get('__name__', '')
+        if '__path__' not in globals:
+            package = package.rpartition('.')[0]
+    return package
+
+
+def get_module_names(name, globals, level):
+    # The absolute names an import may stand for. Explicit relative imports
+    # are resolved against the package of the importer; an implicit relative
+    # import of Python 2 is the module of the package if there is one.
+    if level == 0 or not globals:
+        return [name]
+    package = get_package(globals)
+    if level > 0:
+        if level > 1:
+            package = package.rsplit('.', level - 1)[0]
+        return [package + '.' + name if name else package]
+    if package and name:
+        return [package + '.' + name, name]
+    return [name]
+
+
+def timed_import(name, globals=None, locals=None, fromlist=None, level=-1):
+    names = get_module_names(name, globals, level)
+    # "from package import module" loads the module, not the package.
+    submodules = [module_name + '.' + item for module_name in names for item in fromlist or () if item != '*']
+    missing = [module_name for module_name in submodules if sys.modules.get(module_name) is None]
+    loaded = len(sys.modules)
+    started = time.time()
+    _nested.append(0.0)
+    try:
+        return _import(name, globals, locals, fromlist, level)
+    finally:
+        elapsed = time.time() - started
+        nested = _nested.pop()
+        _nested[-1] += elapsed
+        if len(sys.modules) > loaded:
+            new = [module_name for module_name in missing if sys.modules.get(module_name) is not None]
+            if new:
+                name = ', '.join(new)
+            else:
+                name = next((module_name for module_name in names if sys.modules.get(module_name) is not None),
+                            names[-1])
+            total, own = modules.get(name, (0.0, 0.0))
+            modules[name] = (total + elapsed, own + elapsed - nested)
+
+
+def get_rss():
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except IOError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+phases = []
+
+
+def phase(name, func):
+    started = time.time()
+    func()
+    phases.append((name, time.time() - started, get_rss(), len(sys.modules)))
+
+
+phases.append(('interpreter', 0.0, get_rss(), len(sys.modules)))
+__builtin__.__import__ = timed_import
+
+
+def setup():
+    import django
+    django.setup()
+
+
+def application():
+    from django.core.wsgi import get_wsgi_application
+    get_wsgi_application()
+
+
+def warm_up():
+    from microsocial.warmup import warm_up
+    warm_up()
+
+
+phase('django.setup', setup)
+phase('application', application)
+if '--warmup' in sys.argv:
+    phase('warm_up', warm_up)
+__builtin__.__import__ = _import
+print(json.dumps({'phases': phases, 'modules': modules}))
+'''
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option('--warmup', action='store_true', dest='warmup', default=False,
+                    help='Also run microsocial.warmup, as a preforking master does.'),
+        make_option('--limit', type='int', dest='limit', default=25,
+                    help='Number of modules listed.'),
+        make_option('--sort', dest='sort', default='own', choices=('own', 'total'),
+                    help='List modules by their own import time or including the modules they import.'),
+        make_option('--prefix', dest='prefix', default='',
+                    help='Only list modules whose name starts with PREFIX, e.g. "django." or "users".'),
+    )
+    help = ('Starts the WSGI application in a new interpreter and reports the time and memory of every '
+            'startup phase and the slowest imports.')
+
+    def handle(self, *args, **options):
+        args = [sys.executable, '-c', PROFILE_SCRIPT]
+        if options['warmup']:
+            args.append('--warmup')
+        env = dict(os.environ)
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'microsocial.settings')
+        process = subprocess.Popen(args, cwd=settings.BASE_DIR, env=env,
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        stdout, stderr = process.communicate()
+        if process.returncode:
+            raise CommandError('Startup failed:\n{}'.format(stderr.decode('utf-8', 'replace')))
+        report = json.loads(stdout.strip().splitlines()[-1])
+
+        self.stdout.write('{:<16} {:>10} {:>10} {:>9}'.format('phase', 'time, ms', 'RSS, MB', 'modules'))
+        total = 0
+        for name, elapsed, rss, module_count in report['phases']:
+            total += elapsed
+            self.stdout.write('{:<16} {:>10.1f} {:>10.1f} {:>9}'.format(
+                name, elapsed * 1000, rss / 1024.0 / 1024, module_count))
+        self.stdout.write('{:<16} {:>10.1f}'.format('total', total * 1000))
+
+        column = 0 if options['sort'] == 'total' else 1
+        modules = sorted(
+            ((name, times) for name, times in report['modules'].items() if name.startswith(options['prefix'])),
+            key=lambda item: item[1][column], reverse=True,
+        )
+        self.stdout.write('')
+        self.stdout.write('{:>10} {:>10}  {}'.format('own, ms', 'total, ms', 'module'))
+        for name, (module_total, own) in modules[:options['limit']]:
+            self.stdout.write('{:>10.1f} {:>10.1f}  {}'.format(own * 1000, module_total * 1000, name))
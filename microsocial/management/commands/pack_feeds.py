@@ -0,0 +1,50 @@
+# coding=utf-8
+"""
+Management utility to fill packed feeds from UserWallNewsM2M rows.
+"""
+from __future__ import unicode_literals
+
+from collections import defaultdict
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from microsocial.utils import keyset_chunks
+from users.models import User, UserFeed, UserWallNewsM2M
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option('--chunk-size', type='int', dest='chunk_size', default=500,
+                    help='Users processed per transaction.'),
+    )
+    help = 'Rebuilds the UserFeed of every user from the UserWallNewsM2M table.'
+
+    def handle(self, *args, **options):
+        verbosity = int(options.get('verbosity', 1))
+        users_count = 0
+        for chunk in keyset_chunks(User.objects.values_list('pk'), options['chunk_size']):
+            user_ids = [row[0] for row in chunk]
+            self.pack(user_ids)
+            users_count += len(user_ids)
+            if verbosity >= 2:
+                self.stdout.write('Packed feeds of {} users'.format(users_count))
+        if verbosity >= 1:
+            self.stdout.write('Packed feeds of {} users.'.format(users_count))
+
+    @transaction.atomic
+    def pack(self, user_ids):
+        ids_by_user = defaultdict(list)
+        for user_id, friendinfo_id in UserWallNewsM2M.objects.filter(
+            user_id__in=user_ids
+        ).values_list('user_id', 'friendinfo_id'):
+            ids_by_user[user_id].append(friendinfo_id)
+        UserFeed.objects.filter(user_id__in=user_ids).delete()
+        feeds = []
+        for user_id, ids in ids_by_user.iteritems():
+            feed = UserFeed(user_id=user_id)
+            feed.set_ids(sorted(set(ids))[-settings.FEED_MAX_ITEMS:])
+            feeds.append(feed)
+        UserFeed.objects.bulk_create(feeds)
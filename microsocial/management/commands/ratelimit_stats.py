@@ -0,0 +1,19 @@
+# coding=utf-8
+"""
+Management utility to show rate limiter counters.
+"""
+from __future__ import unicode_literals
+
+from django.core.management.base import BaseCommand
+
+from auths.ratelimit import get_counters
+
+
+class Command(BaseCommand):
+    help = ('Shows allowed and rejected requests for every rate limit scope, summed over all processes. '
+            'Each process adds its counts every RATELIMIT_STATS_FLUSH_SECONDS.')
+
+    def handle(self, *args, **options):
+        self.stdout.write('{:<24} {:>10} {:>10}'.format('scope', 'allowed', 'rejected'))
+        for scope, counters in sorted(get_counters().items()):
+            self.stdout.write('{:<24} {:>10} {:>10}'.format(scope, counters['allowed'], counters['rejected']))
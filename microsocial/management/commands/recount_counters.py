@@ -0,0 +1,51 @@
+# coding=utf-8
+"""
+Management utility to recompute the denormalized user counters.
+"""
+from __future__ import unicode_literals
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from microsocial.utils import keyset_chunks
+from users.models import User, UserWallPost, adjust_counters
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option('--chunk-size', type='int', dest='chunk_size', default=1000,
+                    help='Users processed per transaction.'),
+    )
+    help = 'Recomputes User.friends_count and User.wall_posts_count and fixes the ones that drifted.'
+
+    def handle(self, *args, **options):
+        verbosity = int(options.get('verbosity', 1))
+        fixed = 0
+        for chunk in keyset_chunks(User.objects.values_list('pk', 'friends_count', 'wall_posts_count'),
+                                   options['chunk_size']):
+            fixed += self.recount(chunk)
+        if verbosity >= 1:
+            self.stdout.write('Fixed counters of {} users.'.format(fixed))
+
+    @transaction.atomic
+    def recount(self, rows):
+        user_ids = [row[0] for row in rows]
+        friends = dict(User.friends.through.objects.filter(
+            from_user_id__in=user_ids
+        ).values('from_user_id').order_by().annotate(n=Count('pk')).values_list('from_user_id', 'n'))
+        posts = dict(UserWallPost.objects.filter(
+            user_id__in=user_ids, is_deleted=False
+        ).values('user_id').order_by().annotate(n=Count('pk')).values_list('user_id', 'n'))
+        # Differences are applied as F() deltas so concurrent updates are kept.
+        friends_deltas, posts_deltas = {}, {}
+        for user_id, friends_count, wall_posts_count in rows:
+            if friends.get(user_id, 0) != friends_count:
+                friends_deltas[user_id] = friends.get(user_id, 0) - friends_count
+            if posts.get(user_id, 0) != wall_posts_count:
+                posts_deltas[user_id] = posts.get(user_id, 0) - wall_posts_count
+        adjust_counters('friends_count', friends_deltas)
+        adjust_counters('wall_posts_count', posts_deltas)
+        return len(set(friends_deltas) | set(posts_deltas))
@@ -0,0 +1,75 @@
+# coding=utf-8
+"""
+Management utility to deliver emails queued in the outbox.
+"""
+from __future__ import unicode_literals
+
+import time
+from optparse import make_option
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+from django.utils.encoding import force_text
+
+from microsocial.models import OutgoingEmail
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size', type='int', dest='batch_size', default=100,
+                    help='Number of emails sent over one connection.'),
+        make_option('--loop', action='store_true', dest='loop', default=False,
+                    help='Keep running and poll the outbox.'),
+        make_option('--sleep', type='float', dest='sleep', default=5,
+                    help='Seconds to wait between polls in --loop mode.'),
+    )
+    help = 'Sends emails from the outbox.'
+
+    def handle(self, *args, **options):
+        verbosity = int(options.get('verbosity', 1))
+        while True:
+            sent, failed = self.send_batch(options['batch_size'])
+            if verbosity >= 1 and (sent or failed):
+                self.stdout.write('Sent: {}, failed: {}'.format(sent, failed))
+            if not options['loop']:
+                break
+            if not sent and not failed:
+                time.sleep(options['sleep'])
+
+    def send_batch(self, batch_size):
+        emails = list(OutgoingEmail.objects.due()[:batch_size])
+        if not emails:
+            return 0, 0
+        sent = failed = 0
+        connection = get_connection(backend=settings.EMAIL_OUTBOX_BACKEND)
+        try:
+            connection.open()
+        except Exception as e:
+            for email in emails:
+                if OutgoingEmail.objects.claim(email):
+                    failed += 1
+                    email.schedule_retry(force_text(e), settings.EMAIL_OUTBOX_RETRY_BACKOFF,
+                                         settings.EMAIL_OUTBOX_MAX_ATTEMPTS)
+            return 0, failed
+        try:
+            for email in emails:
+                # Another sender may have taken the email since it was read.
+                if not OutgoingEmail.objects.claim(email):
+                    continue
+                message = EmailMessage(email.subject, email.message, email.from_email or None,
+                                       email.get_recipient_list(), connection=connection)
+                try:
+                    message.send()
+                except Exception as e:
+                    failed += 1
+                    email.schedule_retry(force_text(e), settings.EMAIL_OUTBOX_RETRY_BACKOFF,
+                                         settings.EMAIL_OUTBOX_MAX_ATTEMPTS)
+                else:
+                    # Marked one by one, so a crash resends at most the email
+                    # in flight, once its claim expires.
+                    sent += 1
+                    email.mark_sent()
+        finally:
+            connection.close()
+        return sent, failed
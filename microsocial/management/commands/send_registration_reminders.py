@@ -0,0 +1,44 @@
+# coding=utf-8
+"""
+Management utility to remind users to confirm their registration.
+"""
+from __future__ import unicode_literals
+
+import datetime
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from auths.tokens import tokens
+from microsocial.models import OutgoingEmail
+from microsocial.utils import keyset_chunks
+from users.models import User, get_registration_email
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option('--days', type='int', dest='days', default=1,
+                    help='Remind users who registered between DAYS + 1 and DAYS days ago. Running the command '
+                         'once a day reminds every user once.'),
+        make_option('--chunk-size', type='int', dest='chunk_size', default=1000,
+                    help='Users read and emails queued per query.'),
+    )
+    help = 'Queues a new confirmation link for users who have not confirmed their registration.'
+
+    def handle(self, *args, **options):
+        verbosity = int(options.get('verbosity', 1))
+        joined_before = timezone.now() - datetime.timedelta(days=options['days'])
+        qs = User.objects.filter(
+            confirned_registration=False, is_active=True,
+            date_joined__lt=joined_before, date_joined__gte=joined_before - datetime.timedelta(days=1),
+        ).values_list('pk', 'email')
+        count = 0
+        for chunk in keyset_chunks(qs, options['chunk_size']):
+            urls = tokens.get_registration_urls([user_id for user_id, email in chunk])
+            OutgoingEmail.objects.enqueue_many(
+                get_registration_email(urls[user_id]) + (None, [email]) for user_id, email in chunk
+            )
+            count += len(chunk)
+        if verbosity >= 1:
+            self.stdout.write('Queued {} reminders.'.format(count))
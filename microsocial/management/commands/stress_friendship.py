@@ -0,0 +1,100 @@
+# coding=utf-8
+"""
+Management utility to check friendship transitions under concurrency.
+"""
+from __future__ import unicode_literals
+
+import random
+import threading
+import time
+from collections import Counter
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+
+from users.models import User, FriendInvite
+
+EMAIL_TEMPLATE = 'stress-{}@microsocial.invalid'
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option('--users', type='int', dest='users', default=10,
+                    help='Number of test users; few users means many collisions.'),
+        make_option('--threads', type='int', dest='threads', default=8,
+                    help='Number of concurrent threads.'),
+        make_option('--operations', type='int', dest='operations', default=200,
+                    help='Operations per thread.'),
+        make_option('--keep', action='store_true', dest='keep', default=False,
+                    help='Do not delete the test users afterwards.'),
+    )
+    help = ('Runs random invites, approvals and deletions between test users from many threads '
+            'and checks that the friendship tables stay consistent.')
+
+    def handle(self, *args, **options):
+        user_ids = [
+            User.objects.get_or_create(email=EMAIL_TEMPLATE.format(i), defaults={'first_name': 'Stress'})[0].pk
+            for i in xrange(options['users'])
+        ]
+        self.outcomes = Counter()
+        self.outcomes_lock = threading.Lock()
+        threads = [threading.Thread(target=self.worker, args=(user_ids, options['operations']))
+                   for i in xrange(options['threads'])]
+        started = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.time() - started
+        for outcome, count in sorted(self.outcomes.items()):
+            self.stdout.write('{:<40} {:>8}'.format(outcome, count))
+        self.stdout.write('{:.0f} operations/s'.format(sum(self.outcomes.values()) / elapsed))
+        problems = self.check_consistency(user_ids)
+        if not options['keep']:
+            User.objects.filter(pk__in=user_ids).delete()
+        if problems:
+            raise CommandError('\n'.join(problems))
+        self.stdout.write('Friendship tables are consistent.')
+
+    def worker(self, user_ids, operations):
+        try:
+            for i in xrange(operations):
+                user1_id, user2_id = random.sample(user_ids, 2)
+                action = random.choice(('invite', 'approve', 'delete'))
+                try:
+                    if action == 'invite':
+                        FriendInvite.objects.add(user1_id, user2_id)
+                    elif action == 'approve':
+                        FriendInvite.objects.approve(user1_id, user2_id)
+                    else:
+                        User.friendship.delete(user1_id, user2_id)
+                except ValueError:
+                    outcome = '{}: rejected'.format(action)
+                except Exception as e:
+                    outcome = '{}: {}'.format(action, e.__class__.__name__)
+                else:
+                    outcome = '{}: ok'.format(action)
+                with self.outcomes_lock:
+                    self.outcomes[outcome] += 1
+        finally:
+            connection.close()
+
+    def check_consistency(self, user_ids):
+        problems = []
+        edges = set(User.friends.through.objects.filter(
+            from_user_id__in=user_ids
+        ).values_list('from_user_id', 'to_user_id'))
+        for user1_id, user2_id in edges:
+            if (user2_id, user1_id) not in edges:
+                problems.append('Friendship {} -> {} has no reverse row.'.format(user1_id, user2_id))
+        invites = set(FriendInvite.objects.filter(
+            Q(from_user_id__in=user_ids) | Q(to_user_id__in=user_ids)
+        ).values_list('from_user_id', 'to_user_id'))
+        for user1_id, user2_id in invites:
+            if (user1_id, user2_id) in edges:
+                problems.append('Invite {} -> {} between friends.'.format(user1_id, user2_id))
+            if (user2_id, user1_id) in invites:
+                problems.append('Invites {} <-> {} in both directions.'.format(user1_id, user2_id))
+        return problems
@@ -0,0 +1,34 @@
+# coding=utf-8
+from django.conf import settings
+from microsocial.db_routers import use_replica, use_primary
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+class ReplicaPinningMiddleware(object):
+    """
+    Switches safe requests to the views named in ``REPLICA_READ_VIEWS`` to a
+    replica of ``ReplicaRouter``, for the view and the rendering of its
+    response; everything else reads from the primary.
+
+    Read-your-writes: a request that writes (any non-safe method) pins its
+    client to the primary for ``REPLICA_PIN_SECONDS`` through a cookie, so the
+    following GETs do not read from a lagging replica.
+    """
+
+    def process_request(self, request):
+        use_primary()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (request.method in SAFE_METHODS and settings.REPLICA_PIN_COOKIE_NAME not in request.COOKIES and
+                request.resolver_match.url_name in settings.REPLICA_READ_VIEWS):
+            use_replica()
+        else:
+            use_primary()
+
+    def process_response(self, request, response):
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(settings.REPLICA_PIN_COOKIE_NAME, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                                httponly=True)
+        use_primary()
+        return response
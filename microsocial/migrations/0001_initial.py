@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutgoingEmail',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('subject', models.CharField(max_length=255, verbose_name='\u0442\u0435\u043c\u0430')),
+                ('message', models.TextField(verbose_name='\u0442\u0435\u043a\u0441\u0442')),
+                ('from_email', models.CharField(max_length=255, verbose_name='\u043e\u0442\u043f\u0440\u0430\u0432\u0438\u0442\u0435\u043b\u044c', blank=True)),
+                ('recipients', models.TextField(verbose_name='\u043f\u043e\u043b\u0443\u0447\u0430\u0442\u0435\u043b\u0438')),
+                ('status', models.SmallIntegerField(default=0, verbose_name='\u0441\u0442\u0430\u0442\u0443\u0441', choices=[(0, '\u0432 \u043e\u0447\u0435\u0440\u0435\u0434\u0438'), (3, '\u043e\u0442\u043f\u0440\u0430\u0432\u043b\u044f\u0435\u0442\u0441\u044f'), (1, '\u043e\u0442\u043f\u0440\u0430\u0432\u043b\u0435\u043d\u043e'), (2, '\u043e\u0448\u0438\u0431\u043a\u0430')])),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='\u043f\u043e\u043f\u044b\u0442\u043a\u0438')),
+                ('last_error', models.TextField(verbose_name='\u043f\u043e\u0441\u043b\u0435\u0434\u043d\u044f\u044f \u043e\u0448\u0438\u0431\u043a\u0430', blank=True)),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='\u0434\u0430\u0442\u0430')),
+                ('next_attempt', models.DateTimeField(default=django.utils.timezone.now, verbose_name='\u0441\u043b\u0435\u0434\u0443\u044e\u0449\u0430\u044f \u043f\u043e\u043f\u044b\u0442\u043a\u0430')),
+            ],
+            options={
+            },
+            bases=(models.Model,),
+        ),
+        migrations.AlterIndexTogether(
+            name='outgoingemail',
+            index_together=set([('status', 'next_attempt')]),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# coding=utf-8
+import datetime
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import ugettext_lazy as _
+
+
+class OutgoingEmailManager(models.Manager):
+    def enqueue(self, subject, message, from_email, recipient_list):
+        return self.create(subject=subject, message=message, from_email=from_email or '',
+                           recipients=u'\n'.join(recipient_list))
+
+    def enqueue_many(self, emails):
+        """
+        Queues ``(subject, message, from_email, recipient_list)`` tuples with
+        one insert per batch.
+        """
+        self.bulk_create([
+            self.model(subject=subject, message=message, from_email=from_email or '',
+                       recipients=u'\n'.join(recipient_list))
+            for subject, message, from_email, recipient_list in emails
+        ], batch_size=500)
+
+    def due(self):
+        """
+        Queued emails whose time has come and emails claimed by a sender that
+        did not finish them within ``EMAIL_OUTBOX_CLAIM_TIMEOUT``.
+        """
+        return self.filter(
+            status__in=(OutgoingEmail.STATUS_QUEUED, OutgoingEmail.STATUS_SENDING), next_attempt__lte=timezone.now()
+        ).order_by('pk')
+
+    def claim(self, email):
+        """
+        Marks a due email as being sent by this process. The UPDATE only
+        matches while the email is still due, so of several concurrent senders
+        exactly one gets True.
+        """
+        claimed_until = timezone.now() + datetime.timedelta(seconds=settings.EMAIL_OUTBOX_CLAIM_TIMEOUT)
+        claimed = self.due().filter(pk=email.pk).update(status=OutgoingEmail.STATUS_SENDING,
+                                                        next_attempt=claimed_until)
+        if claimed:
+            email.status, email.next_attempt = OutgoingEmail.STATUS_SENDING, claimed_until
+        return bool(claimed)
+
+
+class OutgoingEmail(models.Model):
+    STATUS_QUEUED = 0
+    STATUS_SENT = 1
+    STATUS_FAILED = 2
+    STATUS_SENDING = 3
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, _(u'в очереди')),
+        (STATUS_SENDING, _(u'отправляется')),
+        (STATUS_SENT, _(u'отправлено')),
+        (STATUS_FAILED, _(u'ошибка')),
+    )
+    subject = models.CharField(_(u'тема'), max_length=255)
+    message = models.TextField(_(u'текст'))
+    from_email = models.CharField(_(u'отправитель'), max_length=255, blank=True)
+    recipients = models.TextField(_(u'получатели'))
+    status = models.SmallIntegerField(_(u'статус'), choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    attempts = models.PositiveSmallIntegerField(_(u'попытки'), default=0)
+    last_error = models.TextField(_(u'последняя ошибка'), blank=True)
+    created = models.DateTimeField(_(u'дата'), auto_now_add=True)
+    next_attempt = models.DateTimeField(_(u'следующая попытка'), default=timezone.now)
+
+    objects = OutgoingEmailManager()
+
+    class Meta:
+        index_together = (('status', 'next_attempt'),)
+
+    def __unicode__(self):
+        return u'{} -> {}'.format(self.subject, self.recipients)
+
+    def get_recipient_list(self):
+        return self.recipients.split(u'\n')
+
+    def schedule_retry(self, error, backoff, max_attempts):
+        self.attempts += 1
+        self.last_error = error
+        if self.attempts >= max_attempts:
+            self.status = self.STATUS_FAILED
+        else:
+            self.status = self.STATUS_QUEUED
+            self.next_attempt = timezone.now() + datetime.timedelta(seconds=backoff * 2 ** (self.attempts - 1))
+        self.save(update_fields=('attempts', 'last_error', 'status', 'next_attempt'))
+
+    def mark_sent(self):
+        self.status = self.STATUS_SENT
+        self.save(update_fields=('status',))
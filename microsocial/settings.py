@@ -52,12 +52,15 @@ INSTALLED_APPS = (
 SITE_ID = 1
 
 MIDDLEWARE_CLASSES = (
+    'django.middleware.gzip.GZipMiddleware',
+    'microsocial.middleware.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.auth.middleware.SessionAuthenticationMiddleware',
+    # Also checks the session hash, instead of SessionAuthenticationMiddleware
+    'auths.middleware.CachedAuthenticationMiddleware',
+    'users.middleware.PresenceMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 )
@@ -87,9 +90,30 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        # A file, not the in-memory default: the threads of the friendship
+        # stress test need to share the test database.
+        'TEST': {'NAME': os.path.join(BASE_DIR, 'test-db.sqlite3')},
+    },
+    # Read replicas, e.g. a second local instance for testing:
+    # 'replica': {
+    #     'ENGINE': 'django.db.backends.sqlite3',
+    #     'NAME': os.path.join(BASE_DIR, 'db-replica.sqlite3'),
+    #     'TEST': {'MIRROR': 'default'},
+    # },
 }
 
+DATABASE_ROUTERS = ('microsocial.db_routers.ReplicaRouter',)
+
+# Aliases from DATABASES that serve reads, e.g. ('replica',)
+DATABASE_REPLICAS = ()
+# URL names of the views whose GETs read from a replica (a random one per
+# request); all other reads go to default
+REPLICA_READ_VIEWS = ('news', 'user_search', 'user_friends', 'user_profile')
+
+# After a write the client reads from the primary for this many seconds
+REPLICA_PIN_SECONDS = 5
+REPLICA_PIN_COOKIE_NAME = 'pin_primary'
+
 # Internationalization
 # https://docs.djangoproject.com/en/1.7/topics/i18n/
 
@@ -110,6 +134,86 @@ USE_TZ = True
 
 AUTHENTICATION_BACKENDS = ('django.contrib.auth.backends.ModelBackend',)
 
+# Password hashing
+# https://docs.djangoproject.com/en/1.7/topics/auth/passwords/
+# MICROSOCIAL_PASSWORD_HASHING selects the hasher for new passwords: 'fast' is
+# only for tests and seeding, 'bcrypt' needs the bcrypt package and 'argon2'
+# needs argon2-cffi. The remaining hashers are kept to verify old passwords,
+# which are re-hashed with the selected one on the next login.
+
+PASSWORD_HASHER_PROFILES = {
+    'fast': 'django.contrib.auth.hashers.MD5PasswordHasher',
+    'pbkdf2': 'auths.hashers.PBKDF2PasswordHasher',
+    'bcrypt': 'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'argon2': 'auths.hashers.Argon2PasswordHasher',
+}
+PASSWORD_HASHING = os.environ.get('MICROSOCIAL_PASSWORD_HASHING', 'pbkdf2')
+PASSWORD_HASHERS = (PASSWORD_HASHER_PROFILES[PASSWORD_HASHING],) + tuple(
+    hasher for hasher in (
+        'auths.hashers.PBKDF2PasswordHasher',
+        'auths.hashers.Argon2PasswordHasher',
+        'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+        'django.contrib.auth.hashers.SHA1PasswordHasher',
+        'django.contrib.auth.hashers.MD5PasswordHasher',
+    ) if hasher != PASSWORD_HASHER_PROFILES[PASSWORD_HASHING]
+)
+PASSWORD_PBKDF2_ITERATIONS = int(os.environ.get('MICROSOCIAL_PBKDF2_ITERATIONS', 12000))
+PASSWORD_ARGON2_TIME_COST = 2
+PASSWORD_ARGON2_MEMORY_COST = 512
+PASSWORD_ARGON2_PARALLELISM = 2
+
+# Cache
+# https://docs.djangoproject.com/en/1.7/topics/cache/
+# locmem is per process; production needs a shared cache so that invalidation
+# of cached users reaches every worker. 'uwsgi' is the cache2 cache of
+# deploy/uwsgi.ini, shared by the workers of one instance (see
+# microsocial.cache); the config selects it, other processes keep locmem.
+
+CACHE_PROFILES = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'microsocial',
+    },
+    'uwsgi': {
+        'BACKEND': 'microsocial.cache.UWSGICache',
+        'LOCATION': 'microsocial',
+    },
+}
+CACHES = {
+    'default': CACHE_PROFILES[os.environ.get('MICROSOCIAL_CACHE', 'locmem')],
+}
+
+# 'django.contrib.sessions.backends.signed_cookies' avoids the session store
+# completely, at the price of a bigger cookie.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Seconds request.user stays in the cache (see auths.middleware)
+AUTH_USER_CACHE_TIMEOUT = 300
+# Seconds a changed user is not cached again; longer than any transaction that
+# saves users may stay open (see users.models.invalidate_cached_users)
+AUTH_USER_CACHE_INVALIDATED_SECONDS = 30
+
+# Token buckets for POSTs of auth forms (see auths.ratelimit):
+# scope -> (attempts, seconds to refill them)
+RATELIMITS = {
+    # Per client IP
+    'login': (10, 60),
+    'registration': (5, 600),
+    'password_recovery': (5, 600),
+    # Per client IP and email: password guesses for one account. Not per email
+    # alone, which would let anyone lock the owner out.
+    'login_account': (5, 300),
+    # Per email: registration and recovery emails sent to one address
+    'registration_email': (5, 600),
+    'password_recovery_email': (5, 600),
+}
+RATELIMIT_CACHE = 'default'
+# Allowed and rejected requests are counted per process and added to the
+# database this often by a background thread; `manage.py ratelimit_stats`
+# shows the totals. A process that exits loses the counts of its last interval.
+RATELIMIT_STATS_FLUSH_SECONDS = 60
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/1.7/howto/static-files/
 
@@ -126,12 +230,86 @@ AUTH_USER_MODEL = 'users.User'
 
 TEMPLATE_DIRS = (
     os.path.join(BASE_DIR,  'templates'),
-    os.path.join(BASE_DIR, 'auths/templates'),
-    os.path.join(BASE_DIR, 'users/templates/friends/'),
 )
 
+# Outside of development compiled templates stay in memory, so changes on disk
+# need a server reload.
+TEMPLATE_CACHED = not DEBUG
+
+TEMPLATE_LOADERS = (
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+)
+if TEMPLATE_CACHED:
+    TEMPLATE_LOADERS = (
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+    )
+
+# microsocial.wsgi runs microsocial.warmup.warm_up when it is imported, so a
+# preforking server does the work once in the master
+WARMUP_ON_STARTUP = not DEBUG
+# Modules otherwise imported by the first request that needs them
+WARMUP_IMPORTS = ('users.graph',)
+# Build the friendship graph before forking, so workers share its arrays and
+# their first requests do not build it
+WARMUP_FRIEND_GRAPH = True
+
+# ETags of the profile, news and dialog pages change at least this often,
+# for the relative dates on them (see microsocial.views.ConditionalGetMixin).
+ETAG_TIME_BUCKET = 60
+
+# Last-seen times (see users.presence)
+PRESENCE_CACHE = 'default'
+PRESENCE_CACHE_TIMEOUT = 24 * 60 * 60
+PRESENCE_TOUCH_SECONDS = 60
+PRESENCE_FLUSH_SECONDS = 300
+PRESENCE_BUCKET_SECONDS = 60
+PRESENCE_ONLINE_SECONDS = 300
+
+# Message search (see dialogs.search)
+MESSAGE_SEARCH_CONFIG = 'simple'
+MESSAGE_SEARCH_RECENCY_DAYS = 30
+MESSAGE_SEARCH_LIMIT = 50
+
+# Friendship graph (see users.graph)
+FRIEND_GRAPH_REFRESH_SECONDS = 5
+# Users with pending changes before they are folded into the graph arrays
+FRIEND_GRAPH_MAX_DELTA = 10000
+# Seconds a missing event id is looked for again: the longest a transaction
+# that writes a friendship event may stay open
+FRIEND_GRAPH_GAP_SECONDS = 300
+# Missing event ids remembered at most
+FRIEND_GRAPH_MAX_GAPS = 10000
+FRIEND_SUGGESTIONS_LIMIT = 5
+# Serve suggestions from the table filled by `manage.py compute_suggestions`
+# instead of the in-process graph
+FRIEND_SUGGESTIONS_PRECOMPUTED = False
+FRIEND_SUGGESTIONS_STORED = 20
+MUTUAL_FRIENDS_LIMIT = 6
+# Users per request of the batch friendship API
+FRIENDSHIP_BATCH_LIMIT = 500
+
+# News storage: 'm2m' (a UserWallNewsM2M row per item) or 'packed' (a UserFeed
+# row per user, fill it with `manage.py pack_feeds` before switching)
+FEED_STORE = 'm2m'
+# Items kept in a packed feed
+FEED_MAX_ITEMS = 1000
+# Retention applied by `manage.py compact_feeds`
+FEED_RETENTION_MAX_ITEMS = 1000
+FEED_RETENTION_MAX_AGE_DAYS = 365
+
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'main'
 
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'tmp', 'email')
+
+# Backend used by `manage.py send_queued_mail`, e.g.
+# 'django.core.mail.backends.smtp.EmailBackend' in production
+EMAIL_OUTBOX_BACKEND = EMAIL_BACKEND
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+# Seconds before the first retry, doubled on every next one
+EMAIL_OUTBOX_RETRY_BACKOFF = 60
+# Seconds after which an email claimed by a sender that did not report back
+# (e.g. it crashed) is due again
+EMAIL_OUTBOX_CLAIM_TIMEOUT = 600
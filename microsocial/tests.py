@@ -0,0 +1,232 @@
+# coding=utf-8
+import datetime
+import json
+import os
+import sys
+import tempfile
+from StringIO import StringIO
+from django.conf import settings
+from django.contrib.flatpages.models import FlatPage
+from django.core import mail
+from django.core.management import call_command, CommandError
+from django.core.urlresolvers import reverse
+from django.db import connections, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+from dialogs.models import Dialog, Message
+from microsocial.db_routers import use_replica, use_primary
+from microsocial.graph_dump import get_graph_models
+from microsocial.management.commands import import_profile
+from microsocial.models import OutgoingEmail
+from users.models import User, FriendInfo, UserWallPost
+
+
+@override_settings(EMAIL_OUTBOX_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class SendQueuedMailTest(TestCase):
+    def setUp(self):
+        self.email = OutgoingEmail.objects.enqueue(u'тема', u'текст', None, [u'user@example.com'])
+
+    def test_sends_and_marks_sent(self):
+        call_command('send_queued_mail', verbosity=0)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(OutgoingEmail.objects.get(pk=self.email.pk).status, OutgoingEmail.STATUS_SENT)
+        call_command('send_queued_mail', verbosity=0)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_claim_is_exclusive(self):
+        other = OutgoingEmail.objects.get(pk=self.email.pk)
+        self.assertTrue(OutgoingEmail.objects.claim(self.email))
+        self.assertFalse(OutgoingEmail.objects.claim(other))
+        call_command('send_queued_mail', verbosity=0)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_expired_claim_is_due_again(self):
+        OutgoingEmail.objects.claim(self.email)
+        OutgoingEmail.objects.filter(pk=self.email.pk).update(
+            next_attempt=timezone.now() - datetime.timedelta(seconds=1))
+        call_command('send_queued_mail', verbosity=0)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_failed_attempt_is_queued_again(self):
+        OutgoingEmail.objects.claim(self.email)
+        self.email.schedule_retry(u'error', backoff=60, max_attempts=5)
+        email = OutgoingEmail.objects.get(pk=self.email.pk)
+        self.assertEqual((email.status, email.attempts), (OutgoingEmail.STATUS_QUEUED, 1))
+        self.assertGreater(email.next_attempt, timezone.now())
+
+
+# A time slot that does not end during the test, the ETags would change with it.
+@override_settings(ETAG_TIME_BUCKET=10 ** 9)
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(u'user@example.com', u'secret', first_name=u'Иван')
+        self.client.login(username=u'user@example.com', password=u'secret')
+        self.url = reverse('user_profile', kwargs={'user_id': self.user.pk})
+        # Sets the CSRF cookie the ETag depends on.
+        self.client.get(self.url)
+
+    def get(self, etag=None):
+        headers = {'HTTP_ACCEPT_ENCODING': 'gzip'}
+        if etag:
+            headers['HTTP_IF_NONE_MATCH'] = etag
+        return self.client.get(self.url, **headers)
+
+    def test_gzipped_etag_is_matched(self):
+        response = self.get()
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(response['ETag'].endswith(';gzip"'))
+        self.assertEqual(self.get(response['ETag']).status_code, 304)
+
+    def test_etag_changes_with_the_page(self):
+        etag = self.get()['ETag']
+        UserWallPost.objects.create(user=self.user, author=self.user, content=u'привет')
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        FlatPage.objects.create(url='/about/', title=u'О нас').sites.add(settings.SITE_ID)
+        self.assertEqual(self.get(etag).status_code, 200)
+
+    def test_etag_ignores_other_users(self):
+        friend, other, stranger = [
+            User.objects.create_user(u'{}@example.com'.format(name), u'secret', first_name=name)
+            for name in (u'friend', u'other', u'stranger')
+        ]
+        self.url = reverse('user_profile', kwargs={'user_id': friend.pk})
+        etag = self.get()['ETag']
+        post = UserWallPost.objects.create(user=stranger, author=stranger, content=u'привет')
+        post.mark_deleted()
+        User.friendship.add(other, stranger)
+        self.assertEqual(self.get(etag).status_code, 304)
+        # The mutual friends may have changed.
+        User.friendship.add(friend, other)
+        self.assertEqual(self.get(etag).status_code, 200)
+
+
+class ImportProfileTest(TestCase):
+    def get_script_functions(self):
+        # The helpers of the script, without patching __import__ here.
+        namespace = {}
+        exec import_profile.PROFILE_SCRIPT.split('def get_rss')[0] in namespace
+        return namespace
+
+    def test_relative_imports_are_resolved(self):
+        get_module_names = self.get_script_functions()['get_module_names']
+        self.assertEqual(get_module_names('', {'__name__': 'pkg.mod'}, 1), ['pkg'])
+        self.assertEqual(get_module_names('x', {'__name__': 'pkg', '__path__': []}, 1), ['pkg.x'])
+        self.assertEqual(get_module_names('x', {'__name__': 'a.b.c', '__package__': 'a.b'}, 2), ['a.x'])
+        self.assertEqual(get_module_names('x', {'__name__': 'pkg.mod'}, -1), ['pkg.x', 'x'])
+        self.assertEqual(get_module_names('x', {'__name__': 'pkg.mod'}, 0), ['x'])
+
+    def test_from_import_is_recorded_under_the_submodule(self):
+        functions = self.get_script_functions()
+        sys.modules.pop('json.tool', None)
+        # from . import tool, inside the json package
+        functions['timed_import']('', {'__name__': 'json.decoder', '__package__': 'json'}, None, ('tool',), 1)
+        self.assertEqual(functions['modules'].keys(), ['json.tool'])
+
+    def test_report(self):
+        stdout = StringIO()
+        call_command('import_profile', prefix='users.', stdout=stdout)
+        self.assertIn('users.models', stdout.getvalue())
+
+
+@override_settings(DATABASE_REPLICAS=('replica',))
+class ReplicaRoutingTest(TransactionTestCase):
+    """
+    A second in-memory SQLite database stands in for the replica; its rows are
+    written separately, so a page shows which database it was read from.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super(ReplicaRoutingTest, cls).setUpClass()
+        connections.databases['replica'] = dict(connections.databases['default'], NAME=':memory:')
+        call_command('migrate', database='replica', verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica'].close()
+        del connections.databases['replica']
+        del connections._connections.replica
+        super(ReplicaRoutingTest, cls).tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user(u'user@example.com', first_name=u'Иван')
+        User.objects.using('replica').create(pk=self.user.pk, email=self.user.email, first_name=u'Пётр')
+        self.url = reverse('user_profile', kwargs={'user_id': self.user.pk})
+
+    def tearDown(self):
+        use_primary()
+        User.objects.using('replica').all().delete()
+
+    def test_get_reads_from_replica(self):
+        self.assertEqual(self.client.get(self.url).context['profile_user'].first_name, u'Пётр')
+
+    def test_other_views_read_from_primary(self):
+        with override_settings(REPLICA_READ_VIEWS=()):
+            self.assertEqual(self.client.get(self.url).context['profile_user'].first_name, u'Иван')
+
+    def test_post_pins_client_to_primary(self):
+        response = self.client.post(reverse('set_language'), {'language': 'en'})
+        self.assertIn(settings.REPLICA_PIN_COOKIE_NAME, response.cookies)
+        self.assertEqual(self.client.get(self.url).context['profile_user'].first_name, u'Иван')
+
+    def test_transaction_reads_from_primary(self):
+        self.assertEqual(use_replica(), 'replica')
+        self.assertEqual(User.objects.get(pk=self.user.pk).first_name, u'Пётр')
+        with transaction.atomic():
+            self.assertEqual(User.objects.get(pk=self.user.pk).first_name, u'Иван')
+
+
+class GraphDumpTest(TestCase):
+    def setUp(self):
+        self.a = User.objects.create_user(u'a@example.com', first_name=u'Ёжик "Дэн"', last_name=u'O\'Brien')
+        self.b = User.objects.create_user(u'b@example.com', first_name=u'Bob')
+        User.friendship.add(self.a, self.b)
+        post = UserWallPost.objects.create(user=self.a, author=self.b, content=u'"привет",\n\\ 日本')
+        FriendInfo.friendinfom.add_post_wall(self.b.pk, self.a.pk, post)
+        dialog = Dialog.objects.get_or_create(self.a, self.b)
+        Message.objects.create(sender=self.a, dialog=dialog, text=u'')
+        fd, self.path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def get_counts(self):
+        return [model._default_manager.count() for model in get_graph_models()]
+
+    def test_round_trip(self):
+        counts = self.get_counts()
+        call_command('export_graph', output=self.path, verbosity=0)
+        User.objects.all().delete()
+        self.assertEqual(self.get_counts(), [0] * len(counts))
+        call_command('import_graph', self.path, verbosity=0)
+        self.assertEqual(self.get_counts(), counts)
+        user = User.objects.get(pk=self.a.pk)
+        self.assertEqual((user.first_name, user.last_name), (u'Ёжик "Дэн"', u'O\'Brien'))
+        self.assertEqual(user.password, self.a.password)
+        self.assertEqual(UserWallPost.objects.get().content, u'"привет",\n\\ 日本')
+        self.assertEqual(Message.objects.get().text, u'')
+        self.assertEqual(Dialog.objects.get().last_message, Message.objects.get())
+        self.assertTrue(User.friendship.are_friends(self.a.pk, self.b.pk))
+
+    def test_non_empty_table_is_refused(self):
+        call_command('export_graph', output=self.path, verbosity=0)
+        with self.assertRaisesRegexp(CommandError, 'users_user is not empty'):
+            call_command('import_graph', self.path, verbosity=0)
+
+    def test_other_columns_are_refused(self):
+        call_command('export_graph', output=self.path, verbosity=0)
+        User.objects.all().delete()
+        with open(self.path) as f:
+            lines = f.readlines()
+        header = json.loads(lines[0])
+        header['columns'].append('nickname')
+        lines[0] = json.dumps(header) + '\n'
+        with open(self.path, 'w') as f:
+            f.writelines(lines)
+        with self.assertRaisesRegexp(CommandError, 'Columns of users_user do not match'):
+            call_command('import_graph', self.path, verbosity=0)
+        self.assertFalse(User.objects.exists())
@@ -0,0 +1,71 @@
+# coding=utf-8
+import logging
+import os
+import threading
+import time
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+def keyset_chunks(qs, chunk_size=1000):
+    """
+    Yields ``qs`` ordered by primary key in lists of at most ``chunk_size`` rows.
+    Every chunk is fetched with ``pk > last pk`` instead of OFFSET, so the cost
+    of a chunk does not grow with the position in the table. ``values_list``
+    querysets must select the primary key first.
+    """
+    qs = qs.order_by('pk')
+    last_pk = None
+    while True:
+        chunk = list((qs if last_pk is None else qs.filter(pk__gt=last_pk))[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        if len(chunk) < chunk_size:
+            return
+        last_pk = chunk[-1][0] if isinstance(chunk[-1], tuple) else chunk[-1].pk
+
+
+class BackgroundFlusher(object):
+    """
+    Calls ``flush`` every ``get_interval()`` seconds from a daemon thread, so
+    buffered writes do not run on the request path. ``start()`` is cheap and
+    meant to be called with every buffered write: it starts the thread once
+    per process, also in workers forked by a preforking server after the
+    master started one.
+
+    Whatever was buffered since the last flush is lost when the process exits,
+    at most ``get_interval()`` seconds of writes; there is no atexit hook,
+    uWSGI does not run them when it kills or recycles a worker.
+    """
+
+    def __init__(self, flush, get_interval):
+        self.flush = flush
+        self.get_interval = get_interval
+        self.pid = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            thread = threading.Thread(target=self.run, name='flush-{}'.format(self.flush.__name__))
+            thread.daemon = True
+            thread.start()
+            self.pid = os.getpid()
+
+    def run(self):
+        while True:
+            time.sleep(self.get_interval())
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('%s failed', self.flush.__name__)
+            finally:
+                # The thread has its own connections; none stays open between
+                # flushes.
+                for connection in connections.all():
+                    connection.close()
@@ -1,8 +1,67 @@
 # coding=utf-8
+import hashlib
+import time
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.contrib.flatpages.models import FlatPage
+from django.contrib.messages import get_messages
 from django.shortcuts import redirect
+from django.utils.translation import get_language
+from django.views.decorators.http import condition
 
 
 @login_required
 def main(request):
     return redirect('user_profile', user_id=request.user.pk, permanent=False)
+
+
+def get_row_stamp(obj):
+    """
+    Field values of a loaded model instance, for ETags of pages showing it.
+    """
+    return tuple(getattr(obj, field.attname) for field in obj._meta.concrete_fields)
+
+
+class ConditionalGetMixin(object):
+    """
+    Answers GET requests with 304 Not Modified when the ETag built from
+    ``get_etag_stamps()`` matches, before the queries of the page run. Besides
+    the stamps the ETag covers the viewer, the language, the CSRF cookie, the
+    data of the shared layout and a ``ETAG_TIME_BUCKET`` long time slot, so
+    relative dates ("5 minutes ago") do not stay stale. Pages with pending
+    messages get no ETag.
+    """
+
+    def get_etag_stamps(self):
+        return ()
+
+    def get_layout_stamps(self, request):
+        """
+        Data of base.html besides the viewer and the language: the flatpages
+        linked from the footer. The FRIEND_MENU of users.context_processors is
+        constant per language.
+        """
+        return list(FlatPage.objects.filter(sites__id=settings.SITE_ID).order_by('url').values_list(
+            'url', 'title', 'registration_required'))
+
+    def get_etag(self, request, *args, **kwargs):
+        if len(get_messages(request)):
+            return None
+        stamps = (
+            request.user.pk,
+            get_language(),
+            request.COOKIES.get(settings.CSRF_COOKIE_NAME),
+            int(time.time() // settings.ETAG_TIME_BUCKET),
+            self.get_layout_stamps(request),
+        ) + tuple(self.get_etag_stamps())
+        return hashlib.md5(repr(stamps)).hexdigest()
+
+    def dispatch(self, request, *args, **kwargs):
+        view = super(ConditionalGetMixin, self).dispatch
+        if request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            # GZipMiddleware sends the ETags of compressed responses as "...;gzip".
+            request.META['HTTP_IF_NONE_MATCH'] = if_none_match.replace(';gzip"', '"')
+        return condition(etag_func=self.get_etag)(view)(request, *args, **kwargs)
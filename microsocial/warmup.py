@@ -0,0 +1,57 @@
+# coding=utf-8
+"""
+Work a worker would otherwise repeat on its first requests: the URLconf with
+all views, compiled templates, translation catalogs and heavy modules
+imported on demand.
+
+Run in a preforking master (``lazy-apps = false`` in uWSGI, see
+``microsocial.wsgi``) this happens once, and the forked workers share the
+resulting memory pages copy-on-write instead of each building its own copy.
+"""
+import gc
+import os
+from importlib import import_module
+from django.conf import settings
+from django.core.urlresolvers import get_resolver
+from django.db import connections
+from django.template.loader import get_template
+from django.template.loaders.app_directories import app_template_dirs
+from django.utils import translation
+
+
+def get_template_names():
+    """
+    Returns the names of all templates in ``TEMPLATE_DIRS`` and the
+    ``templates`` directories of the installed apps.
+    """
+    names = set()
+    for template_dir in tuple(settings.TEMPLATE_DIRS) + tuple(app_template_dirs):
+        for root, dirs, files in os.walk(template_dir):
+            for filename in files:
+                if filename.endswith('.html'):
+                    names.add(os.path.relpath(os.path.join(root, filename), template_dir).replace(os.sep, '/'))
+    return sorted(names)
+
+
+def warm_up():
+    resolver = get_resolver(None)
+    # Imports the URLconf with the views and fills the reverse() lookups.
+    resolver.reverse_dict
+    for module in settings.WARMUP_IMPORTS:
+        import_module(module)
+    if settings.TEMPLATE_CACHED:
+        # Without the cached loader compiled templates are not kept, only the
+        # template tag libraries would be imported.
+        for name in get_template_names():
+            get_template(name)
+    for language, title in settings.LANGUAGES:
+        translation.activate(language)
+    translation.deactivate()
+    if settings.WARMUP_FRIEND_GRAPH:
+        from users.graph import friend_graph
+        friend_graph.ensure_fresh()
+    # A connection opened here would be shared by all forked workers.
+    for connection in connections.all():
+        connection.close()
+    # Objects freed after the fork would dirty their pages in every worker.
+    gc.collect()
@@ -10,5 +10,10 @@ https://docs.djangoproject.com/en/1.7/howto/deployment/wsgi/
 import os
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "microsocial.settings")
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 application = get_wsgi_application()
+
+if settings.WARMUP_ON_STARTUP:
+    from microsocial.warmup import warm_up
+    warm_up()
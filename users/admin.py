@@ -1,18 +1,84 @@
+# coding=utf-8
 from django.contrib import admin
+from django.core.urlresolvers import reverse
+from django.db.models import Q
+from django.utils.html import format_html
+from django.utils.translation import ugettext_lazy as _
+from microsocial.admin import EstimatedCountPaginator
 from users.models import User, FriendInvite, UserWallPost, UserWallNewsM2M, FriendInfo
 
 
-class UsersInLine(admin.TabularInline):
-    model = UserWallNewsM2M
-    extra = 0
+class UserAdmin(admin.ModelAdmin):
+    list_display = ('email', 'first_name', 'last_name', 'friends_count', 'date_joined', 'is_active')
+    search_fields = ('=email', '^first_name', '^last_name')
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+    raw_id_fields = ('friends',)
+    readonly_fields = ('friends_count', 'wall_posts_count', 'news_link')
 
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Exact email or case-sensitive name prefix. Unlike the default iexact and
+        istartswith lookups these can use the email and name indexes.
+        """
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        if '@' in search_term:
+            return queryset.filter(email=search_term), False
+        words = search_term.split(None, 1)
+        if len(words) == 2:
+            q = Q(first_name=words[0], **self.prefix_lookup('last_name', words[1]))
+        else:
+            q = Q(**self.prefix_lookup('first_name', search_term)) | Q(**self.prefix_lookup('last_name', search_term))
+        return queryset.filter(q), False
 
-class UserAdmin(admin.ModelAdmin):
-    inlines = [UsersInLine]
+    def prefix_lookup(self, field_name, prefix):
+        # A range works with any index collation, LIKE 'prefix%' does not.
+        return {field_name + '__gte': prefix, field_name + '__lt': prefix + u'\uffff'}
 
+    def news_link(self, obj):
+        if not obj.pk:
+            return ''
+        return format_html(u'<a href="{}?user__id__exact={}">{}</a>',
+                           reverse('admin:users_userwallnewsm2m_changelist'), obj.pk, _(u'открыть'))
+    news_link.short_description = _(u'новости')
 
-admin.site.register(User, UserAdmin)
-admin.site.register(FriendInvite)
-admin.site.register(UserWallPost)
-admin.site.register(FriendInfo)
 
+class UserWallNewsM2MAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'user', 'friendinfo')
+    list_select_related = ('user', 'friendinfo__user1', 'friendinfo__user2')
+    raw_id_fields = ('user', 'friendinfo')
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+
+
+class FriendInviteAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'from_user', 'to_user')
+    list_select_related = ('from_user', 'to_user')
+    raw_id_fields = ('from_user', 'to_user')
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+
+
+class UserWallPostAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'user', 'author', 'created', 'is_deleted')
+    list_select_related = ('user', 'author')
+    raw_id_fields = ('user', 'author')
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+
+
+class FriendInfoAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'user1', 'user2', 'status', 'created', 'is_deleted')
+    list_select_related = ('user1', 'user2')
+    raw_id_fields = ('user1', 'user2', 'user_post')
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+
+
+admin.site.register(User, UserAdmin)
+admin.site.register(UserWallNewsM2M, UserWallNewsM2MAdmin)
+admin.site.register(FriendInvite, FriendInviteAdmin)
+admin.site.register(UserWallPost, UserWallPostAdmin)
+admin.site.register(FriendInfo, FriendInfoAdmin)
@@ -0,0 +1,50 @@
+# coding=utf-8
+"""
+"Download my data" export. The data of a user is written as JSON lines, one
+object per row with its kind in ``type``. Every table is read in primary key
+chunks, so memory use does not depend on the amount of data.
+"""
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from dialogs.models import Dialog, DialogReadMark, Message
+from microsocial.utils import keyset_chunks
+from users.models import User, UserWallPost, FriendInfo
+
+PROFILE_FIELDS = ('pk', 'email', 'first_name', 'last_name', 'sex', 'birth_date', 'city', 'work_place', 'about_me',
+                  'interests', 'avatar', 'date_joined', 'last_login')
+
+
+def dumps(obj):
+    return json.dumps(obj, cls=DjangoJSONEncoder, ensure_ascii=False) + u'\n'
+
+
+def export_rows(kind, qs, fields, chunk_size):
+    """
+    Yields the ``fields`` of ``qs`` rows as JSON lines, one string per chunk.
+    ``fields`` must start with ``pk``.
+    """
+    for chunk in keyset_chunks(qs.values_list(*fields), chunk_size):
+        yield u''.join(dumps(dict(zip(fields, row), type=kind)) for row in chunk)
+
+
+def export_user_data(user, chunk_size=1000):
+    profile = dict(zip(PROFILE_FIELDS, User.objects.filter(pk=user.pk).values_list(*PROFILE_FIELDS)[0]))
+    yield dumps(dict(profile, type='profile'))
+    sections = (
+        ('friend', User.friends.through.objects.filter(from_user=user),
+         ('pk', 'to_user_id', 'to_user__first_name', 'to_user__last_name')),
+        ('wall_post', UserWallPost.objects.filter(Q(user=user) | Q(author=user), is_deleted=False),
+         ('pk', 'user_id', 'author_id', 'content', 'created', 'edited')),
+        ('event', FriendInfo.friendinfom.filter(Q(user1=user) | Q(user2=user), is_deleted=False),
+         ('pk', 'user1_id', 'user2_id', 'status', 'user_post_id', 'created')),
+        ('dialog', Dialog.objects.for_user(user),
+         ('pk', 'user1_id', 'user2_id')),
+        ('message', Message.objects.filter(Q(dialog__user1=user) | Q(dialog__user2=user)),
+         ('pk', 'dialog_id', 'sender_id', 'text', 'created')),
+        ('read_mark', DialogReadMark.objects.filter(user=user),
+         ('pk', 'dialog_id', 'message_id')),
+    )
+    for kind, qs, fields in sections:
+        for data in export_rows(kind, qs, fields, chunk_size):
+            yield data
@@ -0,0 +1,96 @@
+# coding=utf-8
+"""
+News feed storage. ``M2MFeedStore`` keeps one ``UserWallNewsM2M`` row per
+recipient and news item, ``PackedFeedStore`` keeps one ``UserFeed`` row per
+user holding the ids of the last ``FEED_MAX_ITEMS`` items. ``FEED_STORE``
+selects the store used for writing and reading news.
+"""
+from collections import defaultdict
+from django.conf import settings
+from django.db import transaction, IntegrityError
+from users.models import FriendInfo, UserWallNewsM2M, UserFeed
+
+
+class PackedFeed(object):
+    """
+    Paginator-friendly sequence over packed ids, newest first. Only the items of
+    the requested slice are loaded.
+    """
+
+    def __init__(self, ids):
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def count(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        ids = self.ids[index]
+        if not isinstance(index, slice):
+            return FriendInfo.friendinfom.get(pk=ids)
+        items = FriendInfo.friendinfom.select_related('user1', 'user2', 'user_post').in_bulk(ids)
+        # Deleted events are filtered here instead of being removed from every feed.
+        return [items[pk] for pk in ids if pk in items and not items[pk].is_deleted]
+
+
+class M2MFeedStore(object):
+    def push(self, recipients):
+        """
+        Adds news items given as ``(user_id, friendinfo_id)`` pairs.
+        """
+        # The backend picks the batch size; SQLite takes at most 500 rows per INSERT.
+        UserWallNewsM2M.objects.bulk_create([
+            UserWallNewsM2M(user_id=user_id, friendinfo_id=friendinfo_id) for user_id, friendinfo_id in recipients
+        ])
+
+    def get_feed(self, user):
+        return user.news.filter(is_deleted=False).select_related('user1', 'user2', 'user_post')
+
+    def get_version(self, user):
+        """
+        Changes whenever news are added to the feed of ``user``.
+        """
+        return UserWallNewsM2M.objects.filter(user=user).order_by('-pk').values_list('pk', flat=True).first()
+
+
+class PackedFeedStore(object):
+    @transaction.atomic
+    def push(self, recipients):
+        ids_by_user = defaultdict(list)
+        for user_id, friendinfo_id in recipients:
+            ids_by_user[user_id].append(friendinfo_id)
+        if not ids_by_user:
+            return
+        user_ids = sorted(ids_by_user)
+        feeds = UserFeed.objects.select_for_update().in_bulk(user_ids)
+        missing = [user_id for user_id in user_ids if user_id not in feeds]
+        if missing:
+            # A concurrent push may create some of them first.
+            try:
+                with transaction.atomic():
+                    UserFeed.objects.bulk_create([UserFeed(user_id=user_id) for user_id in missing])
+            except IntegrityError:
+                pass
+            feeds = UserFeed.objects.select_for_update().in_bulk(user_ids)
+        for user_id, feed in feeds.iteritems():
+            feed.add_ids(ids_by_user[user_id], settings.FEED_MAX_ITEMS)
+            feed.save(update_fields=('data', 'size', 'updated'))
+
+    def get_feed(self, user):
+        feed = UserFeed.objects.filter(user=user).first()
+        return PackedFeed(feed.get_ids()[::-1] if feed else [])
+
+    def get_version(self, user):
+        return UserFeed.objects.filter(user=user).values_list('updated', flat=True).first()
+
+
+FEED_STORES = {
+    'm2m': M2MFeedStore(),
+    'packed': PackedFeedStore(),
+}
+
+
+def get_feed_store():
+    return FEED_STORES[settings.FEED_STORE]
@@ -3,22 +3,20 @@ from django.contrib.auth.forms import PasswordChangeForm
 from django.core import validators
 from django import forms
 from django.utils.translation import ugettext_lazy as _, ugettext
-from microsocial.forms import BootstrapFormMixin
+from microsocial.forms import bootstrap_form, with_validators
 from users.models import User, UserWallPost
 
 
-class UserPasswordChangeForm(PasswordChangeForm, BootstrapFormMixin):
-    def __init__(self, *args, **kwargs):
-        super(UserPasswordChangeForm, self).__init__(*args, **kwargs)
-        BootstrapFormMixin.__init__(self)
-        for field_name in ('old_password', 'new_password1', 'new_password2'):
-            self.fields[field_name] = self.fields.pop(field_name)
-            if field_name != 'old_password':
-                self.fields[field_name].validators.extend([validators.MinLengthValidator(6),
-                                                           validators.MaxLengthValidator(40)])
+@bootstrap_form(field_order=('old_password', 'new_password1', 'new_password2'))
+class UserPasswordChangeForm(PasswordChangeForm):
+    new_password1 = with_validators(PasswordChangeForm.base_fields['new_password1'],
+                                    validators.MinLengthValidator(6), validators.MaxLengthValidator(40))
+    new_password2 = with_validators(PasswordChangeForm.base_fields['new_password2'],
+                                    validators.MinLengthValidator(6), validators.MaxLengthValidator(40))
 
 
-class UserChangeProfileForm(forms.ModelForm, BootstrapFormMixin):
+@bootstrap_form
+class UserChangeProfileForm(forms.ModelForm):
     class Meta:
         model = User
         fields = ('avatar', 'first_name', 'last_name', 'sex', 'birth_date', 'city', 'work_place', 'about_me',
@@ -26,22 +24,18 @@ class UserChangeProfileForm(forms.ModelForm, BootstrapFormMixin):
         widgets = {
             'about_me': forms.Textarea(attrs={'cols': 10, 'rows': 5}),
             'interests': forms.Textarea(attrs={'cols': 10, 'rows': 5}),
+            'birth_date': forms.DateInput(attrs={'placeholder': _(u'Введите дату в формате ГГГГ-ММ-ДД')}),
         }
 
-    def __init__(self, *args, **kwargs):
-        super(UserChangeProfileForm, self).__init__(*args, **kwargs)
-        BootstrapFormMixin.__init__(self)
-        self.fields['birth_date'].widget.attrs['placeholder'] = ugettext(u'Введите дату в формате ГГГГ-ММ-ДД')
 
-
-class UserEmailChangeForm(forms.Form, BootstrapFormMixin):
+@bootstrap_form
+class UserEmailChangeForm(forms.Form):
     new_email = forms.EmailField(max_length=75, label=_(u'новый email'))
     password = forms.CharField(label=_(u'текущий пароль'), min_length=6, max_length=40, widget=forms.PasswordInput)
 
     def __init__(self, user, *args, **kwargs):
         self.user = user
         super(UserEmailChangeForm, self).__init__(*args, **kwargs)
-        BootstrapFormMixin.__init__(self)
 
     def clean_new_email(self):
         new_email = self.cleaned_data['new_email'].strip()
@@ -62,7 +56,8 @@ class UserEmailChangeForm(forms.Form, BootstrapFormMixin):
         return self.user
 
 
-class UserWallPostForm(forms.ModelForm, BootstrapFormMixin):
+@bootstrap_form
+class UserWallPostForm(forms.ModelForm):
     class Meta:
         model = UserWallPost
         fields = ('content',)
@@ -70,15 +65,12 @@ class UserWallPostForm(forms.ModelForm, BootstrapFormMixin):
             'content': forms.Textarea(attrs={'rows': 4, 'placeholder': _(u'напишите на стене ...')})
         }
 
-    def __init__(self, *args, **kwargs):
-        super(UserWallPostForm, self).__init__(*args, **kwargs)
-        BootstrapFormMixin.__init__(self)
-
     def clean_content(self):
         return self.cleaned_data['content'].strip()
 
 
-class SearchForm(forms.Form, BootstrapFormMixin):
+@bootstrap_form
+class SearchForm(forms.Form):
     name = forms.CharField(label=_(u'имя, фамилия'), required=False,
                            widget=forms.TextInput(attrs={'placeholder': _(u'Имя, Фамилия')}))
     sex = forms.TypedChoiceField(label=_(u'пол'), choices=(('0', _(u'все')),) + User.SEX_CHOICES[1:],
@@ -92,10 +84,6 @@ class SearchForm(forms.Form, BootstrapFormMixin):
     about_me = forms.CharField(label=_(u'о себе'), required=False)
     interests = forms.CharField(label=_(u'интересы'), required=False)
 
-    def __init__(self, *args, **kwargs):
-        super(SearchForm, self).__init__(*args, **kwargs)
-        BootstrapFormMixin.__init__(self)
-
     def get_values_list(self, field_name):
         val = self.cleaned_data.get(field_name)
         if isinstance(val, basestring):
@@ -0,0 +1,262 @@
+# coding=utf-8
+"""
+In-memory friendship graph in CSR form: ``ids`` holds the sorted ids of users
+that have friends, the friends of ``ids[i]`` are the sorted slice
+``indices[indptr[i]:indptr[i + 1]]``. Changes since the last build are kept in
+small per-user overlays and folded into the arrays once they grow too big.
+
+Changes are read back from committed ``FriendInfo`` events by ``refresh``, so a
+rolled back transaction never reaches the graph.
+"""
+import datetime
+import threading
+import time
+from collections import defaultdict
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from users.models import User, FriendInfo
+
+FRIENDSHIP_STATUSES = (FriendInfo.STATUS_FRIENDS, FriendInfo.STATUS_NO_FRIENDS)
+# User ids; int32 halves the memory of the graph arrays.
+ID_DTYPE = np.int32
+EMPTY = np.empty(0, dtype=ID_DTYPE)
+
+
+def iter_edge_chunks(qs, chunk_size):
+    """
+    Yields the ``(from_user_id, to_user_id)`` rows of a queryset over the
+    friends through-table in this order, in lists of at most ``chunk_size``.
+    Every chunk continues after the last row with a condition on the unique
+    (from_user, to_user) index instead of OFFSET.
+    """
+    qs = qs.order_by('from_user_id', 'to_user_id').values_list('from_user_id', 'to_user_id')
+    last = None
+    while True:
+        page = qs if last is None else qs.filter(
+            Q(from_user_id__gt=last[0]) | Q(from_user_id=last[0], to_user_id__gt=last[1]))
+        chunk = list(page[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        if len(chunk) < chunk_size:
+            return
+        last = chunk[-1]
+
+
+def load_edges(chunk_size=100000, qs=None):
+    """
+    Reads the friends through-table, or the rows of ``qs`` over it, chunk by
+    chunk and returns the directed edges as two arrays sorted by source and
+    destination.
+    """
+    if qs is None:
+        qs = User.friends.through.objects.all()
+    src_parts, dst_parts = [], []
+    for chunk in iter_edge_chunks(qs, chunk_size):
+        edges = np.array(chunk, dtype=ID_DTYPE)
+        src_parts.append(edges[:, 0])
+        dst_parts.append(edges[:, 1])
+    if not src_parts:
+        return EMPTY, EMPTY
+    return np.concatenate(src_parts), np.concatenate(dst_parts)
+
+
+def get_settled_event_id():
+    """
+    Id up to which every ``FriendInfo`` event has committed or never will. The
+    transactions of the events of the last ``FRIEND_GRAPH_GAP_SECONDS`` may
+    still commit events with lower ids, so it stops before the first of them.
+    """
+    window_start = timezone.now() - datetime.timedelta(seconds=settings.FRIEND_GRAPH_GAP_SECONDS)
+    first_recent = FriendInfo.friendinfom.filter(created__gte=window_start).order_by('pk').values_list(
+        'pk', flat=True)[:1]
+    if first_recent:
+        return first_recent[0] - 1
+    last_event = FriendInfo.friendinfom.order_by('-pk').values_list('pk', flat=True)[:1]
+    return last_event[0] if last_event else 0
+
+
+class FriendGraph(object):
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.ids = EMPTY
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.indices = EMPTY
+        self.added = defaultdict(set)
+        self.removed = defaultdict(set)
+        self.last_event_id = 0
+        # Event ids below last_event_id not seen yet -> time they were noticed
+        self.gaps = {}
+        self.built = False
+        self.refreshed = 0
+
+    def set_edges(self, src, dst, is_sorted=False):
+        """
+        Replaces the arrays with the given directed edges. ``is_sorted`` skips
+        the sort (and its copies) for edges sorted by source and destination,
+        as ``load_edges`` returns them.
+        """
+        if not is_sorted:
+            order = np.lexsort((dst, src))
+            src, dst = src[order], dst[order]
+        ids, counts = np.unique(src, return_counts=True)
+        indptr = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        with self.lock:
+            self.ids, self.indptr, self.indices = ids, indptr, dst
+            self.added.clear()
+            self.removed.clear()
+
+    def build(self):
+        # Events after the settled id are read again by the refresh, so
+        # transactions still open now are not missed. Applying an event twice,
+        # in order, does not change the result.
+        last_event_id = get_settled_event_id()
+        self.set_edges(*load_edges(), is_sorted=True)
+        with self.lock:
+            self.last_event_id = last_event_id
+            self.gaps.clear()
+            self.built = True
+        self.refresh()
+
+    def refresh(self):
+        """
+        Applies friendship events committed after the last build or refresh,
+        including those of other processes.
+
+        Ids are taken before commit, so an event may commit after events with
+        higher ids were applied. Missing ids are looked up again for
+        ``FRIEND_GRAPH_GAP_SECONDS``, then taken for rolled back transactions.
+        Events of one pair of users cannot overtake each other: transitions
+        lock both users.
+        """
+        with self.lock:
+            last_event_id, gaps = self.last_event_id, list(self.gaps)
+        events = FriendInfo.friendinfom.filter(
+            Q(pk__gt=last_event_id) | Q(pk__in=gaps)
+        ).order_by('pk').values_list('pk', 'user1_id', 'user2_id', 'status')
+        now = time.time()
+        with self.lock:
+            for pk, user1_id, user2_id, status in events:
+                if pk > self.last_event_id:
+                    room = max(0, settings.FRIEND_GRAPH_MAX_GAPS - len(self.gaps))
+                    for missing in xrange(self.last_event_id + 1, min(pk, self.last_event_id + 1 + room)):
+                        self.gaps[missing] = now
+                    self.last_event_id = pk
+                elif self.gaps.pop(pk, None) is None:
+                    # Applied by a concurrent refresh.
+                    continue
+                if status in FRIENDSHIP_STATUSES:
+                    self.apply_event(user1_id, user2_id, status)
+            for pk, noticed in self.gaps.items():
+                if now - noticed > settings.FRIEND_GRAPH_GAP_SECONDS:
+                    del self.gaps[pk]
+            self.refreshed = now
+            if len(self.added) + len(self.removed) > settings.FRIEND_GRAPH_MAX_DELTA:
+                self.compact()
+
+    def invalidate(self):
+        """
+        Makes the next ``ensure_fresh`` refresh regardless of the interval.
+        """
+        self.refreshed = 0
+
+    def ensure_fresh(self):
+        if not self.built:
+            self.build()
+        elif (time.time() - self.refreshed > settings.FRIEND_GRAPH_REFRESH_SECONDS and
+              not transaction.get_connection(FriendInfo.friendinfom.db).in_atomic_block):
+            # Inside a transaction the refresh would see its uncommitted events.
+            self.refresh()
+
+    def apply_event(self, user1_id, user2_id, status):
+        with self.lock:
+            for a, b in ((user1_id, user2_id), (user2_id, user1_id)):
+                if status == FriendInfo.STATUS_FRIENDS:
+                    self.added[a].add(b)
+                    self.removed[a].discard(b)
+                else:
+                    self.removed[a].add(b)
+                    self.added[a].discard(b)
+
+    def compact(self):
+        with self.lock:
+            touched = np.array(sorted(set(self.added) | set(self.removed)), dtype=ID_DTYPE)
+            src = np.repeat(self.ids, np.diff(self.indptr))
+            keep = ~np.in1d(src, touched)
+            src_parts, dst_parts = [src[keep]], [self.indices[keep]]
+            for user_id in touched:
+                friends = self.friends_of(user_id)
+                src_parts.append(np.full(len(friends), user_id, dtype=ID_DTYPE))
+                dst_parts.append(friends)
+            self.set_edges(np.concatenate(src_parts), np.concatenate(dst_parts))
+
+    def _base_friends(self, user_id):
+        i = np.searchsorted(self.ids, user_id)
+        if i < len(self.ids) and self.ids[i] == user_id:
+            return self.indices[self.indptr[i]:self.indptr[i + 1]]
+        return EMPTY
+
+    def friends_of(self, user_id):
+        friends = self._base_friends(user_id)
+        if user_id in self.added:
+            friends = np.union1d(friends, np.fromiter(self.added[user_id], dtype=ID_DTYPE))
+        if user_id in self.removed:
+            friends = np.setdiff1d(friends, np.fromiter(self.removed[user_id], dtype=ID_DTYPE), assume_unique=True)
+        return friends
+
+    def friends_of_many(self, user_ids):
+        """
+        Concatenated friend lists of ``user_ids``, gathered from the arrays in one
+        vectorized step for users without pending changes.
+        """
+        with self.lock:
+            user_ids = np.asarray(user_ids, dtype=ID_DTYPE)
+            changed = np.fromiter((user_id in self.added or user_id in self.removed for user_id in user_ids),
+                                  dtype=bool, count=len(user_ids))
+            plain = user_ids[~changed]
+            rows = np.searchsorted(self.ids, plain)
+            found = rows < len(self.ids)
+            rows = rows[found][self.ids[rows[found]] == plain[found]]
+            starts, lengths = self.indptr[rows], np.diff(self.indptr)[rows]
+            offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+            parts = [self.indices[offsets + np.arange(lengths.sum())]]
+            parts.extend(self.friends_of(user_id) for user_id in user_ids[changed])
+            return np.concatenate(parts)
+
+    def mutual_friends(self, user1_id, user2_id):
+        with self.lock:
+            return np.intersect1d(self.friends_of(user1_id), self.friends_of(user2_id), assume_unique=True)
+
+    def suggestions(self, user_id, limit=10):
+        """
+        Returns up to ``limit`` ``(user_id, mutual friends count)`` pairs of
+        friends of friends, most mutual friends first.
+        """
+        with self.lock:
+            friends = self.friends_of(user_id)
+            if not len(friends):
+                return []
+            candidates = self.friends_of_many(friends)
+        candidates = candidates[(candidates != user_id) & ~np.in1d(candidates, friends)]
+        if not len(candidates):
+            return []
+        ids, counts = np.unique(candidates, return_counts=True)
+        top = np.lexsort((ids, -counts))[:limit]
+        return zip(ids[top].tolist(), counts[top].tolist())
+
+
+friend_graph = FriendGraph()
+
+
+@receiver(post_save, sender=FriendInfo)
+def refresh_on_friendship_event(sender, instance, created, **kwargs):
+    # The event is not committed yet; the next request of this process reads
+    # it back with a refresh instead of waiting for the interval.
+    if created and instance.status in FRIENDSHIP_STATUSES:
+        friend_graph.invalidate()
@@ -0,0 +1,12 @@
+# coding=utf-8
+from users import presence
+
+
+class PresenceMiddleware(object):
+    """
+    Records the last-seen time of authenticated users, see users.presence.
+    """
+
+    def process_request(self, request):
+        if request.user.is_authenticated():
+            presence.touch(request.user.pk)
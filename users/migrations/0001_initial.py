@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+import users.models
+import django.utils.timezone
+from django.conf import settings
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='User',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('password', models.CharField(max_length=128, verbose_name='password')),
+                ('last_login', models.DateTimeField(default=django.utils.timezone.now, verbose_name='last login')),
+                ('is_superuser', models.BooleanField(default=False, help_text='Designates that this user has all permissions without explicitly assigning them.', verbose_name='superuser status')),
+                ('email', models.EmailField(unique=True, max_length=75, verbose_name=b'email')),
+                ('first_name', models.CharField(max_length=30, verbose_name='\u0438\u043c\u044f')),
+                ('last_name', models.CharField(max_length=30, verbose_name='\u0444\u0430\u043c\u0438\u043b\u0438\u044f', blank=True)),
+                ('sex', models.SmallIntegerField(default=0, verbose_name='\u043f\u043e\u043b', choices=[(0, '-------'), (1, '\u043c\u0443\u0436\u0441\u043a\u043e\u0439'), (2, '\u0436\u0435\u043d\u0441\u043a\u0438\u0439')])),
+                ('birth_date', models.DateField(null=True, verbose_name='\u0434\u0430\u0442\u0430 \u0440\u043e\u0436\u0434\u0435\u043d\u0438\u044f', blank=True)),
+                ('city', models.CharField(max_length=80, verbose_name='\u0433\u043e\u0440\u043e\u0434', blank=True)),
+                ('work_place', models.CharField(max_length=120, verbose_name='\u043c\u0435\u0441\u0442\u043e \u0440\u0430\u0431\u043e\u0442\u044b', blank=True)),
+                ('about_me', models.TextField(max_length=1000, verbose_name='\u043e \u0441\u0435\u0431\u0435', blank=True)),
+                ('interests', models.TextField(max_length=1000, verbose_name='\u0438\u043d\u0442\u0435\u0440\u0435\u0441\u044b', blank=True)),
+                ('avatar', models.ImageField(upload_to=users.models.get_avatar_fn, verbose_name='\u0430\u0432\u0430\u0442\u0430\u0440', blank=True)),
+                ('confirned_registration', models.BooleanField(default=True, verbose_name='confirmed registration')),
+                ('is_staff', models.BooleanField(default=False, help_text='Designates whether the user can log into this admin site.', verbose_name='staff status')),
+                ('is_active', models.BooleanField(default=True, help_text='Designates whether this user should be treated as active. Unselect this instead of deleting accounts.', verbose_name='active')),
+                ('date_joined', models.DateTimeField(default=django.utils.timezone.now, verbose_name='date joined')),
+                ('friends', models.ManyToManyField(related_name='friends_rel_+', verbose_name='\u0434\u0440\u0443\u0437\u044c\u044f', to=settings.AUTH_USER_MODEL, blank=True)),
+                ('groups', models.ManyToManyField(related_query_name='user', related_name='user_set', to='auth.Group', blank=True, help_text='The groups this user belongs to. A user will get all permissions granted to each of his/her group.', verbose_name='groups')),
+            ],
+            options={
+                'ordering': ('first_name', 'last_name'),
+                'verbose_name': '\u043a\u043e\u043d\u0442\u0430\u043a\u0442\u043d\u043e\u0435 \u043b\u0438\u0446\u043e',
+                'verbose_name_plural': '\u043a\u043e\u043d\u0442\u0430\u043a\u0442\u043d\u044b\u0435 \u043b\u0438\u0446\u0430',
+            },
+            bases=(models.Model,),
+        ),
+        migrations.CreateModel(
+            name='FriendInfo',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('status', models.SmallIntegerField(default=0, verbose_name='\u0441\u0442\u0430\u0442\u0443\u0441', choices=[(0, '-------'), (1, '\u043f\u043e\u0434\u0440\u0443\u0436\u0438\u043b\u0438\u0441\u044c'), (2, '\u0440\u0430\u0437\u043e\u0440\u0432\u0430\u043b\u0438 \u0434\u0440\u0443\u0436\u0431\u0443')])),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='\u0434\u0430\u0442\u0430', db_index=True)),
+                ('user1', models.ForeignKey(related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user2', models.ForeignKey(related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ('-created',),
+            },
+            bases=(models.Model,),
+        ),
+        migrations.CreateModel(
+            name='FriendInvite',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('from_user', models.ForeignKey(related_name='out_friend_invites', to=settings.AUTH_USER_MODEL)),
+                ('to_user', models.ForeignKey(related_name='in_friend_invites', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+            },
+            bases=(models.Model,),
+        ),
+        migrations.CreateModel(
+            name='UserWallNewsM2M',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('friendinfo', models.ForeignKey(related_name='+', to='users.FriendInfo')),
+                ('user', models.ForeignKey(related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+            },
+            bases=(models.Model,),
+        ),
+        migrations.CreateModel(
+            name='UserWallPost',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('content', models.TextField(max_length=5000, verbose_name='\u0442\u0435\u043a\u0441\u0442')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='\u0434\u0430\u0442\u0430', db_index=True)),
+                ('author', models.ForeignKey(related_name='authors', verbose_name='\u0430\u0432\u0442\u043e\u0440', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(related_name='wall_posts', verbose_name='\u0432\u043b\u0430\u0434\u0435\u043b\u0435\u0446 \u0441\u0442\u0435\u043d\u044b', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ('-created',),
+            },
+            bases=(models.Model,),
+        ),
+        migrations.AlterUniqueTogether(
+            name='friendinvite',
+            unique_together=set([('from_user', 'to_user')]),
+        ),
+        migrations.AddField(
+            model_name='friendinfo',
+            name='user_post',
+            field=models.ForeignKey(related_name='+', blank=True, to='users.UserWallPost', null=True),
+            preserve_default=True,
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='news',
+            field=models.ManyToManyField(related_name='new_friends_and_you', through='users.UserWallNewsM2M', to='users.FriendInfo'),
+            preserve_default=True,
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='user_permissions',
+            field=models.ManyToManyField(related_query_name='user', related_name='user_set', to='auth.Permission', blank=True, help_text='Specific permissions for this user.', verbose_name='user permissions'),
+            preserve_default=True,
+        ),
+    ]
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+from django.conf import settings
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FriendSuggestion',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('score', models.PositiveIntegerField(verbose_name='\u043e\u0431\u0449\u0438\u0435 \u0434\u0440\u0443\u0437\u044c\u044f')),
+            ],
+            options={
+                'ordering': ('-score',),
+            },
+            bases=(models.Model,),
+        ),
+        migrations.CreateModel(
+            name='FriendSuggestionRun',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('last_event_id', models.PositiveIntegerField()),
+                ('users_count', models.PositiveIntegerField(default=0)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+            },
+            bases=(models.Model,),
+        ),
+        migrations.AddField(
+            model_name='friendsuggestion',
+            name='suggested',
+            field=models.ForeignKey(related_name='+', to=settings.AUTH_USER_MODEL),
+            preserve_default=True,
+        ),
+        migrations.AddField(
+            model_name='friendsuggestion',
+            name='user',
+            field=models.ForeignKey(related_name='+', to=settings.AUTH_USER_MODEL),
+            preserve_default=True,
+        ),
+        migrations.AlterUniqueTogether(
+            name='friendsuggestion',
+            unique_together=set([('user', 'suggested')]),
+        ),
+    ]
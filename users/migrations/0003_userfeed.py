@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+from django.conf import settings
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_friendsuggestion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserFeed',
+            fields=[
+                ('user', models.OneToOneField(related_name='+', primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('data', models.BinaryField(default=b'')),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+            },
+            bases=(models.Model,),
+        ),
+    ]
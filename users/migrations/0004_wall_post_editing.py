@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_userfeed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='friendinfo',
+            name='is_deleted',
+            field=models.BooleanField(default=False, verbose_name='\u0443\u0434\u0430\u043b\u0435\u043d\u043e'),
+            preserve_default=True,
+        ),
+        migrations.AddField(
+            model_name='userwallpost',
+            name='edited',
+            field=models.DateTimeField(db_index=True, null=True, verbose_name='\u0438\u0437\u043c\u0435\u043d\u0435\u043d\u043e', blank=True),
+            preserve_default=True,
+        ),
+        migrations.AddField(
+            model_name='userwallpost',
+            name='is_deleted',
+            field=models.BooleanField(default=False, verbose_name='\u0443\u0434\u0430\u043b\u0435\u043d\u043e'),
+            preserve_default=True,
+        ),
+    ]
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_wall_post_editing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='friends_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='\u0434\u0440\u0443\u0437\u0435\u0439', editable=False),
+            preserve_default=True,
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='wall_posts_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='\u0441\u043e\u043e\u0431\u0449\u0435\u043d\u0438\u0439 \u043d\u0430 \u0441\u0442\u0435\u043d\u0435', editable=False),
+            preserve_default=True,
+        ),
+    ]
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+def fill_counters(apps, schema_editor):
+    """
+    Counts the friends and wall posts of the users who existed before the
+    counters, with one UPDATE per distinct count.
+    """
+    User = apps.get_model('users', 'User')
+    UserWallPost = apps.get_model('users', 'UserWallPost')
+    counts = {
+        'friends_count': User.friends.through.objects.values('from_user_id').order_by().annotate(
+            n=models.Count('pk')).values_list('from_user_id', 'n'),
+        'wall_posts_count': UserWallPost.objects.filter(is_deleted=False).values('user_id').order_by().annotate(
+            n=models.Count('pk')).values_list('user_id', 'n'),
+    }
+    for field, rows in counts.items():
+        user_ids_by_count = {}
+        for user_id, n in rows:
+            user_ids_by_count.setdefault(n, []).append(user_id)
+        for n, user_ids in user_ids_by_count.items():
+            for i in range(0, len(user_ids), 500):
+                User.objects.filter(pk__in=user_ids[i:i + 500]).update(**{field: n})
+
+
+def keep_counters(apps, schema_editor):
+    # The columns are dropped by reversing 0005.
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_counters, keep_counters),
+    ]
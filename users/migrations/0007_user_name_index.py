@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_fill_counters'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='user',
+            index_together=set([('last_name', 'first_name'), ('first_name', 'last_name')]),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_user_name_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='last_seen',
+            field=models.DateTimeField(verbose_name='\u043f\u043e\u0441\u043b\u0435\u0434\u043d\u0438\u0439 \u0432\u0438\u0437\u0438\u0442', null=True, editable=False, blank=True),
+            preserve_default=True,
+        ),
+    ]
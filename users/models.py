@@ -2,23 +2,74 @@
 import hashlib
 import os
 import datetime
-from django.contrib.sites.models import Site
-from django.core.signing import Signer, TimestampSigner
-from django.core.urlresolvers import reverse
-from django.db.models import Q
+from django.core.cache import cache
+from django.db.models import Q, F, Max
 from django.utils.crypto import get_random_string
 from django.utils.translation import ugettext_lazy as _, ugettext
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
-from django.core.mail import send_mail
-from django.db import models
+from django.db import models, transaction, connection, IntegrityError
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.utils import timezone
-from microsocial.settings import MEDIA_URL
+from microsocial.models import OutgoingEmail
+from django.conf import settings
 
 
 def get_ids_from_users(*users):
     return [user.pk if isinstance(user, User) else int(user) for user in users]
 
 
+def get_user_cache_key(user_id):
+    return 'users:user:{}'.format(user_id)
+
+
+# Stored in place of a changed user, see invalidate_cached_users().
+USER_CACHE_INVALIDATED = 'invalidated'
+
+
+def invalidate_cached_users(user_ids):
+    """
+    Replaces the cached rows of the users with a marker that keeps them out of
+    the cache for ``AUTH_USER_CACHE_INVALIDATED_SECONDS``. A plain delete runs
+    before the transaction that changed them commits, and Django 1.7 has no
+    on_commit hook: a concurrent request could cache the old row again for the
+    whole ``AUTH_USER_CACHE_TIMEOUT``.
+    """
+    cache.set_many(dict((get_user_cache_key(user_id), USER_CACHE_INVALIDATED) for user_id in user_ids),
+                   settings.AUTH_USER_CACHE_INVALIDATED_SECONDS)
+
+
+def lock_users(*user_ids):
+    """
+    Locks the user rows until the end of the current transaction. Rows are
+    locked in id order, so concurrent transitions over the same users wait for
+    each other instead of deadlocking. A no-op on backends without row locks.
+    """
+    list(User.objects.select_for_update().filter(pk__in=user_ids).order_by('pk').values_list('pk', flat=True))
+
+
+def adjust_counters(field, deltas):
+    """
+    Adds ``delta`` to the ``field`` counter of every user in the ``{user_id:
+    delta}`` mapping with one F() update per distinct delta. ``update()`` sends
+    no signals, so the cached users are invalidated here.
+    """
+    user_ids_by_delta = {}
+    for user_id, delta in deltas.iteritems():
+        if delta:
+            user_ids_by_delta.setdefault(delta, []).append(user_id)
+    for delta, user_ids in user_ids_by_delta.iteritems():
+        User.objects.filter(pk__in=user_ids).update(**{field: F(field) + delta})
+    invalidate_cached_users(deltas)
+
+
+def get_registration_email(url):
+    return (
+        ugettext(u'Подтвердите регистрацию на Microsocial'),
+        ugettext(u'Для подтверждения перейдите по ссылке: {}'.format(url)),
+    )
+
+
 class UserManager(BaseUserManager):
 
     def _create_user(self, email, password, is_staff, is_superuser, **extra_fields):
@@ -39,36 +90,124 @@ class UserManager(BaseUserManager):
     def create_superuser(self, email, password, **extra_fields):
         return self._create_user(email, password, True, True, **extra_fields)
 
+    def with_friendship(self, viewer):
+        """
+        Annotates users with ``is_my_friend`` for ``viewer`` inside the same
+        query.
+        """
+        if not viewer.is_authenticated():
+            return self.extra(select={'is_my_friend': '0'})
+        through = self.model.friends.through
+        qn = connection.ops.quote_name
+        return self.extra(
+            select={'is_my_friend': 'EXISTS (SELECT 1 FROM {} WHERE {} = {}.{} AND {} = %s)'.format(
+                qn(through._meta.db_table), qn('from_user_id'), qn(self.model._meta.db_table), qn('id'),
+                qn('to_user_id'),
+            )},
+            select_params=(viewer.pk,),
+        )
+
 
 class UserFriendShipManager(models.Manager):
     def are_friends(self, user1, user2):
         user1_id, user2_id = get_ids_from_users(user1, user2)
         return self.filter(pk=user1_id, friends__pk=user2_id).exists()
 
+    @transaction.atomic
     def add(self, user1, user2):
         user1_id, user2_id = get_ids_from_users(user1, user2)
         if user1_id == user2_id:
             raise ValueError(_(u'Нельзя самого себе добавить в друзья'))
-        if not self.are_friends(user1_id, user2_id):
-            through_model = self.model.friends.through
-            through_model.objects.bulk_create([
-                through_model(from_user_id=user1_id, to_user_id=user2_id),
-                through_model(from_user_id=user2_id, to_user_id=user1_id),
-            ])
+        through_model = self.model.friends.through
+        # The unique (from_user, to_user) constraint decides whether the users
+        # are friends already, no check-then-insert.
+        try:
+            with transaction.atomic():
+                through_model.objects.bulk_create([
+                    through_model(from_user_id=user1_id, to_user_id=user2_id),
+                    through_model(from_user_id=user2_id, to_user_id=user1_id),
+                ])
+        except IntegrityError:
+            created = None
+        else:
+            created = True
+            adjust_counters('friends_count', {user1_id: 1, user2_id: 1})
             FriendInfo.friendinfom.add_info(user1_id, user2_id, FriendInfo.STATUS_FRIENDS)
-            FriendInvite.objects.filter(
-                Q(from_user_id=user1_id, to_user_id=user2_id) | Q(from_user_id=user2_id, to_user_id=user1_id)
-            ).delete()
-            return True
-
+        # Invites sent while the users were becoming friends go away either way.
+        FriendInvite.objects.filter(
+            Q(from_user_id=user1_id, to_user_id=user2_id) | Q(from_user_id=user2_id, to_user_id=user1_id)
+        ).delete()
+        return created
+
+    @transaction.atomic
+    def add_many(self, user, others):
+        """
+        Makes ``user`` friends with all of ``others`` using a fixed number of
+        queries. Returns the ids of the new friends.
+        """
+        user_id = get_ids_from_users(user)[0]
+        other_ids = set(get_ids_from_users(*others))
+        other_ids.discard(user_id)
+        if not other_ids:
+            return []
+        lock_users(user_id, *other_ids)
+        through_model = self.model.friends.through
+        new_ids = sorted(other_ids.difference(through_model.objects.filter(
+            from_user_id=user_id, to_user_id__in=other_ids
+        ).values_list('to_user_id', flat=True)))
+        if not new_ids:
+            return []
+        through_model.objects.bulk_create(
+            [through_model(from_user_id=user_id, to_user_id=other_id) for other_id in new_ids] +
+            [through_model(from_user_id=other_id, to_user_id=user_id) for other_id in new_ids]
+        )
+        deltas = dict.fromkeys(new_ids, 1)
+        deltas[user_id] = len(new_ids)
+        adjust_counters('friends_count', deltas)
+        FriendInfo.friendinfom.add_info_many(user_id, new_ids, FriendInfo.STATUS_FRIENDS)
+        FriendInvite.objects.filter(
+            Q(from_user_id=user_id, to_user_id__in=new_ids) | Q(from_user_id__in=new_ids, to_user_id=user_id)
+        ).delete()
+        return new_ids
+
+    @transaction.atomic
+    def delete_many(self, user, others):
+        """
+        Removes all of ``others`` from the friends of ``user``. Returns the ids of
+        the removed friends.
+        """
+        user_id = get_ids_from_users(user)[0]
+        other_ids = set(get_ids_from_users(*others))
+        if not other_ids:
+            return []
+        lock_users(user_id, *other_ids)
+        through_model = self.model.friends.through
+        friend_ids = sorted(through_model.objects.filter(
+            from_user_id=user_id, to_user_id__in=other_ids
+        ).values_list('to_user_id', flat=True))
+        if not friend_ids:
+            return []
+        FriendInfo.friendinfom.add_info_many(user_id, friend_ids, FriendInfo.STATUS_NO_FRIENDS)
+        through_model.objects.filter(
+            Q(from_user_id=user_id, to_user_id__in=friend_ids) | Q(from_user_id__in=friend_ids, to_user_id=user_id)
+        ).delete()
+        deltas = dict.fromkeys(friend_ids, -1)
+        deltas[user_id] = -len(friend_ids)
+        adjust_counters('friends_count', deltas)
+        return friend_ids
+
+    @transaction.atomic
     def delete(self, user1, user2):
         user1_id, user2_id = get_ids_from_users(user1, user2)
-        if self.are_friends(user1_id, user2_id):
+        through_model = self.model.friends.through
+        friendship = through_model.objects.select_for_update().filter(
+            Q(from_user_id=user1_id, to_user_id=user2_id) | Q(from_user_id=user2_id, to_user_id=user1_id)
+        )
+        row_ids = list(friendship.values_list('pk', flat=True))
+        if row_ids:
             FriendInfo.friendinfom.add_info(user1_id, user2_id, FriendInfo.STATUS_NO_FRIENDS)
-            through_model = self.model.friends.through
-            through_model.objects.filter(
-                Q(from_user_id=user1_id, to_user_id=user2_id) | Q(from_user_id=user2_id, to_user_id=user1_id)
-            ).delete()
+            through_model.objects.filter(pk__in=row_ids).delete()
+            adjust_counters('friends_count', {user1_id: -1, user2_id: -1})
             return True
 
 
@@ -108,20 +247,36 @@ class User(AbstractBaseUser, PermissionsMixin):
                                     help_text=_('Designates whether this user should be treated as '
                                                 'active. Unselect this instead of deleting accounts.'))
     date_joined = models.DateTimeField(_('date joined'), default=timezone.now)
+    # Written in batches by users.presence, read through presence.attach().
+    last_seen = models.DateTimeField(_(u'последний визит'), null=True, blank=True, editable=False)
     friends = models.ManyToManyField('self', symmetrical=True, verbose_name=_(u'друзья'), blank=True)
     news = models.ManyToManyField('FriendInfo', through='UserWallNewsM2M', through_fields=('user', 'friendinfo'),
                                   related_name='new_friends_and_you'
                                   )
     # news = models.ManyToManyField('FriendInfo',  related_name='news_friends_and_you')
+    # Kept by the friendship managers and wall posts, see adjust_counters().
+    friends_count = models.PositiveIntegerField(_(u'друзей'), default=0, editable=False)
+    wall_posts_count = models.PositiveIntegerField(_(u'сообщений на стене'), default=0, editable=False)
 
     class Meta:
         verbose_name = _(u'контактное лицо')
         verbose_name_plural = _(u'контактные лица')
         ordering = ('first_name', 'last_name')
+        index_together = (('first_name', 'last_name'), ('last_name', 'first_name'))
+
+    # Written with update() only; a full save() of an instance loaded earlier
+    # would write their old values back.
+    UPDATE_ONLY_FIELDS = ('last_seen', 'friends_count', 'wall_posts_count')
 
     def __unicode__(self):
         return u'{} {}'.format(self.first_name, self.last_name)
 
+    def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
+        if update_fields is None and not force_insert and not self._state.adding:
+            update_fields = [field.name for field in self._meta.concrete_fields
+                             if not field.primary_key and field.name not in self.UPDATE_ONLY_FIELDS]
+        super(User, self).save(force_insert, force_update, using, update_fields)
+
     objects = UserManager()
     friendship = UserFriendShipManager()
 
@@ -138,36 +293,30 @@ class User(AbstractBaseUser, PermissionsMixin):
     def get_avatar(self):
         if self.avatar:
             return self.avatar.url
-        return u'{}{}'.format(MEDIA_URL, 'img_default/avatar.jpg')
+        return u'{}{}'.format(settings.MEDIA_URL, 'img_default/avatar.jpg')
 
     def get_last_login_hash(self):
         return hashlib.md5(self.last_login.strftime('%Y-%m-%d-%H-%M-%S-%f')).hexdigest()[:8]
 
-    def email_user(self, subject, message, from_email=None, **kwargs):
-        send_mail(subject, message, from_email, [self.email], **kwargs)
+    def email_user(self, subject, message, from_email=None):
+        """
+        Queues the email; it is delivered by ``manage.py send_queued_mail``.
+        """
+        OutgoingEmail.objects.enqueue(subject, message, from_email, [self.email])
 
     def send_registration_email(self):
-        url = 'http://{}{}'.format(
-            Site.objects.get_current().domain,
-            reverse('registration_confirm', kwargs={'token': Signer(salt='registration-confirm').sign(self.pk)})
-        )
-        self.email_user(
-            ugettext(u'Подтвердите регистрацию на Microsocial'),
-            ugettext(u'Для подтверждения перейдите по ссылке: {}'.format(url))
-        )
+        from auths.tokens import tokens
+
+        self.email_user(*get_registration_email(tokens.get_registration_url(self.pk)))
 
     def send_password_recovery_email(self):
-        data = '{}:{}'.format(self.pk, self.get_last_login_hash())
-        url = 'http://{}{}'.format(
-            Site.objects.get_current().domain,
-            reverse('password_recovery_confirm', kwargs={
-                'token': TimestampSigner(salt='password-recovery-confirm').sign(data)
-            })
-        )
+        from auths.tokens import tokens
+
+        url = tokens.get_recovery_url(self)
         self.email_user(
             ugettext(u'Подтвердите восстановления пароля на Microsocial'),
-            ugettext(u'Для подтверждения перейдите по ссылке: {}'.format(url)),
-            ugettext(u'Внимание данная ссылка будет действовать 48 часов')
+            u'{}\n{}'.format(ugettext(u'Для подтверждения перейдите по ссылке: {}'.format(url)),
+                             ugettext(u'Внимание данная ссылка будет действовать 48 часов'))
         )
 
     def get_age(self):
@@ -175,37 +324,106 @@ class User(AbstractBaseUser, PermissionsMixin):
             return int((datetime.date.today() - self.birth_date).days / 365.2425)
 
 
+class FriendSuggestion(models.Model):
+    user = models.ForeignKey(User, related_name='+')
+    suggested = models.ForeignKey(User, related_name='+')
+    score = models.PositiveIntegerField(_(u'общие друзья'))
+
+    class Meta:
+        unique_together = ('user', 'suggested')
+        ordering = ('-score',)
+
+
+class FriendSuggestionRun(models.Model):
+    last_event_id = models.PositiveIntegerField()
+    users_count = models.PositiveIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+
+
+@receiver((post_save, post_delete), sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    invalidate_cached_users([instance.pk])
+
+
 class UserWallPost(models.Model):
     user = models.ForeignKey(User, verbose_name=_(u'владелец стены'), related_name='wall_posts',)
     author = models.ForeignKey(User, verbose_name=_(u'автор'), related_name='authors',)
     content = models.TextField(_(u'текст'), max_length=5000)
     created = models.DateTimeField(_(u'дата'), auto_now_add=True, db_index=True)
+    # Also set on deletion, see get_wall_stamp().
+    edited = models.DateTimeField(_(u'изменено'), null=True, blank=True, db_index=True)
+    is_deleted = models.BooleanField(_(u'удалено'), default=False)
 
     class Meta:
         ordering = ('-created',)
 
+    def can_edit(self, user):
+        return user.pk == self.author_id
+
+    def can_delete(self, user):
+        return user.pk in (self.author_id, self.user_id)
+
+    @transaction.atomic
+    def mark_deleted(self):
+        """
+        Hides the post and its news event everywhere with two updates. The news
+        rows are removed later by ``manage.py compact_feeds``.
+        """
+        # The conditional update makes a repeated deletion a no-op for the counter.
+        now = timezone.now()
+        if not UserWallPost.objects.filter(pk=self.pk, is_deleted=False).update(is_deleted=True, edited=now):
+            return
+        self.is_deleted = True
+        self.edited = now
+        adjust_counters('wall_posts_count', {self.user_id: -1})
+        FriendInfo.friendinfom.filter(user_post=self).update(is_deleted=True)
+
+
+def get_wall_stamp(posts=None):
+    """
+    Time of the latest edit or deletion of ``posts``, all wall posts by
+    default. New posts change the counters of the wall owners instead.
+    """
+    if posts is None:
+        posts = UserWallPost.objects.all()
+    return posts.aggregate(Max('edited'))['edited__max']
+
+
+@receiver(post_save, sender=UserWallPost)
+def count_wall_post(sender, instance, created, **kwargs):
+    if created and not instance.is_deleted:
+        adjust_counters('wall_posts_count', {instance.user_id: 1})
+
 
 class FriendInviteManager(models.Manager):
     def is_pending(self, from_user, to_user):
         from_user_id, to_user_id = get_ids_from_users(from_user, to_user)
         return self.filter(from_user_id=from_user_id, to_user_id=to_user_id).exists()
 
+    @transaction.atomic
     def add(self, from_user, to_user):
         from_user_id, to_user_id = get_ids_from_users(from_user, to_user)
         if from_user_id == to_user_id:
             raise ValueError(_(u'Нельзя самого себе добавить в друзья'))
+        # Serializes crossing invites of the same two users.
+        lock_users(from_user_id, to_user_id)
         if User.friendship.are_friends(from_user_id, to_user_id):
             raise ValueError(_(u'Ви уже друзья.'))
-        if self.is_pending(from_user_id, to_user_id):
+        pending_from = set(self.filter(
+            Q(from_user_id=from_user_id, to_user_id=to_user_id) | Q(from_user_id=to_user_id, to_user_id=from_user_id)
+        ).values_list('from_user_id', flat=True))
+        if from_user_id in pending_from:
             raise ValueError(_(u'Заявка уже создана и ожидает рассмотрения.'))
-        if self.is_pending(to_user_id, from_user_id):
+        if to_user_id in pending_from:
             User.friendship.add(from_user_id, to_user_id)
             return 2
         self.create(from_user_id=from_user_id, to_user_id=to_user_id)
         return 1
 
+    @transaction.atomic
     def approve(self, from_user, to_user):
         from_user_id, to_user_id = get_ids_from_users(from_user, to_user)
+        lock_users(from_user_id, to_user_id)
         if not self.is_pending(from_user_id, to_user_id):
             raise ValueError(_(u'Заявка не существует.'))
         return User.friendship.add(from_user, to_user)
@@ -214,6 +432,52 @@ class FriendInviteManager(models.Manager):
         from_user_id, to_user_id = get_ids_from_users(from_user, to_user)
         self.filter(from_user_id=from_user_id, to_user_id=to_user_id).delete()
 
+    @transaction.atomic
+    def add_many(self, from_user, to_users):
+        """
+        Sends invites from ``from_user`` to all of ``to_users``; users who already
+        invited ``from_user`` become friends instead. Returns a ``(invited ids,
+        new friend ids)`` pair. Friends and pending invites are skipped.
+        """
+        from_user_id = get_ids_from_users(from_user)[0]
+        to_user_ids = set(get_ids_from_users(*to_users))
+        to_user_ids.discard(from_user_id)
+        if not to_user_ids:
+            return [], []
+        lock_users(from_user_id, *to_user_ids)
+        to_user_ids.difference_update(User.friends.through.objects.filter(
+            from_user_id=from_user_id, to_user_id__in=to_user_ids
+        ).values_list('to_user_id', flat=True))
+        pending_out, pending_in = set(), set()
+        for invite_from_id, invite_to_id in self.filter(
+            Q(from_user_id=from_user_id, to_user_id__in=to_user_ids) |
+            Q(from_user_id__in=to_user_ids, to_user_id=from_user_id)
+        ).values_list('from_user_id', 'to_user_id'):
+            if invite_from_id == from_user_id:
+                pending_out.add(invite_to_id)
+            else:
+                pending_in.add(invite_from_id)
+        invited_ids = sorted(to_user_ids - pending_out - pending_in)
+        self.bulk_create([self.model(from_user_id=from_user_id, to_user_id=to_user_id) for to_user_id in invited_ids])
+        return invited_ids, User.friendship.add_many(from_user_id, pending_in)
+
+    @transaction.atomic
+    def approve_many(self, from_users, to_user):
+        """
+        Approves the invites of all of ``from_users`` to ``to_user``. Returns the
+        ids of the new friends.
+        """
+        to_user_id = get_ids_from_users(to_user)[0]
+        from_user_ids = get_ids_from_users(*from_users)
+        lock_users(to_user_id, *from_user_ids)
+        return User.friendship.add_many(to_user_id, self.filter(
+            from_user_id__in=from_user_ids, to_user_id=to_user_id
+        ).values_list('from_user_id', flat=True))
+
+    def reject_many(self, from_users, to_user):
+        to_user_id = get_ids_from_users(to_user)[0]
+        self.filter(from_user_id__in=get_ids_from_users(*from_users), to_user_id=to_user_id).delete()
+
 
 class FriendInvite(models.Model):
     from_user = models.ForeignKey(User, related_name='out_friend_invites')
@@ -230,22 +494,56 @@ class FriendInfoManager(models.Manager):
         temp = self.create(user1_id=user1_id, user2_id=user2_id, status=status)
         FriendInfo.friendinfom.create_m2m(user1_id, user2_id, temp)
 
+    def add_info_many(self, user_id, other_ids, status):
+        """
+        Inserts the events with one query. bulk_create does not return the ids
+        on every backend, so they are read back: the caller holds the locks of
+        all the users, so the newest event of each pair is the one just
+        inserted.
+        """
+        self.bulk_create([self.model(user1_id=user_id, user2_id=other_id, status=status) for other_id in other_ids])
+        last_ids = self.filter(user1_id=user_id, user2_id__in=other_ids, status=status).values(
+            'user2_id').annotate(last_id=Max('pk')).values_list('last_id', flat=True)
+        infos = list(self.filter(pk__in=list(last_ids)).order_by('pk'))
+        for info in infos:
+            # bulk_create sends no post_save.
+            post_save.send(sender=self.model, instance=info, created=True, raw=False, using=self.db,
+                           update_fields=None)
+        self.create_m2m_many(infos)
+
     def add_post_wall(self, user1_id, user2_id, post):
         temp = self.create(user1_id=user1_id, user2_id=user2_id, user_post=post)
         if user1_id == user2_id:
-            UserWallNewsM2M.objects.create(user_id=user1_id, friendinfo_id=temp.pk)
+            recipients = [(user1_id, temp.pk)]
         elif not User.friendship.are_friends(user1_id, user2_id):
-            UserWallNewsM2M.objects.bulk_create([
-                    UserWallNewsM2M(user_id=user1_id, friendinfo_id=temp.pk),
-                    UserWallNewsM2M(user_id=user2_id, friendinfo_id=temp.pk),
-            ])
-        FriendInfo.friendinfom.create_m2m(user1_id, user2_id, temp)
+            recipients = [(user1_id, temp.pk), (user2_id, temp.pk)]
+        else:
+            recipients = []
+        FriendInfo.friendinfom.create_m2m_many([temp], recipients)
 
     def create_m2m(self, user1_id, user2_id, friends_info):
-        user1 = User.objects.get(pk=user1_id)
-        user2 = User.objects.get(pk=user2_id)
-        for pk in set(user1.friends.values_list('pk', flat=True)).union(user2.friends.values_list('pk', flat=True)):
-            UserWallNewsM2M.objects.create(user_id=pk, friendinfo_id=friends_info.pk)
+        self.create_m2m_many([friends_info])
+
+    def create_m2m_many(self, friends_infos, recipients=()):
+        """
+        Puts every event into the news of the friends of both its users, plus
+        the given ``(user_id, friendinfo_id)`` recipients, with one query for the
+        friends and one write to the feed store.
+        """
+        from users.feeds import get_feed_store
+
+        user_ids = set()
+        for info in friends_infos:
+            user_ids.update((info.user1_id, info.user2_id))
+        friends = dict((user_id, set()) for user_id in user_ids)
+        for from_user_id, to_user_id in User.friends.through.objects.filter(
+            from_user_id__in=user_ids
+        ).values_list('from_user_id', 'to_user_id'):
+            friends[from_user_id].add(to_user_id)
+        recipients = set(recipients)
+        for info in friends_infos:
+            recipients.update((pk, info.pk) for pk in friends[info.user1_id] | friends[info.user2_id])
+        get_feed_store().push(recipients)
 
 
 class FriendInfo(models.Model):
@@ -262,6 +560,7 @@ class FriendInfo(models.Model):
     status = models.SmallIntegerField(_(u'статус'), choices=STATUS_CHOICES, default=STATUS_NONE)
     created = models.DateTimeField(_(u'дата'), auto_now_add=True, db_index=True)
     user_post = models.ForeignKey(UserWallPost, related_name='+', null=True, blank=True)
+    is_deleted = models.BooleanField(_(u'удалено'), default=False)
 
     class Meta:
         ordering = ('-created',)
@@ -273,8 +572,72 @@ class FriendInfo(models.Model):
     friendinfom = FriendInfoManager()
 
 
+def get_friendship_stamp(user_ids):
+    """
+    Id of the latest friendship event of any of ``user_ids``. Their friends,
+    and so their mutual friends, change only with a new one; the events of one
+    user are written under the lock of their row, so the ids grow in commit
+    order.
+    """
+    return FriendInfo.friendinfom.filter(
+        Q(user1__in=user_ids) | Q(user2__in=user_ids),
+        status__in=(FriendInfo.STATUS_FRIENDS, FriendInfo.STATUS_NO_FRIENDS),
+    ).order_by().aggregate(Max('pk'))['pk__max']
+
+
 class UserWallNewsM2M(models.Model):
     user = models.ForeignKey(User, related_name='+')
     friendinfo = models.ForeignKey(FriendInfo, related_name='+')
 
 
+def encode_ids(ids):
+    """
+    Packs ascending ids as varint-encoded deltas.
+    """
+    data = bytearray()
+    previous = 0
+    for value in ids:
+        delta = value - previous
+        previous = value
+        while delta >= 0x80:
+            data.append(delta & 0x7f | 0x80)
+            delta >>= 7
+        data.append(delta)
+    return bytes(data)
+
+
+def decode_ids(data):
+    ids = []
+    previous = delta = shift = 0
+    for byte in bytearray(data):
+        delta |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            previous += delta
+            ids.append(previous)
+            delta = shift = 0
+    return ids
+
+
+class UserFeed(models.Model):
+    """
+    The recent news of a user as a packed array of ``FriendInfo`` ids, an
+    alternative to one ``UserWallNewsM2M`` row per news item.
+    """
+    user = models.OneToOneField(User, primary_key=True, related_name='+')
+    data = models.BinaryField(default=b'')
+    size = models.PositiveIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
+
+    def get_ids(self):
+        return decode_ids(self.data)
+
+    def set_ids(self, ids):
+        self.data = encode_ids(ids)
+        self.size = len(ids)
+
+    def add_ids(self, friendinfo_ids, limit):
+        self.set_ids(sorted(set(self.get_ids()).union(friendinfo_ids))[-limit:])
+
+
@@ -0,0 +1,95 @@
+# coding=utf-8
+"""
+Last-seen times of users. Requests update the time in the cache, at most once
+per ``PRESENCE_TOUCH_SECONDS`` per user and process, and in a process-local
+buffer that a background thread writes to ``User.last_seen`` every
+``PRESENCE_FLUSH_SECONDS``. A flush rounds the times down to
+``PRESENCE_BUCKET_SECONDS`` and runs one UPDATE per bucket, however many users
+were active. The times of the last interval of a process are lost when it
+exits; the cache still has them for ``PRESENCE_CACHE_TIMEOUT``.
+
+Readers take the cache first and ``User.last_seen`` for users missing there.
+"""
+import datetime
+import threading
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Q
+from django.utils import timezone
+from microsocial.utils import BackgroundFlusher
+from users.models import User
+
+_lock = threading.Lock()
+_pending = {}
+_touched = {}
+
+
+def get_cache():
+    return caches[settings.PRESENCE_CACHE]
+
+
+def get_presence_cache_key(user_id):
+    return 'users:seen:{}'.format(user_id)
+
+
+def touch(user_id, now=None):
+    now = now or time.time()
+    with _lock:
+        _pending[user_id] = now
+        write_cache = now - _touched.get(user_id, 0) >= settings.PRESENCE_TOUCH_SECONDS
+        if write_cache:
+            _touched[user_id] = now
+    if write_cache:
+        get_cache().set(get_presence_cache_key(user_id), now, settings.PRESENCE_CACHE_TIMEOUT)
+    _flusher.start()
+
+
+def flush():
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+        _touched.clear()
+    bucket_size = settings.PRESENCE_BUCKET_SECONDS
+    user_ids_by_bucket = {}
+    for user_id, seen in pending.iteritems():
+        user_ids_by_bucket.setdefault(int(seen // bucket_size) * bucket_size, []).append(user_id)
+    for bucket, user_ids in user_ids_by_bucket.iteritems():
+        last_seen = from_timestamp(bucket)
+        # Cached User objects keep their old last_seen; the condition stops a
+        # later save of such an object from moving the time back for long.
+        User.objects.filter(
+            Q(last_seen__isnull=True) | Q(last_seen__lt=last_seen), pk__in=user_ids
+        ).update(last_seen=last_seen)
+
+
+_flusher = BackgroundFlusher(flush, lambda: settings.PRESENCE_FLUSH_SECONDS)
+
+
+def from_timestamp(value):
+    return datetime.datetime.fromtimestamp(value, timezone.utc)
+
+
+def get_many(user_ids):
+    """
+    Returns ``{user_id: last seen timestamp}`` of the users found in the cache,
+    with one cache request.
+    """
+    user_ids = list(user_ids)
+    values = get_cache().get_many([get_presence_cache_key(user_id) for user_id in user_ids])
+    return dict((user_id, values[get_presence_cache_key(user_id)])
+                for user_id in user_ids if get_presence_cache_key(user_id) in values)
+
+
+def attach(users):
+    """
+    Sets ``seen`` (datetime or None) and ``is_online`` on every user of
+    ``users``.
+    """
+    users = [user for user in users if user is not None]
+    seen = get_many(set(user.pk for user in users))
+    online_since = timezone.now() - datetime.timedelta(seconds=settings.PRESENCE_ONLINE_SECONDS)
+    for user in users:
+        user.seen = from_timestamp(seen[user.pk]) if user.pk in seen else user.last_seen
+        user.is_online = bool(user.seen and user.seen >= online_since)
+    return users
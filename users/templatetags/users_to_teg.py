@@ -1,7 +1,7 @@
 # coding=utf-8
 from django.utils import timezone
 from django import template
-from microsocial.settings import STATIC_URL
+from django.conf import settings
 
 register = template.Library()
 
@@ -11,10 +11,17 @@ def get_avatar(user):
     try:
         return user.avatar.url
     except ValueError:
-        return '{}users/img/avatar.jpg'.format(STATIC_URL)
+        return '{}users/img/avatar.jpg'.format(settings.STATIC_URL)
 
 
 @register.filter
 def are_year_user(date):
     return timezone.now().year - date.year
 
+
+@register.inclusion_tag('users/tags/presence.html')
+def show_presence(user):
+    """
+    "Online" or "last seen" of a user passed through users.presence.attach().
+    """
+    return {'user': user}
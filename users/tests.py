@@ -1,3 +1,278 @@
-from django.test import TestCase
+# coding=utf-8
+import datetime
+from StringIO import StringIO
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+from microsocial.management.commands import compute_suggestions
+from users.feeds import get_feed_store
+from users.graph import FriendGraph, get_settled_event_id
+from users.models import User, FriendInfo, FriendInvite, FriendSuggestionRun, UserFeed, UserWallNewsM2M, UserWallPost
+from users.models import decode_ids, encode_ids
 
-# Create your tests here.
+
+def create_users(count):
+    return [User.objects.create_user(u'user{}@example.com'.format(i), first_name=u'user{}'.format(i)).pk
+            for i in xrange(count)]
+
+
+class Rollback(Exception):
+    pass
+
+
+class FriendGraphTest(TestCase):
+    def setUp(self):
+        self.a, self.b, self.c, self.d, self.e = create_users(5)
+
+    def build(self):
+        graph = FriendGraph()
+        graph.build()
+        return graph
+
+    def test_mutual_friends_and_suggestions(self):
+        for user1_id, user2_id in ((self.a, self.b), (self.a, self.c), (self.b, self.d), (self.c, self.d),
+                                   (self.b, self.e)):
+            User.friendship.add(user1_id, user2_id)
+        graph = self.build()
+        self.assertEqual(graph.mutual_friends(self.b, self.c).tolist(), [self.a, self.d])
+        self.assertEqual(graph.suggestions(self.a), [(self.d, 2), (self.e, 1)])
+
+    def test_refresh_applies_committed_events(self):
+        graph = self.build()
+        User.friendship.add(self.a, self.b)
+        graph.refresh()
+        self.assertEqual(graph.friends_of(self.a).tolist(), [self.b])
+        User.friendship.delete(self.a, self.b)
+        graph.refresh()
+        self.assertEqual(graph.friends_of(self.a).tolist(), [])
+        graph.compact()
+        self.assertEqual(graph.friends_of(self.b).tolist(), [])
+
+    def test_rolled_back_event_is_not_applied(self):
+        graph = self.build()
+        try:
+            with transaction.atomic():
+                User.friendship.add(self.a, self.b)
+                raise Rollback
+        except Rollback:
+            pass
+        graph.refresh()
+        self.assertEqual(graph.friends_of(self.a).tolist(), [])
+
+    def test_event_committed_out_of_order(self):
+        graph = self.build()
+        late = FriendInfo.friendinfom.create(user1_id=self.a, user2_id=self.b, status=FriendInfo.STATUS_FRIENDS)
+        FriendInfo.friendinfom.create(user1_id=self.c, user2_id=self.d, status=FriendInfo.STATUS_FRIENDS)
+        # The first event is not committed yet when the graph refreshes.
+        late_pk = late.pk
+        late.delete()
+        graph.refresh()
+        self.assertEqual(graph.friends_of(self.c).tolist(), [self.d])
+        self.assertIn(late_pk, graph.gaps)
+        FriendInfo.friendinfom.create(pk=late_pk, user1_id=self.a, user2_id=self.b, status=FriendInfo.STATUS_FRIENDS)
+        graph.refresh()
+        self.assertEqual(graph.friends_of(self.a).tolist(), [self.b])
+        self.assertEqual(graph.gaps, {})
+
+    def test_gaps_expire(self):
+        graph = self.build()
+        missing = FriendInfo.friendinfom.create(user1_id=self.a, user2_id=self.b, status=FriendInfo.STATUS_FRIENDS)
+        FriendInfo.friendinfom.create(user1_id=self.c, user2_id=self.d, status=FriendInfo.STATUS_FRIENDS)
+        missing.delete()
+        graph.refresh()
+        with self.settings(FRIEND_GRAPH_GAP_SECONDS=-1):
+            graph.refresh()
+        self.assertEqual(graph.gaps, {})
+
+
+class ComputeSuggestionsTest(TestCase):
+    def setUp(self):
+        self.ids = create_users(8)
+        for i, j in ((0, 1), (0, 2), (1, 3), (2, 3), (1, 4), (4, 5), (5, 6), (3, 6), (6, 7)):
+            User.friendship.add(self.ids[i], self.ids[j])
+        self.graph = FriendGraph()
+        self.graph.build()
+
+    def test_range_partitions_match_the_whole_graph(self):
+        # Small partitions and chunks, so every partition needs friend lists
+        # of other partitions and reads them in several queries.
+        tasks = list(compute_suggestions.Command().get_range_tasks(3, 10, 2))
+        self.assertEqual(len(tasks), 3)
+        results = {}
+        for task in tasks:
+            results.update(compute_suggestions._compute_partition(task)[1])
+        for user_id in self.ids:
+            self.assertEqual(results.get(user_id, []), self.graph.suggestions(user_id, 10))
+
+    def test_list_partition(self):
+        bounds, results = compute_suggestions._compute_partition((None, self.ids[:2], 10, 2))
+        self.assertEqual(dict(results), dict((user_id, self.graph.suggestions(user_id, 10))
+                                             for user_id in self.ids[:2]))
+
+    def test_runs_stop_before_recent_events(self):
+        event_ids = list(FriendInfo.friendinfom.order_by('pk').values_list('pk', flat=True))
+        # Transactions with lower ids may still be open, the next run reads
+        # all the events again.
+        self.assertEqual(get_settled_event_id(), event_ids[0] - 1)
+        FriendInfo.friendinfom.filter(pk__lt=event_ids[-1]).update(
+            created=timezone.now() - datetime.timedelta(days=1))
+        self.assertEqual(get_settled_event_id(), event_ids[-2])
+
+
+class FriendshipEventsTest(TestCase):
+    def setUp(self):
+        self.a, self.b, self.c, self.d = create_users(4)
+        User.friendship.add(self.a, self.d)
+
+    def test_add_many_and_delete_many_record_one_event_per_friend(self):
+        self.assertEqual(User.friendship.add_many(self.a, [self.b, self.c]), [self.b, self.c])
+        events = FriendInfo.friendinfom.filter(user1_id=self.a, status=FriendInfo.STATUS_FRIENDS).order_by('pk')
+        self.assertEqual([info.user2_id for info in events], [self.d, self.b, self.c])
+        # The friend of ``a`` gets the news of both new friendships.
+        self.assertEqual(set(get_feed_store().get_feed(User.objects.get(pk=self.d)).values_list('pk', flat=True)),
+                         set(info.pk for info in events))
+        self.assertEqual(User.friendship.delete_many(self.a, [self.b, self.c]), [self.b, self.c])
+        self.assertEqual(FriendInfo.friendinfom.filter(user1_id=self.a, status=FriendInfo.STATUS_NO_FRIENDS).count(), 2)
+
+
+class FriendInviteTest(TestCase):
+    def setUp(self):
+        self.a, self.b = create_users(2)
+
+    def test_add_of_friends_deletes_pending_invites(self):
+        User.friendship.add(self.a, self.b)
+        # An invite that raced with the friendship.
+        FriendInvite.objects.create(from_user_id=self.b, to_user_id=self.a)
+        self.assertIsNone(User.friendship.add(self.a, self.b))
+        self.assertFalse(FriendInvite.objects.exists())
+        self.assertEqual(User.objects.get(pk=self.a).friends_count, 1)
+
+
+class ConcurrentFriendshipTest(TransactionTestCase):
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.settings_dict['NAME'] == ':memory:':
+            # Every thread would get its own empty in-memory database.
+            self.skipTest('needs a test database shared between connections')
+
+    def test_transitions_keep_tables_consistent(self):
+        stdout = StringIO()
+        call_command('stress_friendship', users=5, threads=4, operations=50, stdout=stdout)
+        self.assertIn('Friendship tables are consistent.', stdout.getvalue())
+
+
+class CountersTest(TestCase):
+    def setUp(self):
+        self.a, self.b, self.c = create_users(3)
+
+    def counters(self, user_id):
+        return User.objects.filter(pk=user_id).values_list('friends_count', 'wall_posts_count').get()
+
+    def test_friendship_and_wall_posts_are_counted(self):
+        User.friendship.add_many(self.a, [self.b, self.c])
+        User.friendship.delete(self.a, self.c)
+        post = UserWallPost.objects.create(user_id=self.a, author_id=self.b, content=u'привет')
+        self.assertEqual(self.counters(self.a), (1, 1))
+        self.assertEqual(self.counters(self.c), (0, 0))
+        post.mark_deleted()
+        post.mark_deleted()
+        self.assertEqual(self.counters(self.a), (1, 0))
+
+    def test_save_keeps_counters(self):
+        user = User.objects.get(pk=self.a)
+        User.friendship.add(self.a, self.b)
+        user.first_name = u'Иван'
+        user.save()
+        self.assertEqual(self.counters(self.a), (1, 0))
+        self.assertEqual(User.objects.get(pk=self.a).first_name, u'Иван')
+
+    def test_recount_fixes_drift(self):
+        User.friendship.add(self.a, self.b)
+        UserWallPost.objects.create(user_id=self.a, author_id=self.a, content=u'привет')
+        UserWallPost.objects.create(user_id=self.a, author_id=self.b, content=u'привет')
+        User.objects.update(friends_count=5, wall_posts_count=0)
+        call_command('recount_counters', verbosity=0)
+        self.assertEqual(self.counters(self.a), (1, 2))
+        self.assertEqual(self.counters(self.c), (0, 0))
+
+
+class FeedStoreTest(TestCase):
+    def setUp(self):
+        self.a, self.b, self.c = create_users(3)
+        User.friendship.add(self.a, self.b)
+
+    def get_feed_ids(self, user_id):
+        return [info.pk for info in get_feed_store().get_feed(User.objects.get(pk=user_id))[:100]]
+
+    def check_feeds(self):
+        version = get_feed_store().get_version(User.objects.get(pk=self.a))
+        User.friendship.add(self.b, self.c)
+        post = UserWallPost.objects.create(user_id=self.c, author_id=self.c, content=u'привет')
+        FriendInfo.friendinfom.add_post_wall(self.c, self.c, post)
+        events = list(FriendInfo.friendinfom.order_by('-pk').values_list('pk', flat=True))
+        self.assertEqual(self.get_feed_ids(self.a), events[1:])
+        self.assertEqual(self.get_feed_ids(self.c), events[:2])
+        self.assertNotEqual(get_feed_store().get_version(User.objects.get(pk=self.a)), version)
+        post.mark_deleted()
+        self.assertEqual(self.get_feed_ids(self.c), events[1:2])
+
+    def test_m2m_store(self):
+        self.check_feeds()
+
+    @override_settings(FEED_STORE='packed')
+    def test_packed_store(self):
+        call_command('pack_feeds', verbosity=0)
+        self.check_feeds()
+
+    @override_settings(FEED_STORE='packed', FEED_MAX_ITEMS=3)
+    def test_packed_feed_keeps_the_newest_items(self):
+        get_feed_store().push([(self.a, pk) for pk in (5, 300, 1, 70000)])
+        self.assertEqual(UserFeed.objects.get(pk=self.a).get_ids(), [5, 300, 70000])
+
+    def test_many_items_are_pushed(self):
+        FriendInfo.friendinfom.bulk_create([FriendInfo(user1_id=self.a, user2_id=self.b) for i in xrange(1200)])
+        get_feed_store().push([(self.c, info_id) for info_id in FriendInfo.friendinfom.values_list('pk', flat=True)])
+        self.assertEqual(UserWallNewsM2M.objects.filter(user_id=self.c).count(), 1201)
+
+    def test_ids_are_packed(self):
+        ids = [1, 2, 127, 128, 16384, 2 ** 31 + 5]
+        self.assertEqual(decode_ids(encode_ids(ids)), ids)
+        self.assertEqual(len(encode_ids(range(1000, 1100))), 2 + 99)
+
+
+@override_settings(FEED_RETENTION_MAX_ITEMS=1, FEED_RETENTION_MAX_AGE_DAYS=30)
+class CompactFeedsTest(TestCase):
+    def setUp(self):
+        self.a, self.b, self.c = create_users(3)
+        User.friendship.add(self.a, self.b)
+        User.friendship.add(self.a, self.c)
+        post = UserWallPost.objects.create(user_id=self.c, author_id=self.c, content=u'привет')
+        FriendInfo.friendinfom.add_post_wall(self.c, self.c, post)
+        post.mark_deleted()
+        User.friendship.add(self.b, self.c)
+        self.old, self.kept, self.deleted, self.newest = FriendInfo.friendinfom.order_by('pk').values_list(
+            'pk', flat=True)
+        FriendInfo.friendinfom.filter(pk=self.old).update(created=timezone.now() - datetime.timedelta(days=31))
+
+    def test_compact_feeds(self):
+        call_command('compact_feeds', verbosity=0)
+        self.assertFalse(UserWallPost.objects.exists())
+        self.assertEqual(sorted(UserWallNewsM2M.objects.values_list('user_id', 'friendinfo_id')),
+                         [(self.a, self.newest), (self.b, self.newest), (self.c, self.newest)])
+        # The second event is unreferenced now but not old enough.
+        self.assertEqual(list(FriendInfo.friendinfom.order_by('pk').values_list('pk', flat=True)),
+                         [self.kept, self.newest])
+
+    def test_unprocessed_events_are_kept(self):
+        FriendSuggestionRun.objects.create(last_event_id=0)
+        call_command('compact_feeds', verbosity=0)
+        self.assertTrue(FriendInfo.friendinfom.filter(pk=self.old).exists())
+        self.assertFalse(FriendInfo.friendinfom.filter(pk=self.deleted).exists())
+
+    @override_settings(FEED_STORE='packed')
+    def test_packed_feeds_are_trimmed(self):
+        call_command('pack_feeds', verbosity=0)
+        call_command('compact_feeds', verbosity=0)
+        self.assertEqual([UserFeed.objects.get(pk=user_id).get_ids() for user_id in (self.a, self.b, self.c)],
+                         [[self.newest]] * 3)
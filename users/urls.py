@@ -9,11 +9,30 @@ urlpatterns = [
         views.UserProfileView.as_view(),
         name='user_profile'
     ),
+    url(
+        r'^profile/(?P<user_id>\d+)/posts/(?P<post_id>\d+)/', include([
+            url(
+                r'^edit/$',
+                views.UserWallPostEditView.as_view(),
+                name='user_wall_post_edit'
+            ),
+            url(
+                r'^delete/$',
+                views.UserWallPostDeleteView.as_view(),
+                name='user_wall_post_delete'
+            ),
+        ]),
+    ),
     url(
         r'^settings/$',
         UserSettingsView.as_view(),
         name='user_settings'
     ),
+    url(
+        r'^settings/export/$',
+        views.UserDataExportView.as_view(),
+        name='user_data_export'
+    ),
     url(
         r'^friends/', include([
             url(
@@ -38,6 +57,11 @@ urlpatterns = [
         views.FriendshipAPIView.as_view(),
         name='user_friendship_api'
     ),
+    url(
+        r'^api/friendship/batch/$',
+        views.FriendshipBatchAPIView.as_view(),
+        name='user_friendship_batch_api'
+    ),
     url(
         r'^search/$',
         views.SearchView.as_view(),
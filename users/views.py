@@ -1,23 +1,47 @@
 # coding=utf-8
 import datetime
-from django.contrib.auth import BACKEND_SESSION_KEY, login
+from django.conf import settings
+from django.contrib.auth import update_session_auth_hash
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
 from django.db.models import Q
-from django.http import Http404
+from django.http import Http404, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect
+from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.views.decorators.http import require_POST
 from django.views.generic import TemplateView, View
 from users.forms import UserChangeProfileForm, UserPasswordChangeForm, UserEmailChangeForm, UserWallPostForm, SearchForm
-from users.models import User, FriendInvite, FriendInfo
+from users.export import export_user_data
+from users.feeds import get_feed_store
+from users import presence
+from microsocial.views import ConditionalGetMixin, get_row_stamp
+from users.models import User, FriendInvite, FriendInfo, FriendSuggestion, UserWallPost
+from users.models import get_wall_stamp, get_friendship_stamp
 from django.contrib import messages
 from django.utils.translation import ugettext as _
 
 
+def get_users_in_order(user_ids):
+    users = User.objects.in_bulk(list(user_ids))
+    return [users[user_id] for user_id in user_ids if user_id in users]
+
+
+def get_friend_graph():
+    # numpy comes with the graph, so it is imported by the first request that
+    # needs it (or by microsocial.warmup in a preforking master), not with the
+    # URLconf.
+    from users.graph import friend_graph
+    friend_graph.ensure_fresh()
+    return friend_graph
+
+
 class MyPaginator(View):
-    def get_paginator(self, qs):
+    def get_paginator(self, qs, count=None):
         paginator = Paginator(qs, 20)
+        if count is not None:
+            # A known total, e.g. a denormalized counter, saves the COUNT query.
+            paginator._count = count
         page = self.request.GET.get('page')
         try:
             items = paginator.page(page)
@@ -28,25 +52,40 @@ class MyPaginator(View):
         return items
 
 
-class UserProfileView(TemplateView, MyPaginator):
+class UserProfileView(ConditionalGetMixin, TemplateView, MyPaginator):
     template_name = 'users/profile.html'
 
     def dispatch(self, request, *args, **kwargs):
         if request.user.is_authenticated() and request.user.pk == int(kwargs['user_id']):
             self.user = request.user
         else:
-            self.user = get_object_or_404(User, pk=kwargs['user_id'])
+            self.user = get_object_or_404(User.objects.with_friendship(request.user), pk=kwargs['user_id'])
         self.wall_post_form = UserWallPostForm(request.POST or None)
         return super(UserProfileView, self).dispatch(request, *args, **kwargs)
 
+    def get_etag_stamps(self):
+        # The row includes the counters and, for other viewers, is_my_friend.
+        stamps = [get_row_stamp(self.user), getattr(self.user, 'is_my_friend', None),
+                  get_wall_stamp(self.user.wall_posts.all())]
+        if self.request.user.is_authenticated() and self.request.user != self.user:
+            # Mutual friends
+            stamps.append(get_friendship_stamp([self.request.user.pk, self.user.pk]))
+        return stamps
+
     def get_context_data(self, **kwargs):
         context = super(UserProfileView, self).get_context_data(**kwargs)
         context['profile_user'] = self.user
+        presence.attach([self.user])
         # context['wall_posts'] = self.get_wall_posts()
-        context['wall_posts'] = self.get_paginator(self.user.wall_posts.select_related('author'))
+        context['wall_posts'] = self.get_paginator(
+            self.user.wall_posts.filter(is_deleted=False).select_related('author'), self.user.wall_posts_count
+        )
         context['wall_post_form'] = self.wall_post_form
         if self.request.user != self.user:
-            context['is_my_friend'] = User.friendship.are_friends(self.request.user, self.user)
+            context['is_my_friend'] = bool(self.user.is_my_friend)
+            if self.request.user.is_authenticated():
+                mutual_friends = get_friend_graph().mutual_friends(self.request.user.pk, self.user.pk)
+                context['mutual_friends'] = get_users_in_order(mutual_friends[:settings.MUTUAL_FRIENDS_LIMIT].tolist())
         return context
 
     def post(self, request, *args, **kwargs):
@@ -61,47 +100,103 @@ class UserProfileView(TemplateView, MyPaginator):
         return self.get(request, *args, **kwargs)
 
 
+class UserWallPostEditView(TemplateView):
+    template_name = 'users/wall_post_edit.html'
+
+    @method_decorator(login_required)
+    def dispatch(self, request, *args, **kwargs):
+        self.post_obj = get_object_or_404(UserWallPost, pk=kwargs['post_id'], user_id=kwargs['user_id'],
+                                          is_deleted=False)
+        if not self.post_obj.can_edit(request.user):
+            raise Http404
+        self.form = UserWallPostForm(request.POST or None, instance=self.post_obj)
+        return super(UserWallPostEditView, self).dispatch(request, *args, **kwargs)
+
+    def get_context_data(self, **kwargs):
+        context = super(UserWallPostEditView, self).get_context_data(**kwargs)
+        context['wall_post'] = self.post_obj
+        context['form'] = self.form
+        return context
+
+    def post(self, request, *args, **kwargs):
+        if self.form.is_valid():
+            post = self.form.save(commit=False)
+            post.edited = timezone.now()
+            post.save(update_fields=('content', 'edited'))
+            messages.success(request, _(u'Сообщение успешно изменено.'))
+            return redirect('user_profile', user_id=post.user_id)
+        return self.get(request, *args, **kwargs)
+
+
+class UserWallPostDeleteView(View):
+    @method_decorator(login_required)
+    @method_decorator(require_POST)
+    def dispatch(self, request, *args, **kwargs):
+        post = get_object_or_404(UserWallPost, pk=kwargs['post_id'], user_id=kwargs['user_id'], is_deleted=False)
+        if not post.can_delete(request.user):
+            raise Http404
+        post.mark_deleted()
+        messages.success(request, _(u'Сообщение успешно удалено.'))
+        return redirect('user_profile', user_id=post.user_id)
+
+
 class UserSettingsView(TemplateView):
     template_name = 'users/settings.html'
+    actions = ('profile', 'password', 'email')
 
     @method_decorator(login_required)
     def dispatch(self, request, *args, **kwargs):
-        action = request.POST.get('action')
-        self.profile_form = UserChangeProfileForm(
-                (request.POST if action == 'profile' else None),
-                (request.FILES if action == 'profile' else None),
-                instance=request.user, prefix='profile'
-        )
-        self.password_form = UserPasswordChangeForm(request.user, (request.POST if action == 'password' else None),
-                                                    prefix='password')
-        self.email_form = UserEmailChangeForm(request.user, request.POST if action == 'email' else None, prefix='email')
+        self.forms = {}
         return super(UserSettingsView, self).dispatch(request, *args, **kwargs)
 
+    def get_form(self, action, data=None, files=None):
+        """
+        Builds the form of ``action``; forms of other actions are built only
+        when the page is rendered.
+        """
+        if action not in self.forms:
+            user = self.request.user
+            if action == 'profile':
+                form = UserChangeProfileForm(data, files, instance=user, prefix='profile')
+            elif action == 'password':
+                form = UserPasswordChangeForm(user, data, prefix='password')
+            else:
+                form = UserEmailChangeForm(user, data, prefix='email')
+            self.forms[action] = form
+        return self.forms[action]
+
     def get_context_data(self, **kwargs):
         context = super(UserSettingsView, self).get_context_data(**kwargs)
-        context['profile_form'] = self.profile_form
-        context['password_form'] = self.password_form
-        context['email_form'] = self.email_form
+        for action in self.actions:
+            context['{}_form'.format(action)] = self.get_form(action)
         return context
 
     def post(self, request, *args, **kwargs):
-        if self.profile_form.is_valid():
-            self.profile_form.save()
-            messages.success(request, _(u'Вы успешно изменили свой профиль.'))
-            return redirect(request.path)
-        elif self.password_form.is_valid():
-            self.password_form.save()
-            request.user.backend = request.session[BACKEND_SESSION_KEY]
-            login(request, request.user)
-            messages.success(request, _(u'Пароль успешно изменен.'))
-            return redirect(request.path)
-        elif self.email_form.is_valid():
-            self.email_form.save()
-            messages.success(request, _(u'Email успешно изменен.'))
+        action = request.POST.get('action')
+        if action not in self.actions:
+            return self.get(request, *args, **kwargs)
+        form = self.get_form(action, request.POST, request.FILES if action == 'profile' else None)
+        if form.is_valid():
+            form.save()
+            if action == 'profile':
+                messages.success(request, _(u'Вы успешно изменили свой профиль.'))
+            elif action == 'password':
+                update_session_auth_hash(request, form.user)
+                messages.success(request, _(u'Пароль успешно изменен.'))
+            else:
+                messages.success(request, _(u'Email успешно изменен.'))
             return redirect(request.path)
         return self.get(request, *args, **kwargs)
 
 
+class UserDataExportView(View):
+    @method_decorator(login_required)
+    def get(self, request, *args, **kwargs):
+        response = StreamingHttpResponse(export_user_data(request.user), content_type='application/x-ndjson')
+        response['Content-Disposition'] = 'attachment; filename="microsocial-{}.jsonl"'.format(request.user.pk)
+        return response
+
+
 class UserFriendsView(TemplateView, MyPaginator):
     template_name = 'users/friends_friends.html'
 
@@ -113,8 +208,18 @@ class UserFriendsView(TemplateView, MyPaginator):
         context = super(UserFriendsView, self).get_context_data(**kwargs)
         context['friends_menu'] = 'friends'
         context['items'] = self.get_paginator(self.request.user.friends.all())
+        presence.attach(context['items'])
+        context['suggestions'] = self.get_suggestions()
         return context
 
+    def get_suggestions(self):
+        if settings.FRIEND_SUGGESTIONS_PRECOMPUTED:
+            return [suggestion.suggested for suggestion in FriendSuggestion.objects.filter(
+                user=self.request.user
+            ).select_related('suggested')[:settings.FRIEND_SUGGESTIONS_LIMIT]]
+        suggestions = get_friend_graph().suggestions(self.request.user.pk, settings.FRIEND_SUGGESTIONS_LIMIT)
+        return get_users_in_order([user_id for user_id, score in suggestions])
+
 
 class UserIncomingView(TemplateView, MyPaginator):
     template_name = 'users/friends_incoming.html'
@@ -209,6 +314,46 @@ class FriendshipAPIView(View):
         return 'user_outcoming'
 
 
+class FriendshipBatchAPIView(View):
+    """
+    Applies one friendship action to many users at once. Takes ``action`` and a
+    repeated ``user_id`` field, answers with the ids of the affected users.
+    """
+    @method_decorator(login_required)
+    @method_decorator(require_POST)
+    def dispatch(self, request, *args, **kwargs):
+        method_name = '_action_{}'.format(request.POST.get('action', ''))
+        if not hasattr(self, method_name):
+            raise Http404
+        try:
+            user_ids = set(int(user_id) for user_id in request.POST.getlist('user_id'))
+        except ValueError:
+            return HttpResponseBadRequest()
+        if len(user_ids) > settings.FRIENDSHIP_BATCH_LIMIT:
+            return HttpResponseBadRequest()
+        return JsonResponse(getattr(self, method_name)(user_ids))
+
+    def _action_add_to_friends(self, user_ids):
+        invited_ids, friend_ids = FriendInvite.objects.add_many(
+            self.request.user, User.objects.filter(pk__in=user_ids).values_list('pk', flat=True)
+        )
+        return {'invited': invited_ids, 'friends': friend_ids}
+
+    def _action_delete_from_friends(self, user_ids):
+        return {'deleted': User.friendship.delete_many(self.request.user, user_ids)}
+
+    def _action_approve(self, user_ids):
+        return {'friends': FriendInvite.objects.approve_many(user_ids, self.request.user)}
+
+    def _action_reject(self, user_ids):
+        FriendInvite.objects.reject_many(user_ids, self.request.user)
+        return {}
+
+    def _action_cancel_outcoming(self, user_ids):
+        FriendInvite.objects.filter(from_user=self.request.user, to_user_id__in=user_ids).delete()
+        return {}
+
+
 class SearchView(TemplateView):
     template_name = 'users/search.html'
 
@@ -265,7 +410,7 @@ class SearchView(TemplateView):
         return context
 
 
-class NewsView(TemplateView, MyPaginator):
+class NewsView(ConditionalGetMixin, TemplateView, MyPaginator):
     template_name = 'users/news.html'
 
     @method_decorator(login_required)
@@ -273,7 +418,10 @@ class NewsView(TemplateView, MyPaginator):
         self.user = request.user
         return super(NewsView, self).dispatch(request, *args, **kwargs)
 
+    def get_etag_stamps(self):
+        return get_feed_store().get_version(self.user), get_wall_stamp()
+
     def get_context_data(self, **kwargs):
         context = super(NewsView, self).get_context_data(**kwargs)
-        context['items'] = self.get_paginator(self.user.news.all())
+        context['items'] = self.get_paginator(get_feed_store().get_feed(self.user))
         return context